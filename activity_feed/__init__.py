@@ -8,6 +8,8 @@ Activity feeds backed by Redis.
 
 __version__ = "2.7.0"
 
-from app import ActivityFeed
+from .app import ActivityFeed
+from .loader import ItemLoader
+from .writer import BufferedFeedWriter
 
-__all__ = ['ActivityFeed']
+__all__ = ['ActivityFeed', 'ItemLoader', 'BufferedFeedWriter']
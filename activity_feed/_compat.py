@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""
+Helpers for running on both Python 2 and Python 3.
+"""
+import sys
+
+PY2 = sys.version_info[0] == 2
+
+if PY2:
+    text_type = unicode
+    string_types = (str, unicode)
+
+    from urlparse import urlparse
+
+    exec('def reraise(tp, value, tb=None):\n raise tp, value, tb')
+else:
+    text_type = str
+    string_types = (str,)
+
+    from urllib.parse import urlparse
+
+    def reraise(tp, value, tb=None):
+        if value.__traceback__ is not tb:
+            raise value.with_traceback(tb)
+        raise value
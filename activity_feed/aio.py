@@ -0,0 +1,457 @@
+# -*- coding: utf-8 -*-
+"""
+asyncio client for activity feeds.
+
+Requires Python 3.6+ and redis-py 5.0.1+ (`redis.asyncio`). Feeds written with
+`AsyncActivityFeed` use the same key layout as `ActivityFeed` and can be read
+by either client.
+"""
+import asyncio
+import inspect
+import math
+import time
+
+import redis.asyncio
+
+from .app import BaseActivityFeed
+from .fanout import ChunkStats
+from .utils import cached_property, chunked, isiterable, encode_cursor, \
+    decode_cursor
+
+async def _maybe_await(v):
+    if inspect.isawaitable(v):
+        return await v
+
+    return v
+
+class AsyncActivityFeed(BaseActivityFeed):
+    """Activity feeds on an asyncio Redis connection pool.
+
+    Takes the same arguments as `ActivityFeed`. `connection` may be an
+    existing `redis.asyncio.Redis` client. Item loaders may be plain functions
+    or coroutine functions. `delivery`, `active_window`, `item_index`,
+    `archive` and sharding across lists of URLs or clients are not
+    supported.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        for name in ('delivery', 'active_window', 'item_index', 'archive'):
+            if getattr(self, name):
+                raise ValueError('AsyncActivityFeed does not support '
+                    '{}'.format(name))
+
+        if isinstance(self._redis or self._redis_url, (list, tuple)):
+            raise ValueError('AsyncActivityFeed does not support sharding')
+
+    @cached_property
+    def redis(self):
+        if not self._redis:
+            self._redis = redis.asyncio.from_url(self._redis_url)
+
+        return self._redis
+
+    def _wrap_item_loader(self, item_loader):
+        return lambda res: asyncio.gather(
+            *[_maybe_await(item_loader(v)) for v in res])
+
+    async def _load_items(self, items):
+        items = self._decode_members(items)
+
+        if self.items_loader:
+            return await _maybe_await(self.items_loader(items))
+
+        return items
+
+    def _bump_versions(self, pipe, keys):
+        if self.versioned:
+            for key in keys:
+                pipe.incr(self._version_key(key))
+
+    async def _add_item(self, client, keys, timestamp, item_id):
+        if self.max_size:
+            await self._add_capped(keys=keys,
+                args=[timestamp, item_id, self.max_size], client=client)
+        else:
+            for key in keys:
+                await client.zadd(key, {item_id: timestamp})
+
+        self._bump_versions(client, keys)
+
+    async def feed(self, user_id, page, aggregate=None, page_size=None):
+        """Retrieve a page from the activity feed for a given `user_id`.
+
+        @return page from the activity feed for a given `user_id`.
+        """
+        if aggregate is None:
+            aggregate = self.aggregate
+
+        start, end = self._page_range(page, page_size)
+        res = await self.redis.zrevrange(self.feed_key(user_id, aggregate),
+            start, end)
+        return await self._load_items(res)
+
+    async def feeds_for(self, user_ids, page, aggregate=None, page_size=None):
+        """Retrieve the same page from the activity feeds of many users in a
+        single pipelined round trip and one item loader call, see
+        `ActivityFeed.feeds_for`.
+
+        @return dict mapping every `user_id` to its page of the activity feed.
+        """
+        if aggregate is None:
+            aggregate = self.aggregate
+
+        user_ids = list(user_ids)
+        start, end = self._page_range(page, page_size)
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for uid in user_ids:
+                pipe.zrevrange(self.feed_key(uid, aggregate), start, end)
+
+            pages, ids = self._page_ids(await pipe.execute())
+
+        if self.items_loader:
+            loaded = self._split_pages(pages, ids,
+                await _maybe_await(self.items_loader(ids)))
+
+            if loaded is None:
+                loaded = [await _maybe_await(self.items_loader(p))
+                          for p in pages]
+
+            pages = loaded
+
+        return dict(zip(user_ids, pages))
+
+    async def feed_after(self, user_id, cursor=None, limit=None,
+            aggregate=None):
+        """Retrieve items from the activity feed for a given `user_id` using
+        keyset pagination, see `ActivityFeed.feed_after`.
+
+        @return tuple of (items, next cursor).
+        """
+        if aggregate is None:
+            aggregate = self.aggregate
+
+        limit = limit or self.page_size
+        position = decode_cursor(cursor) if cursor is not None else None
+        rows = await self._rows_after(self.feed_key(user_id, aggregate),
+            position, limit)
+        next_cursor = None
+
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+
+        return await self._load_items([m for m, _ in rows]), next_cursor
+
+    async def _rows_after(self, key, position, limit, max_score='+inf',
+            min_score='-inf'):
+        if position is None:
+            return await self.redis.zrevrangebyscore(key, max_score, min_score,
+                start=0, num=limit + 1, withscores=True)
+
+        score, member = position
+        fetch = limit + 2
+
+        while True:
+            rows = await self.redis.zrevrangebyscore(key, repr(score),
+                min_score, start=0, num=fetch, withscores=True)
+            skip = 0
+
+            for m, s in rows:
+                if s != score or m < member:
+                    break
+                skip += 1
+
+            if len(rows) < fetch or len(rows) - skip > limit:
+                return rows[skip:skip + limit + 1]
+
+            fetch *= 2
+
+    async def _iter_rows(self, key, batch_size, max_score='+inf',
+            min_score='-inf'):
+        position = None
+
+        while True:
+            rows = await self._rows_after(key, position, batch_size, max_score,
+                min_score)
+
+            if rows[:batch_size]:
+                yield rows[:batch_size]
+
+            if len(rows) <= batch_size:
+                return
+
+            member, score = rows[batch_size - 1]
+            position = (score, member)
+
+    async def full_feed(self, user_id, aggregate=None):
+        """Retrieve the entire activity feed for a given `user_id`."""
+        if aggregate is None:
+            aggregate = self.aggregate
+
+        res = await self.redis.zrevrange(self.feed_key(user_id, aggregate),
+            0, -1)
+        return await self._load_items(res)
+
+    async def iter_feed(self, user_id, aggregate=None, batch_size=None):
+        """Asynchronously iterate over the entire activity feed for a given
+        `user_id`, loading one batch at a time."""
+        if aggregate is None:
+            aggregate = self.aggregate
+
+        key = self.feed_key(user_id, aggregate)
+
+        async for rows in self._iter_rows(key, batch_size or self.page_size):
+            for item in await self._load_items([m for m, _ in rows]):
+                yield item
+
+    async def feed_between_timestamps(self, user_id, starting_timestamp,
+            ending_timestamp, aggregate=None, limit=None, offset=0):
+        """Retrieve items from the activity feed for a given `user_id` between
+        a `starting_timestamp` and an `ending_timestamp`."""
+        if aggregate is None:
+            aggregate = self.aggregate
+
+        if limit is None and not offset:
+            start = num = None
+        else:
+            start, num = offset, limit if limit is not None else -1
+
+        min_score, max_score = self._score_range(starting_timestamp,
+            ending_timestamp)
+        res = await self.redis.zrevrangebyscore(
+            self.feed_key(user_id, aggregate), max_score, min_score,
+            start=start, num=num)
+        return await self._load_items(res)
+
+    between = feed_between_timestamps
+
+    async def iter_between(self, user_id, starting_timestamp, ending_timestamp,
+            aggregate=None, batch_size=None):
+        """Asynchronously iterate over the items between two timestamps,
+        loading one batch at a time."""
+        if aggregate is None:
+            aggregate = self.aggregate
+
+        key = self.feed_key(user_id, aggregate)
+        min_score, max_score = self._score_range(starting_timestamp,
+            ending_timestamp)
+
+        async for rows in self._iter_rows(key, batch_size or self.page_size,
+                max_score, min_score):
+            for item in await self._load_items([m for m, _ in rows]):
+                yield item
+
+    async def count_between(self, user_id, starting_timestamp,
+            ending_timestamp, aggregate=None):
+        """Return the number of items between two timestamps."""
+        if aggregate is None:
+            aggregate = self.aggregate
+
+        return await self.redis.zcount(self.feed_key(user_id, aggregate),
+            *self._score_range(starting_timestamp, ending_timestamp))
+
+    async def total_pages_in_feed(self, user_id, aggregate=None,
+            page_size=None):
+        """Return the total number of pages in the activity feed."""
+        total = await self.total_items_in_feed(user_id, aggregate)
+        return int(math.ceil(total / float(page_size or self.page_size)))
+
+    total_pages = total_pages_in_feed
+
+    async def total_items_in_feed(self, user_id, aggregate=None):
+        """Return the total number of items in the activity feed."""
+        if aggregate is None:
+            aggregate = self.aggregate
+
+        return await self.redis.zcard(self.feed_key(user_id, aggregate))
+
+    total_items = total_items_in_feed
+
+    async def remove_feeds(self, user_id):
+        """Remove the activity feeds for a given `user_id`."""
+        keys = [self.feed_key(user_id, False), self.feed_key(user_id, True)]
+
+        async with self.redis.pipeline() as pipe:
+            pipe.delete(*keys)
+            self._bump_versions(pipe, keys)
+            await pipe.execute()
+
+    async def trim_feed(self, user_id, starting_timestamp, ending_timestamp,
+            aggregate=None):
+        """Trim an activity feed between two timestamps."""
+        if aggregate is None:
+            aggregate = self.aggregate
+
+        key = self.feed_key(user_id, aggregate)
+
+        async with self.redis.pipeline() as pipe:
+            pipe.zremrangebyscore(key,
+                *self._score_range(starting_timestamp, ending_timestamp))
+            self._bump_versions(pipe, [key])
+            await pipe.execute()
+
+    trim = trim_feed
+
+    async def trim_feed_to_size(self, user_id, size, aggregate=None):
+        """Trim an activity down to a certain size.
+
+        @return the number of items removed.
+        """
+        if aggregate is None:
+            aggregate = self.aggregate
+
+        key = self.feed_key(user_id, aggregate)
+
+        async with self.redis.pipeline() as pipe:
+            pipe.zremrangebyrank(key, 0, -size - 1)
+            self._bump_versions(pipe, [key])
+            return (await pipe.execute())[0]
+
+    async def expire_feed(self, user_id, seconds, aggregate=None):
+        """Expire an activity feed after a set number of seconds."""
+        if aggregate is None:
+            aggregate = self.aggregate
+
+        async with self.redis.pipeline() as pipe:
+            self._queue_expire(pipe, self.feed_key(user_id, aggregate),
+                'expire', seconds)
+            await pipe.execute()
+
+    expire_in = expire_feed
+    expire_feed_in = expire_feed
+
+    async def expire_feed_at(self, user_id, timestamp, aggregate=None):
+        """Expire an activity feed at a given timestamp."""
+        if aggregate is None:
+            aggregate = self.aggregate
+
+        async with self.redis.pipeline() as pipe:
+            self._queue_expire(pipe, self.feed_key(user_id, aggregate),
+                'expireat', timestamp)
+            await pipe.execute()
+
+    expire_at = expire_feed_at
+
+    async def update_item(self, user_id, item_id, timestamp, aggregate=None):
+        """Add or update an item in the activity feed for a given `user_id`."""
+        if aggregate is None:
+            aggregate = self.aggregate
+
+        keys = [self.feed_key(user_id, False)]
+
+        if aggregate:
+            keys.append(self.feed_key(user_id, True))
+
+        timestamp = self._encode_score(timestamp)
+        item_id = self._encode_member(item_id)
+
+        if self.versioned or (len(keys) > 1 and not self.max_size):
+            async with self.redis.pipeline() as pipe:
+                await self._add_item(pipe, keys, timestamp, item_id)
+                await pipe.execute()
+        else:
+            await self._add_item(self.redis, keys, timestamp, item_id)
+
+    add_item = update_item
+
+    async def aggregate_item(self, user_id, item_id, timestamp):
+        """Aggregate an item in the activity feed for a given `user_id` or an
+        iterable of user IDs, see `AsyncActivityFeed.fanout_item`."""
+        if isiterable(user_id):
+            return await self.fanout_item(user_id, item_id, timestamp)
+
+        async with self.redis.pipeline() as pipe:
+            await self._add_item(pipe, [self.feed_key(user_id, True)],
+                self._encode_score(timestamp), self._encode_member(item_id))
+            await pipe.execute()
+
+    async def fanout_item(self, user_ids, item_id, timestamp, chunk_size=None,
+            max_in_flight=None):
+        """Aggregate an item into the aggregate activity feeds of many users
+        in pipelines of `chunk_size`, with at most `max_in_flight` pipelines
+        executing concurrently.
+
+        @return list of `ChunkStats`, one per chunk.
+        """
+        chunk_size = chunk_size or self.fanout_chunk_size
+        timestamp = self._encode_score(timestamp)
+        item_id = self._encode_member(item_id)
+        semaphore = asyncio.Semaphore(max_in_flight or self.fanout_max_in_flight)
+        tasks = []
+        errors = []
+
+        async def run(index, chunk):
+            try:
+                t = time.time()
+
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for uid in chunk:
+                        await self._add_item(pipe, [self.feed_key(uid, True)],
+                            timestamp, item_id)
+
+                    await pipe.execute()
+
+                return ChunkStats(index, len(chunk), time.time() - t, 0)
+            except Exception as e:
+                errors.append(e)
+                raise
+            finally:
+                semaphore.release()
+
+        for index, chunk in enumerate(chunked(user_ids, chunk_size)):
+            await semaphore.acquire()
+
+            if errors:
+                semaphore.release()
+                break
+
+            tasks.append(asyncio.ensure_future(run(index, chunk)))
+
+        return list(await asyncio.gather(*tasks))
+
+    async def remove_item(self, user_id, item_id, chunk_size=None):
+        """Remove items from the activity feeds and aggregate activity feeds
+        of one or many users with variadic ZREM."""
+        if not isiterable(user_id):
+            user_id = (user_id,)
+
+        if not isiterable(item_id):
+            item_id = (item_id,)
+
+        chunk_size = chunk_size or self.fanout_chunk_size
+        item_chunks = list(chunked(map(self._encode_member, item_id),
+            chunk_size))
+
+        if not item_chunks:
+            return
+
+        for users in chunked(user_id, chunk_size):
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for uid in users:
+                    keys = [self.feed_key(uid, False), self.feed_key(uid, True)]
+
+                    for items in item_chunks:
+                        for key in keys:
+                            pipe.zrem(key, *items)
+
+                    self._bump_versions(pipe, keys)
+
+                await pipe.execute()
+
+    async def check_item(self, user_id, item_id, aggregate=None):
+        """Check to see if an item is in the activity feed for a given
+        `user_id`."""
+        if aggregate is None:
+            aggregate = self.aggregate
+
+        score = await self.redis.zscore(self.feed_key(user_id, aggregate),
+            self._encode_member(item_id))
+        return score is not None
+
+    async def close(self):
+        """Close the connection pool."""
+        if self._redis:
+            await self._redis.aclose()
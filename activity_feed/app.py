@@ -1,6 +1,11 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import
 
+import itertools
+import math
+import time
+from collections import OrderedDict
+
 from leaderboard.leaderboard import Leaderboard
 
 try:
@@ -8,26 +13,184 @@ try:
 except ImportError:
     from .utils import isiterable
 
-from .utils import import_string, cached_property
-from .connection import redis_from_url
+from .utils import import_string, cached_property, chunked, \
+    encode_cursor, decode_cursor, safe_unicode
+from .connection import redis_from_url, zadd, zadd_many
+from ._compat import string_types
+from .fanout import FanOut
+from .batch import Batch
+from .cache import LRUCache
+from .loader import ItemLoader
+from .sharding import HashRing, node_name, key_slot
+from . import scripts, transfer
+
+class BaseActivityFeed(object):
+    """Configuration and key layout shared by the blocking `ActivityFeed` and
+    the asyncio `activity_feed.aio.AsyncActivityFeed` clients."""
 
-class ActivityFeed(object):
     def __init__(self, redis='redis://:@localhost:6379/0', item_loader=None,
             items_loader=None, namespace='activity_feed', aggregate=False,
-            aggregate_key='aggregate', page_size=25, connection=None):
+            aggregate_key='aggregate', page_size=25, connection=None,
+            fanout_chunk_size=1000, fanout_max_in_flight=1, max_size=None,
+            cache_size=0, cache_ttl=60, versioned=False,
+            version_key='version', hash_tags=False, cluster=False,
+            codec=None, archive=None, hot_size=None, hot_ttl=None,
+            merged_key='merged', merged_ttl=60, merged_source_size=None,
+            delivery=None, active_window=None, last_seen_key='last_seen',
+            item_index=False, item_index_key='item_feeds',
+            item_index_ttl=None):
+
+        if active_window is not None and delivery is None:
+            raise ValueError('active_window requires a delivery policy')
 
         self._redis = connection
         self._redis_url = redis
         self._resolve_item_loaders(item_loader, items_loader)
-        self.namespace = namespace
+        self._namespace = namespace
+        self._aggregate_key = aggregate_key
+        self._merged_key = merged_key
+        self._last_seen_key = last_seen_key
+        self._item_index_key = item_index_key
+        self._update_key_prefixes()
         self.aggregate = aggregate
-        self.aggregate_key = aggregate_key
         self.page_size = page_size
+        self.fanout_chunk_size = fanout_chunk_size
+        self.fanout_max_in_flight = fanout_max_in_flight
+        self.max_size = max_size
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.versioned = versioned or bool(cache_size)
+        self.version_key = version_key
+        self.hash_tags = hash_tags or cluster
+        self.cluster = cluster
+        self.codec = codec
+        self.archive = archive
+        self.hot_size = hot_size
+        self.hot_ttl = hot_ttl
+        self.merged_ttl = merged_ttl
+        self.merged_source_size = merged_source_size
+        self.delivery = delivery
+        self.active_window = active_window
+        self.item_index = item_index
+        self.item_index_ttl = item_index_ttl
+
+    @property
+    def namespace(self):
+        return self._namespace
+
+    @namespace.setter
+    def namespace(self, value):
+        self._namespace = value
+        self._update_key_prefixes()
+
+    @property
+    def aggregate_key(self):
+        return self._aggregate_key
+
+    @aggregate_key.setter
+    def aggregate_key(self, value):
+        self._aggregate_key = value
+        self._update_key_prefixes()
+
+    @property
+    def merged_key(self):
+        return self._merged_key
+
+    @merged_key.setter
+    def merged_key(self, value):
+        self._merged_key = value
+        self._update_key_prefixes()
+
+    @property
+    def last_seen_key(self):
+        return self._last_seen_key
+
+    @last_seen_key.setter
+    def last_seen_key(self, value):
+        self._last_seen_key = value
+        self._update_key_prefixes()
+
+    @property
+    def item_index_key(self):
+        return self._item_index_key
+
+    @item_index_key.setter
+    def item_index_key(self, value):
+        self._item_index_key = value
+        self._update_key_prefixes()
+
+    def _update_key_prefixes(self):
+        self._key_prefix = '{}:'.format(self._namespace)
+        self._aggregate_key_prefix = '{}:{}:'.format(self._namespace,
+            self._aggregate_key)
+        self._merged_key_prefix = '{}:{}:'.format(self._namespace,
+            self._merged_key)
+        self._last_seen_key_prefix = '{}:{}:'.format(self._namespace,
+            self._last_seen_key)
+        self._item_index_key_prefix = '{}:{}:'.format(self._namespace,
+            self._item_index_key)
+
+    def _version_key(self, feed_key):
+        '''Key of the version counter bumped by every write to `feed_key`.'''
+        return '{}:{}'.format(feed_key, self.version_key)
+
+    def _queue_expire(self, pipe, key, command, when):
+        '''Queue setting the expiry of the feed at `key` with `command`. If
+        versioned its version is bumped and expires with the feed, so cached
+        pages are invalidated now and again once the feed is gone.'''
+        getattr(pipe, command)(key, when)
+
+        if self.versioned:
+            version_key = self._version_key(key)
+            pipe.incr(version_key)
+            getattr(pipe, command)(version_key, when)
+
+    def _encode_member(self, item_id):
+        if self.codec is None:
+            return item_id
+
+        return self.codec.encode_member(item_id)
+
+    def _encode_score(self, timestamp):
+        if self.codec is None:
+            return timestamp
+
+        return self.codec.encode_score(timestamp)
+
+    def _score_range(self, starting_timestamp, ending_timestamp):
+        if self.codec is None:
+            return starting_timestamp, ending_timestamp
+
+        return self.codec.score_range(starting_timestamp, ending_timestamp)
+
+    def _decode_members(self, members):
+        '''Decode members read from a feed into item IDs.'''
+        if self.codec is None:
+            return members
+
+        return [self.codec.decode_member(m) for m in members]
+
+    def _page_ids(self, pages):
+        '''Decode `pages` of members, returning them with the de-duplicated
+        item IDs of every page.'''
+        pages = [self._decode_members(p) for p in pages]
+        return pages, list(OrderedDict.fromkeys(v for p in pages for v in p))
+
+    def _split_pages(self, pages, ids, items):
+        '''Map `items`, loaded for `ids`, back onto `pages`. Returns None if
+        the loader did not return one item per ID.'''
+        items = list(items)
+
+        if len(items) != len(ids):
+            return None
+
+        loaded = dict(zip(ids, items))
+        return [[loaded[v] for v in p] for p in pages]
 
     def _resolve_item_loaders(self, item_loader=None, items_loader=None):
         '''Sets the item loader callback functions.'''
         def resolve_loader(loader):
-            if isinstance(loader, basestring):
+            if isinstance(loader, string_types):
                 return import_string(loader)
             if callable(loader):
                 return loader
@@ -38,17 +201,267 @@ class ActivityFeed(object):
         item_loader = resolve_loader(item_loader)
 
         if not self.items_loader and item_loader:
-            self.items_loader = lambda res: [item_loader(v) for v in res]
+            self.items_loader = self._wrap_item_loader(item_loader)
+
+    def _wrap_item_loader(self, item_loader):
+        '''Turn a single item loader into an items loader.'''
+        return lambda res: [item_loader(v) for v in res]
+
+    @cached_property
+    def _add_capped(self):
+        return self.redis.register_script(scripts.ADD_CAPPED)
+
+    def _page_range(self, page, page_size=None):
+        '''Return the inclusive (start, end) ranks for a 1-indexed `page`.'''
+        page_size = page_size or self.page_size
+        start = (max(page, 1) - 1) * page_size
+        return start, start + page_size - 1
+
+    def feed_key(self, user_id, aggregate=None):
+        """Feed key for a `user_id` composed of:
+
+        Feed: `namespace:user_id`
+        Aggregate feed: `namespace`:`aggregate_key`:`user_id`
+
+        With `hash_tags` the user ID is wrapped in a hash tag, e.g.
+        `namespace:{user_id}`, so every key of a user maps to the same Redis
+        Cluster slot.
+
+        @return feed key.
+        """
+        if aggregate is None:
+            aggregate = self.aggregate
+
+        if self.hash_tags:
+            user_id = '{{{}}}'.format(user_id)
+
+        if aggregate:
+            return '{}{}'.format(self._aggregate_key_prefix, user_id)
+
+        return '{}{}'.format(self._key_prefix, user_id)
+
+    def merged_feed_key(self, user_id):
+        """Key of the merged timeline materialized for `user_id` by
+        `ActivityFeed.merged_feed`: `namespace`:`merged_key`:`user_id`.
+
+        @return merged timeline key.
+        """
+        if self.hash_tags:
+            user_id = '{{{}}}'.format(user_id)
+
+        return '{}{}'.format(self._merged_key_prefix, user_id)
+
+    def last_seen_marker_key(self, user_id):
+        """Key of the marker recording when `user_id` was last seen, used
+        with `active_window`: `namespace`:`last_seen_key`:`user_id`.
+
+        @return last seen marker key.
+        """
+        if self.hash_tags:
+            user_id = '{{{}}}'.format(user_id)
+
+        return '{}{}'.format(self._last_seen_key_prefix, user_id)
+
+    def item_feeds_key(self, item_id):
+        """Key of the set of aggregate feeds `item_id` was written to, used
+        with `item_index`: `namespace`:`item_index_key`:`item_id`. Every
+        node holds the set of its own feeds.
+
+        @return item index key.
+        """
+        if self.hash_tags:
+            item_id = '{{{}}}'.format(item_id)
+
+        return '{}{}'.format(self._item_index_key_prefix, item_id)
+
+class ActivityFeed(BaseActivityFeed):
+    """Blocking activity feed client.
+
+    `redis` may be a list of URLs (or `connection` a list of clients) to
+    shard feeds across several Redis nodes. Both feeds of a user live on the
+    node picked by consistent hashing of the user ID, see
+    `ActivityFeed.redis_for`.
+
+    With `cluster=True`, `connection` is a Redis Cluster client. Keys use
+    hash tags and the commands of multi-user pipelines are grouped by slot.
+    """
+
+    @cached_property
+    def nodes(self):
+        '''Redis clients of the nodes feeds are stored on.'''
+        nodes = self._redis or self._redis_url
+
+        if not isinstance(nodes, (list, tuple)):
+            nodes = [nodes]
+
+        if self.cluster and len(nodes) > 1:
+            raise ValueError('a cluster is configured with a single client')
+
+        return [redis_from_url(n) if isinstance(n, string_types) else n
+                for n in nodes]
+
+    @cached_property
+    def ring(self):
+        '''Consistent hash ring mapping user IDs onto `nodes`.'''
+        return HashRing([node_name(c) for c in self.nodes])
 
     @cached_property
     def redis(self):
-        if not self._redis:
-            self._redis = redis_from_url(self._redis_url)
+        if len(self.nodes) > 1:
+            raise RuntimeError('feeds are sharded across {} nodes, use '
+                'ActivityFeed.redis_for(user_id)'.format(len(self.nodes)))
+
+        return self.nodes[0]
+
+    def redis_for(self, user_id):
+        '''Redis client of the node holding the feeds for `user_id`.'''
+        return self.nodes[self._node_index(user_id)]
+
+    def _node_index(self, user_id):
+        if len(self.nodes) == 1:
+            return 0
 
-        return self._redis
+        return self.ring.get_node(user_id)
 
-    def _parse_feed_response(self, res):
-        items = [v['member'] for v in res]
+    def _slot(self, user_id):
+        return key_slot(self.feed_key(user_id, False))
+
+    def _group_by_node(self, user_ids):
+        '''Return an ordered dict mapping node indexes to their user IDs. In
+        cluster mode the user IDs of a node are ordered by slot.'''
+        groups = OrderedDict()
+
+        for uid in user_ids:
+            groups.setdefault(self._node_index(uid), []).append(uid)
+
+        if self.cluster:
+            for uids in groups.values():
+                uids.sort(key=self._slot)
+
+        return groups
+
+    def _fanout(self, chunk_size, max_in_flight=1):
+        return FanOut(self.nodes, chunk_size, max_in_flight, self._node_index,
+            self._slot if self.cluster else None)
+
+    @cached_property
+    def _add_capped(self):
+        # EVALSHA falls back to loading the script on every other node.
+        return self.nodes[0].register_script(scripts.ADD_CAPPED)
+
+    @cached_property
+    def _merge_feeds(self):
+        return self.nodes[0].register_script(scripts.MERGE_FEEDS)
+
+    @cached_property
+    def _add_if_active(self):
+        return self.nodes[0].register_script(scripts.ADD_IF_ACTIVE)
+
+    @cached_property
+    def cache(self):
+        '''Process local cache of feed pages, None unless `cache_size` is set.'''
+        if self.cache_size:
+            return LRUCache(self.cache_size, self.cache_ttl)
+
+    def _add_item(self, client, keys, timestamp, item_id):
+        '''Queue or send the writes adding `item_id` to the feeds in `keys`.
+        If `ActivityFeed.max_size` is set every feed is trimmed in the same
+        server side script.'''
+        if self.max_size:
+            self._add_capped(keys=keys, args=[timestamp, item_id, self.max_size],
+                client=client)
+        else:
+            for key in keys:
+                zadd(client, key, timestamp, item_id)
+
+        self._unarchive(keys, [item_id])
+        self._bump_versions(client, keys)
+
+    def _unarchive(self, keys, members):
+        '''Drop `members` written back to the hot tier of the feeds in `keys`
+        from `ActivityFeed.archive`, so they are not read twice.'''
+        if self.archive is not None:
+            for key in keys:
+                self.archive.remove(key, members)
+
+    def _add_aggregate(self, client, user_id, timestamp, item_id):
+        '''Queue or send the writes adding `item_id` to the aggregate feed of
+        `user_id`. With `ActivityFeed.active_window` the item is skipped
+        unless the user has been seen within the window.'''
+        key = self.feed_key(user_id, True)
+        self._index_item(client, key, item_id)
+
+        if self.active_window is None:
+            return self._add_item(client, [key], timestamp, item_id)
+
+        self._add_if_active(keys=[self.last_seen_marker_key(user_id), key],
+            args=[timestamp, item_id, self.max_size or 0], client=client)
+        self._unarchive([key], [item_id])
+        self._bump_versions(client, [key])
+
+    def _index_item(self, client, key, item_id):
+        '''Queue recording that the aggregate feed `key` received `item_id`
+        if `ActivityFeed.item_index` is set.'''
+        self._index_items(client, key, [item_id])
+
+    def _index_items(self, client, key, members):
+        '''Queue recording that the aggregate feed `key` received `members`,
+        encoded or read from Redis, if `ActivityFeed.item_index` is set.'''
+        if not self.item_index:
+            return
+
+        for item_id in self._decode_members(members):
+            if isinstance(item_id, bytes):
+                item_id = safe_unicode(item_id)
+
+            index_key = self.item_feeds_key(item_id)
+            client.sadd(index_key, key)
+
+            if self.item_index_ttl is not None:
+                client.expire(index_key, self.item_index_ttl)
+
+    def _add_to_feeds(self, client, keys, timestamp, item_id):
+        '''Add `item_id` to the feeds in `keys` in as few round trips as
+        possible.'''
+        if self.versioned or (len(keys) > 1 and not self.max_size):
+            pipe = client.pipeline()
+            self._add_item(pipe, keys, timestamp, item_id)
+            pipe.execute()
+        else:
+            self._add_item(client, keys, timestamp, item_id)
+
+    def _bump_versions(self, client, keys):
+        '''Queue a version bump for every feed in `keys` if versioned.'''
+        if self.versioned:
+            for key in keys:
+                client.incr(self._version_key(key))
+
+    def _write(self, client, keys, command, *args):
+        '''Run a single command against the feeds in `keys` and bump their
+        versions in the same transaction. Returns the command results.'''
+        if not self.versioned:
+            return [getattr(client, command)(key, *args) for key in keys]
+
+        pipe = client.pipeline()
+
+        for key in keys:
+            getattr(pipe, command)(key, *args)
+
+        self._bump_versions(pipe, keys)
+        return pipe.execute()[:len(keys)]
+
+    def _expire(self, client, key, command, when):
+        '''Set the expiry of the feed at `key` with `command`, see
+        `_queue_expire`.'''
+        if not self.versioned:
+            return getattr(client, command)(key, when)
+
+        pipe = client.pipeline()
+        self._queue_expire(pipe, key, command, when)
+        return pipe.execute()[0]
+
+    def _load_items(self, items):
+        items = self._decode_members(items)
 
         if self.items_loader:
             return self.items_loader(items)
@@ -75,10 +488,463 @@ class ActivityFeed(object):
         if aggregate is None:
             aggregate = self.aggregate
 
-        feederboard = self.feederboard_for(user_id, aggregate)
-        res = feederboard.leaders(page, page_size=page_size or self.page_size,
-            members_only=True)
-        return self._parse_feed_response(res)
+        client = self.redis_for(user_id)
+        key = self.feed_key(user_id, aggregate)
+        start, end = self._page_range(page, page_size)
+        pulled = self._pulled_sources(user_id, aggregate)
+
+        if aggregate and self.active_window is not None:
+            self.touch(user_id)
+
+        if pulled:
+            return self._load_items(self._pulled_page(user_id, key, pulled,
+                start, end))
+
+        if self.cache is None:
+            return self._load_items(self._page(client, key, start, end))
+
+        version = client.get(self._version_key(key))
+        cache_key = (key, start, end)
+        entry = self.cache.get(cache_key)
+
+        if entry is None or entry[0] != version:
+            entry = (version, self._page(client, key, start, end), None)
+            self.cache.set(cache_key, entry)
+
+        if self._deferring():
+            return self._load_items(entry[1])
+
+        if entry[2] is None:
+            entry = (version, entry[1], self._load_items(entry[1]))
+            self.cache.set(cache_key, entry)
+
+        return list(entry[2])
+
+    def _deferring(self):
+        '''Whether the items loader is an `ItemLoader` deferring loads inside
+        a scope, whose results must not be cached.'''
+        loader = self.items_loader
+        return isinstance(loader, ItemLoader) and loader.in_scope()
+
+    def _page(self, client, key, start, end):
+        '''Return the members ranked `start` to `end`, read through to the
+        archive for ranks past the hot tier.'''
+        members = client.zrevrange(key, start, end)
+
+        if self.archive is None or len(members) > end - start:
+            return members
+
+        hot = start + len(members) if members else client.zcard(key)
+        return self._read_through(key, start, end, members, hot)
+
+    def _pulled_sources(self, user_id, aggregate):
+        '''Users whose items are merged into the aggregate feed of `user_id`
+        at read time, see `activity_feed.delivery.HybridDelivery`.'''
+        if not aggregate or self.delivery is None:
+            return []
+
+        return self.delivery.pulled_sources(user_id)
+
+    def _pulled_page(self, user_id, key, pulled, start, end):
+        '''Return the members ranked `start` to `end` in the aggregate feed
+        `key` merged with the individual feeds of the `pulled` users. The
+        newest `end` + 1 items of every feed are read with one pipeline per
+        node.'''
+        merged = {}
+
+        for node, keys in self._keys_by_node(user_id, key, pulled).items():
+            pipe = self.nodes[node].pipeline(transaction=False)
+
+            for k in keys:
+                pipe.zrevrange(k, 0, end, withscores=True)
+
+            for rows in pipe.execute():
+                for member, score in rows:
+                    if merged.get(member, score) <= score:
+                        merged[member] = score
+
+        rows = sorted(merged.items(), key=lambda r: (r[1], r[0]), reverse=True)
+        return [m for m, _ in rows[start:end + 1]]
+
+    def _pulled_count(self, user_id, key, pulled):
+        '''Count the distinct members of the aggregate feed `key` and of the
+        individual feeds of the `pulled` users, as merged by `_pulled_page`.
+        On a single node the feeds are merged into a temporary key counted
+        and deleted in one transaction, otherwise members are read with one
+        pipeline per node and counted by the client.'''
+        groups = self._keys_by_node(user_id, key, pulled)
+
+        if len(self.nodes) == 1 and not self.cluster:
+            tmp = '{}:count'.format(key)
+            pipe = self.nodes[0].pipeline()
+
+            for keys in chunked(groups[0], self.fanout_chunk_size):
+                self._merge_feeds(keys=[tmp] + keys, args=[0], client=pipe)
+
+            pipe.delete(tmp)
+            return pipe.execute()[-2]
+
+        members = set()
+
+        for node, keys in groups.items():
+            pipe = self.nodes[node].pipeline(transaction=False)
+
+            for k in keys:
+                pipe.zrange(k, 0, -1)
+
+            for rows in pipe.execute():
+                members.update(rows)
+
+        return len(members)
+
+    def _keys_by_node(self, user_id, key, pulled):
+        '''Group `key` of `user_id` and the individual feeds of `pulled` users
+        by node.'''
+        groups = OrderedDict([(self._node_index(user_id), [key])])
+
+        for node, uids in self._group_by_node(pulled).items():
+            groups.setdefault(node, []).extend(self.feed_key(uid, False)
+                                               for uid in uids)
+
+        return groups
+
+    def _read_through(self, key, start, end, members, hot):
+        '''Complete the page `start` to `end` of hot `members` with archived
+        items, `hot` being the number of items in the hot tier.'''
+        rows = self.archive.rows(key)[max(start - hot, 0):end - hot + 1]
+        return members + [m for m, _ in rows]
+
+    def feed_after(self, user_id, cursor=None, limit=None, aggregate=None):
+        """Retrieve items from the activity feed for a given `user_id` using
+        keyset pagination. Pages are addressed by the (score, member) of the
+        last item seen rather than by offset, so every page costs the same
+        and items added while paging do not cause duplicates or gaps.
+
+        :param user_id: [string] User ID.
+        :param cursor: [string, None] Cursor returned by a previous call. If
+                       None the newest items are returned.
+        :param limit: [int, None] Maximum number of items to return. If None
+                      default page size for this object will be used.
+        :param aggregate: [boolean, False] Whether to retrieve the aggregate
+                          feed for `user_id`.
+
+        @return tuple of (items, next cursor). The next cursor is None when
+                there are no more items.
+        """
+        if aggregate is None:
+            aggregate = self.aggregate
+
+        limit = limit or self.page_size
+        key = self.feed_key(user_id, aggregate)
+
+        position = decode_cursor(cursor) if cursor is not None else None
+        rows = self._rows_after(self.redis_for(user_id), key, position, limit)
+        next_cursor = None
+
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+
+        return self._load_items([m for m, _ in rows]), next_cursor
+
+    def _rows_after(self, client, key, position, limit, max_score='+inf',
+            min_score='-inf'):
+        '''Return up to `limit` + 1 (member, score) rows following `position`,
+        a (score, member) tuple, or the first rows below `max_score` if
+        `position` is None. Members sharing the position score are ordered by
+        member descending, the ones at or before the position member are
+        skipped. Archived rows following `position` are merged in.'''
+        def hot(max_score, num):
+            return client.zrevrangebyscore(key, max_score, min_score,
+                start=0, num=num, withscores=True)
+
+        rows = self._after(hot, position, limit, max_score)
+
+        if self.archive is None:
+            return rows
+
+        def cold(max_score, num):
+            return self.archive.rows_between(key, min_score, max_score, 0, num)
+
+        rows = list(rows) + self._after(cold, position, limit, max_score)
+        rows.sort(key=lambda r: (r[1], r[0]), reverse=True)
+        return rows[:limit + 1]
+
+    def _after(self, read, position, limit, max_score):
+        '''Keyset step of `_rows_after` over one tier, `read(max_score, num)`
+        returning the first `num` rows of the tier below `max_score`.'''
+        if position is None:
+            return read(max_score, limit + 1)
+
+        score, member = position
+        fetch = limit + 2
+
+        while True:
+            rows = read(repr(score), fetch)
+            skip = 0
+
+            for m, s in rows:
+                if s != score or m < member:
+                    break
+                skip += 1
+
+            if len(rows) < fetch or len(rows) - skip > limit:
+                return rows[skip:skip + limit + 1]
+
+            fetch *= 2
+
+    def _iter_rows(self, client, key, batch_size, max_score='+inf',
+            min_score='-inf'):
+        '''Walk a feed from newest to oldest, yielding lists of at most
+        `batch_size` (member, score) rows.'''
+        position = None
+
+        while True:
+            rows = self._rows_after(client, key, position, batch_size,
+                max_score, min_score)
+
+            if rows[:batch_size]:
+                yield rows[:batch_size]
+
+            if len(rows) <= batch_size:
+                return
+
+            member, score = rows[batch_size - 1]
+            position = (score, member)
+
+    def feeds_for(self, user_ids, page, aggregate=None, page_size=None):
+        """Retrieve the same page from the activity feeds of many users. All
+        pages are fetched in a single pipelined round trip per node, except
+        aggregate feeds merging pulled accounts, see
+        `activity_feed.delivery.HybridDelivery`, which are read like `feed()`
+        does. The item loader is called once with the de-duplicated item IDs
+        of every page, and once per page instead if it does not return one
+        item per ID, e.g. because it drops deleted items. An `ItemLoader`
+        loads every page in one batch.
+
+        :param user_ids: [iterable] User IDs.
+        :param page: [int] Page in the feeds to be retrieved.
+        :param aggregate: [boolean, False] Whether to retrieve the aggregate
+                          feeds.
+        :param page_size: [int, None] Page size to be used in fetching the
+                          activity feeds. If None default page for this object
+                          will be used.
+
+        @return dict mapping every `user_id` to its page of the activity feed.
+        """
+        if aggregate is None:
+            aggregate = self.aggregate
+
+        user_ids = list(user_ids)
+        start, end = self._page_range(page, page_size)
+        by_user = {}
+
+        for uid in user_ids:
+            pulled = self._pulled_sources(uid, aggregate)
+
+            if pulled:
+                by_user[uid] = self._pulled_page(uid,
+                    self.feed_key(uid, aggregate), pulled, start, end)
+
+        for node, uids in self._group_by_node(
+                [uid for uid in user_ids if uid not in by_user]).items():
+            pipe = self.nodes[node].pipeline(transaction=False)
+
+            for uid in uids:
+                key = self.feed_key(uid, aggregate)
+                pipe.zrevrange(key, start, end)
+
+                if self.archive is not None:
+                    pipe.zcard(key)
+
+            results = iter(pipe.execute())
+
+            for uid in uids:
+                members = next(results)
+
+                if self.archive is not None:
+                    hot = next(results)
+
+                    if len(members) <= end - start:
+                        members = self._read_through(
+                            self.feed_key(uid, aggregate), start, end,
+                            members, hot)
+
+                by_user[uid] = members
+
+        return dict(zip(user_ids, self._load_pages(by_user[uid]
+                                                   for uid in user_ids)))
+
+    def _load_pages(self, pages):
+        '''Load the items of several pages with one call of the items loader,
+        see `feeds_for`. Outside of a scope an `ItemLoader` is given one, so
+        every page is loaded in a single batch.'''
+        loader = self.items_loader
+
+        if isinstance(loader, ItemLoader):
+            if self._deferring():
+                return [self._load_items(p) for p in pages]
+
+            with loader.scope():
+                pages = [self._load_items(p) for p in pages]
+                return [list(p) for p in pages]
+
+        pages, ids = self._page_ids(pages)
+
+        if not loader:
+            return pages
+
+        loaded = self._split_pages(pages, ids, loader(ids))
+
+        if loaded is None:
+            return [loader(p) for p in pages]
+
+        return loaded
+
+    def merged_feed(self, user_id, followee_ids, page, page_size=None,
+            source_size=None, refresh=False):
+        """Retrieve a page of the timeline of `user_id` merged at read time
+        from the individual feeds of `followee_ids`, instead of filling an
+        aggregate feed for every follower at write time.
+
+        The timeline is materialized in `ActivityFeed.merged_feed_key`, which
+        expires after `merged_ttl` seconds, and later pages are read from it.
+        On a single node the feeds are merged server side, with ZUNIONSTORE
+        or a script taking the newest `source_size` items of every feed.
+        Feeds spread over several nodes or cluster slots are read with one
+        pipeline per node and merged by the client.
+
+        :param user_id: [string] User ID.
+        :param followee_ids: [iterable] User IDs whose feeds are merged. Only
+                             consumed when the timeline is materialized.
+        :param page: [int] Page in the merged timeline to be retrieved.
+        :param page_size: [int, None] Page size. If None default page size for
+                          this object will be used.
+        :param source_size: [int, None] Number of newest items taken from every
+                            feed. If None `merged_source_size` is used, all
+                            items if that is None too.
+        :param refresh: [boolean, False] Materialize the timeline again even if
+                        it has not expired yet.
+
+        @return page from the merged timeline of `user_id`.
+        """
+        client = self.redis_for(user_id)
+        key = self.merged_feed_key(user_id)
+        start, end = self._page_range(page, page_size)
+
+        if not refresh:
+            pipe = client.pipeline(transaction=False)
+            pipe.zrevrange(key, start, end)
+            pipe.exists(key)
+            members, exists = pipe.execute()
+
+            if exists:
+                return self._load_items(members)
+
+        if source_size is None:
+            source_size = self.merged_source_size
+
+        self._materialize(client, key, followee_ids, source_size or 0,
+            self.merged_ttl)
+        return self._load_items(client.zrevrange(key, start, end))
+
+    def _materialize(self, client, key, followee_ids, source_size, ttl,
+            replace=True):
+        '''Replace `key` by the merged feeds of `followee_ids`, taking the
+        newest `source_size` items of every feed or all of them if 0, and
+        expire it after `ttl` seconds unless `ttl` is None. The feeds are
+        merged into the existing items of `key` if `replace` is False. With
+        `ActivityFeed.item_index` the feeds are merged by the client, so the
+        merged items can be indexed.'''
+        groups = self._group_by_node(followee_ids)
+
+        if replace and self.archive is not None:
+            self.archive.clear(key)
+
+        if len(self.nodes) == 1 and not self.cluster and not self.item_index:
+            pipe = client.pipeline()
+
+            if replace:
+                pipe.delete(key)
+
+            for uids in chunked(groups.get(0, ()), self.fanout_chunk_size):
+                self._merge_feeds(keys=[key] + [self.feed_key(uid, False)
+                    for uid in uids], args=[source_size], client=pipe)
+
+            self._finish_materialize(pipe, key, ttl)
+            return
+
+        merged = {}
+
+        for node, uids in groups.items():
+            pipe = self.nodes[node].pipeline(transaction=False)
+
+            for uid in uids:
+                pipe.zrevrange(self.feed_key(uid, False), 0, source_size - 1,
+                    withscores=True)
+
+            for rows in pipe.execute():
+                for member, score in rows:
+                    if merged.get(member, score) <= score:
+                        merged[member] = score
+
+        pipe = client.pipeline(transaction=not self.cluster)
+
+        if replace:
+            pipe.delete(key)
+
+        for rows in chunked(merged.items(), self.fanout_chunk_size):
+            zadd_many(pipe, key, [(s, m) for m, s in rows])
+            self._index_items(pipe, key, [m for m, _ in rows])
+
+        self._finish_materialize(pipe, key, ttl)
+
+    def _finish_materialize(self, pipe, key, ttl):
+        if self.max_size:
+            pipe.zremrangebyrank(key, 0, -self.max_size - 1)
+
+        if ttl is not None:
+            pipe.expire(key, ttl)
+
+        self._bump_versions(pipe, [key])
+        pipe.execute()
+
+    def touch(self, user_id):
+        """Record that `user_id` has been seen, keeping its aggregate feed
+        for another `active_window` seconds. Fan-out skips users not seen
+        within the window and their aggregate feed expires. When such a user
+        returns, the aggregate feed is rebuilt from the individual feeds of
+        the user and of its followees, see `activity_feed.delivery.Delivery`,
+        in one server side merge. `feed()` on an aggregate feed calls this.
+
+        :param user_id: [string] User ID.
+
+        @return True if the aggregate feed was rebuilt.
+        """
+        if self.active_window is None:
+            raise RuntimeError('tracking activity requires an active_window')
+
+        if self.delivery is None:
+            raise RuntimeError('rebuilding aggregate feeds requires a '
+                'delivery policy')
+
+        client = self.redis_for(user_id)
+        marker = self.last_seen_marker_key(user_id)
+        key = self.feed_key(user_id, True)
+        pipe = client.pipeline()
+        pipe.exists(marker)
+        pipe.set(marker, int(time.time()))
+        pipe.expire(marker, self.active_window)
+        pipe.expire(key, self.active_window)
+
+        if pipe.execute()[0]:
+            return False
+
+        followees = itertools.chain(self.delivery.followees(user_id),
+            [user_id])
+        self._materialize(client, key, followees,
+            self.max_size or self.merged_source_size or 0, self.active_window)
+        return True
 
     def full_feed(self, user_id, aggregate=None):
         """Retrieve the entire activity feed for a given `user_id`. You can configure
@@ -86,6 +952,9 @@ class ActivityFeed(object):
         your ORM (e.g. ActiveRecord) or your ODM (e.g. Mongoid), and have the page
         returned with loaded items rather than item IDs.
 
+        The whole feed is held in memory, use `ActivityFeed.iter_feed` for
+        large feeds.
+
         :param user_id: [string] User ID.
         :param aggregate: [boolean, False] Whether to retrieve the aggregate
                           feed for `user_id`.
@@ -95,13 +964,39 @@ class ActivityFeed(object):
         if aggregate is None:
             aggregate = self.aggregate
 
-        feederboard = self.feederboard_for(user_id, aggregate)
-        res = feederboard.leaders(1, page_size=feederboard.total_members(),
-            members_only=True)
-        return self._parse_feed_response(res)
+        key = self.feed_key(user_id, aggregate)
+        res = self.redis_for(user_id).zrevrange(key, 0, -1)
+
+        if self.archive is not None:
+            res += [m for m, _ in self.archive.rows(key)]
+
+        return self._load_items(res)
+
+    def iter_feed(self, user_id, aggregate=None, batch_size=None):
+        """Iterate over the entire activity feed for a given `user_id`, newest
+        first. The feed is read with keyset pagination in batches of
+        `batch_size` and every batch is loaded lazily, so memory use does not
+        depend on the size of the feed.
+
+        :param user_id: [string] User ID.
+        :param aggregate: [boolean, False] Whether to iterate over the
+                          aggregate feed for `user_id`.
+        :param batch_size: [int, None] Number of items per batch. If None
+                           default page size for this object will be used.
+        """
+        if aggregate is None:
+            aggregate = self.aggregate
+
+        key = self.feed_key(user_id, aggregate)
+
+        batch_size = batch_size or self.page_size
+
+        for rows in self._iter_rows(self.redis_for(user_id), key, batch_size):
+            for item in self._load_items([m for m, _ in rows]):
+                yield item
 
     def feed_between_timestamps(self, user_id, starting_timestamp,
-            ending_timestamp, aggregate=None):
+            ending_timestamp, aggregate=None, limit=None, offset=0):
         """Retrieve a page from the activity feed for a given `user_id` between a
         `starting_timestamp` and an `ending_timestamp`. You can configure
         `ActivityFeed.item_loader` with a Proc to retrieve an item from, for
@@ -113,8 +1008,11 @@ class ActivityFeed(object):
                                    in the feed are to be retrieved.
         :param ending_timestamp: [int] Ending timestamp between which items in
                                  the feed are to be retrieved.
-         :param aggregate: [boolean, False] Whether to retrieve items from the
-                           aggregate feed for `user_id`.
+        :param aggregate: [boolean, False] Whether to retrieve items from the
+                          aggregate feed for `user_id`.
+        :param limit: [int, None] Maximum number of items to return. If None
+                      every item in the range is returned.
+        :param offset: [int, 0] Number of items in the range to skip.
 
         :return feed items from the activity feed for a given `user_id` between
                 the `starting_timestamp` and `ending_timestamp`.
@@ -122,13 +1020,93 @@ class ActivityFeed(object):
         if aggregate is None:
             aggregate = self.aggregate
 
-        feederboard = self.feederboard_for(user_id, aggregate)
-        res = feederboard.members_from_score_range(starting_timestamp,
-                ending_timestamp, members_only=True)
-        return self._parse_feed_response(res)
+        if limit is None and not offset:
+            start = num = None
+        else:
+            start, num = offset, limit if limit is not None else -1
+
+        key = self.feed_key(user_id, aggregate)
+        min_score, max_score = self._score_range(starting_timestamp,
+            ending_timestamp)
+
+        if self.archive is None:
+            res = self.redis_for(user_id).zrevrangebyscore(key, max_score,
+                min_score, start=start, num=num)
+            return self._load_items(res)
+
+        pipe = self.redis_for(user_id).pipeline(transaction=False)
+        pipe.zrevrangebyscore(key, max_score, min_score, start=start, num=num)
+        pipe.zcount(key, min_score, max_score)
+        res, hot = pipe.execute()
+
+        if limit is None or len(res) < limit:
+            res += [m for m, _ in self._archived_between(key, min_score,
+                max_score, max(offset - hot, 0),
+                limit - len(res) if limit is not None else None)]
+
+        return self._load_items(res)
+
+    def _archived_between(self, key, min_score, max_score, start=0, num=None):
+        '''Archived rows of `key` in a score range, see
+        `Archive.rows_between`.'''
+        return self.archive.rows_between(key, min_score, max_score, start, num)
 
     between = feed_between_timestamps
 
+    def iter_between(self, user_id, starting_timestamp, ending_timestamp,
+            aggregate=None, batch_size=None):
+        """Iterate over the items in the activity feed for a given `user_id`
+        between a `starting_timestamp` and an `ending_timestamp`, newest first.
+        Items are read and loaded in batches, so only one batch is held in
+        memory at a time.
+
+        :param user_id: [string] User ID.
+        :param starting_timestamp: [int] Starting timestamp (inclusive).
+        :param ending_timestamp: [int] Ending timestamp (inclusive).
+        :param aggregate: [boolean, False] Whether to retrieve items from the
+                          aggregate feed for `user_id`.
+        :param batch_size: [int, None] Number of items per batch. If None
+                           default page size for this object will be used.
+        """
+        if aggregate is None:
+            aggregate = self.aggregate
+
+        key = self.feed_key(user_id, aggregate)
+        min_score, max_score = self._score_range(starting_timestamp,
+            ending_timestamp)
+
+        batch_size = batch_size or self.page_size
+
+        for rows in self._iter_rows(self.redis_for(user_id), key, batch_size,
+                max_score, min_score):
+            for item in self._load_items([m for m, _ in rows]):
+                yield item
+
+    def count_between(self, user_id, starting_timestamp, ending_timestamp,
+            aggregate=None):
+        """Return the number of items in the activity feed for a given
+        `user_id` between a `starting_timestamp` and an `ending_timestamp`.
+
+        :param user_id: [string] User ID.
+        :param starting_timestamp: [int] Starting timestamp (inclusive).
+        :param ending_timestamp: [int] Ending timestamp (inclusive).
+        :param aggregate: [boolean, False] Whether to count items in the
+                          aggregate feed for `user_id`.
+
+        @return the number of items between the two timestamps.
+        """
+        if aggregate is None:
+            aggregate = self.aggregate
+
+        key = self.feed_key(user_id, aggregate)
+        score_range = self._score_range(starting_timestamp, ending_timestamp)
+        count = self.redis_for(user_id).zcount(key, *score_range)
+
+        if self.archive is not None:
+            count += self.archive.count_between(key, *score_range)
+
+        return count
+
     def total_pages_in_feed(self, user_id, aggregate=None, page_size=None):
         """Return the total number of pages in the activity feed.
 
@@ -144,9 +1122,8 @@ class ActivityFeed(object):
         if aggregate is None:
             aggregate = self.aggregate
 
-        feed = self.feederboard_for(user_id, aggregate)
-        return feed.total_pages_in(self.feed_key(user_id, aggregate),
-            page_size or self.page_size)
+        total = self.total_items_in_feed(user_id, aggregate)
+        return int(math.ceil(total / float(page_size or self.page_size)))
 
     total_pages = total_pages_in_feed
 
@@ -162,7 +1139,18 @@ class ActivityFeed(object):
         if aggregate is None:
             aggregate = self.aggregate
 
-        return self.feederboard_for(user_id, aggregate).total_members()
+        key = self.feed_key(user_id, aggregate)
+        pulled = self._pulled_sources(user_id, aggregate)
+
+        if pulled:
+            total = self._pulled_count(user_id, key, pulled)
+        else:
+            total = self.redis_for(user_id).zcard(key)
+
+        if self.archive is not None:
+            total += self.archive.count(key)
+
+        return total
 
     total_items = total_items_in_feed
 
@@ -171,15 +1159,19 @@ class ActivityFeed(object):
 
         :param user_id [string] User ID.
         """
-        pipe = self.redis.pipeline()
-        pipe.multi()
-        pipe.delete(self.feed_key(user_id, False))
-        pipe.delete(self.feed_key(user_id, True))
+        keys = [self.feed_key(user_id, False), self.feed_key(user_id, True)]
+        pipe = self.redis_for(user_id).pipeline(transaction=not self.cluster)
+        pipe.delete(*keys)
+        self._bump_versions(pipe, keys)
         pipe.execute()
 
+        if self.archive is not None:
+            for key in keys:
+                self.archive.clear(key)
+
     def trim_feed(self, user_id, starting_timestamp, ending_timestamp,
             aggregate = None):
-        """Trim an activity feed between two timestamps.
+        """Trim an activity feed between two timestamps, in both tiers.
 
         :param user_id: [string] User ID.
         :param starting_timestamp: [int] Starting timestamp after which
@@ -192,13 +1184,18 @@ class ActivityFeed(object):
         if aggregate is None:
             aggregate = self.aggregate
 
-        feed = self.feederboard_for(user_id, aggregate)
-        feed.remove_members_in_score_range(starting_timestamp, ending_timestamp)
+        key = self.feed_key(user_id, aggregate)
+        score_range = self._score_range(starting_timestamp, ending_timestamp)
+        self._write(self.redis_for(user_id), [key], 'zremrangebyscore',
+            *score_range)
+
+        if self.archive is not None:
+            self.archive.remove_range_by_score(key, *score_range)
 
     trim = trim_feed
 
     def trim_feed_to_size(self, user_id, size, aggregate=None):
-        """Trim an activity down to a certain size
+        """Trim an activity down to a certain size, counting archived items.
 
         :param user_id: [string] User ID.
         :param size: [int] size of the feed we want to keep.
@@ -208,11 +1205,20 @@ class ActivityFeed(object):
         if aggregate is None:
             aggregate = self.aggregate
 
-        feed = self.feederboard_for(user_id, aggregate)
-        return feed.remove_members_outside_rank(size)
+        client = self.redis_for(user_id)
+        key = self.feed_key(user_id, aggregate)
+        removed = self._write(client, [key], 'zremrangebyrank', 0,
+            -size - 1)[0]
+
+        if self.archive is not None:
+            removed += self.archive.trim_to_size(key,
+                max(size - client.zcard(key), 0))
+
+        return removed
 
     def expire_feed(self, user_id, seconds, aggregate=None):
-        """Expire an activity feed after a set number of seconds.
+        """Expire an activity feed after a set number of seconds. Its
+        archived items expire at the same time.
 
         :param user_id: [string] User ID.
         :param seconds: [int] Number of seconds after which the activity feed
@@ -223,13 +1229,18 @@ class ActivityFeed(object):
         if aggregate is None:
             aggregate = self.aggregate
 
-        self.redis.expire(self.feed_key(user_id, aggregate), seconds)
+        key = self.feed_key(user_id, aggregate)
+        self._expire(self.redis_for(user_id), key, 'expire', seconds)
+
+        if self.archive is not None:
+            self.archive.expire_at(key, time.time() + seconds)
 
     expire_in = expire_feed
     expire_feed_in = expire_feed
 
     def expire_feed_at(self, user_id, timestamp, aggregate=None):
-        """Expire an activity feed at a given timestamp.
+        """Expire an activity feed at a given timestamp. Its archived items
+        expire at the same time.
 
         :param user_id: [string] User ID.
         :param timestamp: [int] Timestamp after which the activity feed will be
@@ -240,7 +1251,11 @@ class ActivityFeed(object):
         if aggregate is None:
             aggregate = self.aggregate
 
-        self.redis.expireat(self.feed_key(user_id, aggregate), timestamp)
+        key = self.feed_key(user_id, aggregate)
+        self._expire(self.redis_for(user_id), key, 'expireat', timestamp)
+
+        if self.archive is not None:
+            self.archive.expire_at(key, timestamp)
 
     expire_at = expire_feed_at
 
@@ -256,13 +1271,22 @@ class ActivityFeed(object):
         if aggregate is None:
             aggregate = self.aggregate
 
-        if aggregate:
-            pipe = self.redis.pipeline()
-            pipe.zadd(self.feed_key(user_id, False), timestamp, item_id)
-            pipe.zadd(self.feed_key(user_id, True), timestamp, item_id)
+        keys = [self.feed_key(user_id, False)]
+        client = self.redis_for(user_id)
+        timestamp = self._encode_score(timestamp)
+        item_id = self._encode_member(item_id)
+
+        if aggregate and (self.active_window is not None or self.item_index):
+            pipe = client.pipeline()
+            self._add_item(pipe, keys, timestamp, item_id)
+            self._add_aggregate(pipe, user_id, timestamp, item_id)
             pipe.execute()
-        else:
-            self.redis.zadd(self.feed_key(user_id), timestamp, item_id)
+            return
+
+        if aggregate:
+            keys.append(self.feed_key(user_id, True))
+
+        self._add_to_feeds(client, keys, timestamp, item_id)
 
     add_item = update_item
 
@@ -274,34 +1298,164 @@ class ActivityFeed(object):
         :param user_id: [string] User ID or an iterable of User IDs
         :param item_id: [string] Item ID.
         :param timestamp: [int] Timestamp for the item being added or updated.
+
+        :return list of `ChunkStats` if `user_id` is an iterable, see
+                `ActivityFeed.fanout_item`.
         """
         if isiterable(user_id):
-            pipeline = self.redis.pipeline()
+            return self.fanout_item(user_id, item_id, timestamp)
 
-            for uid in user_id:
-                pipeline.zadd(self.feed_key(uid, True), timestamp, item_id)
+        timestamp = self._encode_score(timestamp)
+        item_id = self._encode_member(item_id)
 
-            pipeline.execute()
-        else:
-            self.redis.zadd(self.feed_key(user_id, True), timestamp, item_id)
+        if self.active_window is None and not self.item_index:
+            self._add_to_feeds(self.redis_for(user_id),
+                [self.feed_key(user_id, True)], timestamp, item_id)
+            return
+
+        pipe = self.redis_for(user_id).pipeline()
+        self._add_aggregate(pipe, user_id, timestamp, item_id)
+        pipe.execute()
 
-    def remove_item(self, user_id, item_id):
+    def publish(self, user_id, item_id, timestamp):
+        """Add an item posted by `user_id` to both of its feeds and deliver
+        it according to `ActivityFeed.delivery`: it is aggregated into the
+        feeds of the followers of `user_id` if the account is pushed, and
+        merged in when the followers read their aggregate feed otherwise.
+
+        :param user_id: [string] User ID of the author.
+        :param item_id: [string] Item ID.
+        :param timestamp: [int] Timestamp for the item being added.
+
+        :return list of `ChunkStats` of the fan-out, empty if the item is
+                pulled.
+        """
+        if self.delivery is None:
+            raise RuntimeError('publishing items requires a delivery policy')
+
+        self.update_item(user_id, item_id, timestamp, True)
+
+        if not self.delivery.is_pushed(user_id):
+            return []
+
+        return self.fanout_item(self.delivery.followers(user_id), item_id,
+            timestamp)
+
+    def fanout_item(self, user_ids, item_id, timestamp, chunk_size=None,
+            max_in_flight=None):
+        """Aggregate an item into the aggregate activity feeds of many users.
+        User IDs are streamed from `user_ids` and written in pipelines of
+        `chunk_size`, so arbitrarily large follower lists can be used without
+        building one huge request. With several nodes every pipeline holds
+        users of a single node.
+
+        :param user_ids: [iterable] User IDs, e.g. a generator of followers.
+        :param item_id: [string] Item ID.
+        :param timestamp: [int] Timestamp for the item being added or updated.
+        :param chunk_size: [int, None] Number of users per pipeline. If None
+                           `ActivityFeed.fanout_chunk_size` will be used.
+        :param max_in_flight: [int, None] Maximum number of pipelines executing
+                              concurrently. If None
+                              `ActivityFeed.fanout_max_in_flight` will be used.
+
+        :return list of `ChunkStats` (index, size, elapsed, node), one per
+                chunk.
+        """
+        fanout = self._fanout(chunk_size or self.fanout_chunk_size,
+            max_in_flight or self.fanout_max_in_flight)
+        timestamp = self._encode_score(timestamp)
+        item_id = self._encode_member(item_id)
+
+        def add(pipe, uid):
+            self._add_aggregate(pipe, uid, timestamp, item_id)
+
+        return fanout.execute(user_ids, add)
+
+    def remove_item(self, user_id, item_id, chunk_size=None):
         """Remove an item from the activity feed for a given `user_id`. This
         will also remove the item from the aggregate activity feed for the
         user.
 
-        :param user_id: [string] User ID.
+        Items are removed with variadic ZREM commands, sent in one pipeline
+        per chunk of users.
+
+        :param user_id: [string] User ID or an iterable of User IDs.
         :param item_id: [string] Item ID or an iterable of Item ID's.
+        :param chunk_size: [int, None] Number of users per pipeline and maximum
+                           number of items per ZREM. If None
+                           `ActivityFeed.fanout_chunk_size` will be used.
         """
-        # TODO: Optimize removing many members
+        if not isiterable(user_id):
+            user_id = (user_id,)
+
         if not isiterable(item_id):
             item_id = (item_id,)
 
-        for _id in item_id:
-            feederboard = self.feederboard_for(user_id, False)
-            feederboard.remove_member(_id)
-            feederboard = self.feederboard_for(user_id, True)
-            feederboard.remove_member(_id)
+        chunk_size = chunk_size or self.fanout_chunk_size
+        item_chunks = list(chunked(map(self._encode_member, item_id),
+            chunk_size))
+
+        if not item_chunks:
+            return
+
+        def remove(pipe, uid):
+            keys = [self.feed_key(uid, False), self.feed_key(uid, True)]
+
+            for items in item_chunks:
+                for key in keys:
+                    pipe.zrem(key, *items)
+
+                    if self.archive is not None:
+                        self.archive.remove(key, items)
+
+            self._bump_versions(pipe, keys)
+
+        self._fanout(chunk_size).execute(user_id, remove)
+
+    def retract_item(self, item_id, chunk_size=None):
+        """Remove an item from every aggregate feed it was written to, e.g.
+        when a post is deleted, without scanning follower lists. Requires
+        `ActivityFeed.item_index`, which records the aggregate feeds written
+        by `aggregate_item()`, `fanout_item()`, `publish()` and
+        `update_item(aggregate=True)`, backfilled by `FollowGraph.follow()`
+        or rebuilt by `touch()` in a set per item and node.
+
+        The set of every node is read with SSCAN and the item is removed with
+        one pipeline of ZREM commands per chunk of feeds, which also removes
+        the feeds from the set. The individual feed of the author is left to
+        `remove_item()`.
+
+        :param item_id: [string] Item ID.
+        :param chunk_size: [int, None] Number of feeds per pipeline. If None
+                           `ActivityFeed.fanout_chunk_size` will be used.
+
+        @return number of feeds the item was removed from.
+        """
+        if not self.item_index:
+            raise RuntimeError('retracting items requires an item_index')
+
+        chunk_size = chunk_size or self.fanout_chunk_size
+        index_key = self.item_feeds_key(item_id)
+        item_id = self._encode_member(item_id)
+        removed = 0
+
+        for client in self.nodes:
+            keys = client.sscan_iter(index_key, count=chunk_size)
+
+            for chunk in chunked(map(safe_unicode, keys), chunk_size):
+                pipe = client.pipeline(transaction=False)
+
+                for key in chunk:
+                    pipe.zrem(key, item_id)
+
+                    if self.archive is not None:
+                        self.archive.remove(key, [item_id])
+
+                self._bump_versions(pipe, chunk)
+                pipe.srem(index_key, *chunk)
+                removed += sum(pipe.execute()[:len(chunk)])
+
+        return removed
 
     def check_item(self, user_id, item_id, aggregate=None):
         """Check to see if an item is in the activity feed for a given `user_id`.
@@ -314,31 +1468,306 @@ class ActivityFeed(object):
         if aggregate is None:
             aggregate = self.aggregate
 
-        if aggregate:
-            feederboard_aggregate = self.feederboard_for(user_id, True)
-            return feederboard_aggregate.check_member(item_id)
+        key = self.feed_key(user_id, aggregate)
+        item_id = self._encode_member(item_id)
+        score = self.redis_for(user_id).zscore(key, item_id)
 
-        feederboard_individual = self.feederboard_for(user_id, False)
-        return feederboard_individual.check_member(item_id)
+        if score is None and self.archive is not None:
+            score = self.archive.score(key, item_id)
 
-    def feed_key(self, user_id, aggregate=None):
-        """Feed key for a `user_id` composed of:
+        return score is not None
 
-        Feed: `namespace:user_id`
-        Aggregate feed: `namespace`:`aggregate_key`:`user_id`
+    def demote(self, user_id):
+        """Move the items of both feeds of `user_id` that fall outside the
+        hot tier to `ActivityFeed.archive`. Items beyond the newest
+        `hot_size` items and items older than `hot_ttl` seconds are moved.
 
-        @return feed key.
+        :param user_id: [string] User ID.
+
+        @return the number of items moved.
         """
-        if aggregate is None:
-            aggregate = self.aggregate
+        client = self.redis_for(user_id)
+        return sum(self._demote_key(client, self.feed_key(user_id, aggregate))
+                   for aggregate in (False, True))
 
-        if aggregate:
-            return "{}:{}:{}".format(self.namespace, self.aggregate_key, user_id)
+    def demote_all(self):
+        """Demote the items outside the hot tier of every feed in the
+        namespace, see `ActivityFeed.demote`. Keys are walked with SCAN, so
+        this is safe to run periodically, e.g. from an
+        `activity_feed.archive.Demoter` thread.
+
+        @return the number of items moved.
+        """
+        return sum(self._demote_key(client, key)
+                   for client in self.nodes
+                   for keys in self._scan_feeds(client, self.fanout_chunk_size)
+                   for key in keys)
+
+    def _scan_feeds(self, client, count):
+        '''Walk the feed keys of the namespace on one node with SCAN, yielding
+        lists of at most `count` keys. Version counters and other non sorted
+        set keys are skipped with one pipelined TYPE per list.'''
+        match = '{}*'.format(self._key_prefix)
+
+        for keys in chunked(client.scan_iter(match=match, count=count), count):
+            pipe = client.pipeline(transaction=False)
+
+            for key in keys:
+                pipe.type(key)
+
+            yield [key for key, kind in zip(keys, pipe.execute())
+                   if kind in (b'zset', 'zset')
+                   and not self._is_merged_key(key)]
+
+    def _is_merged_key(self, key):
+        if isinstance(key, bytes):
+            key = key.decode('utf-8')
+
+        return key.startswith(self._merged_key_prefix)
+
+    def _demote_key(self, client, key):
+        if self.archive is None:
+            raise RuntimeError('demoting items requires an archive')
+
+        rows = OrderedDict()
+
+        if self.hot_size is not None:
+            rows.update(client.zrange(key, 0, -self.hot_size - 1,
+                withscores=True))
+
+        if self.hot_ttl is not None:
+            cutoff = self._score_range(time.time() - self.hot_ttl, 0)[0]
+            rows.update(client.zrangebyscore(key, '-inf',
+                '({!r}'.format(float(cutoff)), withscores=True))
+
+        if not rows:
+            return 0
+
+        # Archive first: a failure in between leaves an item in both tiers
+        # instead of losing it.
+        self.archive.append(key, rows.items())
+        pipe = client.pipeline()
+
+        for members in chunked(rows, self.fanout_chunk_size):
+            pipe.zrem(key, *members)
+
+        self._bump_versions(pipe, [key])
+        pipe.execute()
+        return len(rows)
+
+    def export_feeds(self, fileobj, format='binary', chunk_size=None,
+            progress=None):
+        """Write every feed of the namespace to `fileobj` as a stream of
+        (key, member, score) records, grouped by key. Keys are walked with
+        SCAN and the first `chunk_size` items of every feed of a SCAN batch
+        are read with one pipeline of ZRANGE WITHSCORES; longer feeds are
+        then read to the end `chunk_size` items at a time before the next
+        feed is written, so neither the server nor the client holds more
+        than a few chunks at a time. Feeds written to while exporting may be
+        exported partially. Archived items are exported after the hot tier
+        of their feed, and fully archived feeds at the end; an import writes
+        them all to Redis.
+
+        :param fileobj: [file] Binary file object to write to.
+        :param format: [string, 'binary'] `binary` or `ndjson`, see
+                       `activity_feed.transfer`.
+        :param chunk_size: [int, None] Number of keys per SCAN batch and of
+                           items per ZRANGE. If None the fanout chunk size of
+                           this object will be used.
+        :param progress: [callable, None] Called with a `TransferStats`
+                         after every chunk.
+
+        @return `TransferStats` of the export.
+        """
+        chunk_size = chunk_size or self.fanout_chunk_size
+        writer = transfer.writer(fileobj, format)
+        started = time.time()
+        keys = records = 0
+
+        for client in self.nodes:
+            for batch in self._scan_feeds(client, chunk_size):
+                keys += len(batch)
+                pipe = client.pipeline(transaction=False)
+
+                for key in batch:
+                    pipe.zrange(key, 0, chunk_size - 1, withscores=True)
+
+                for key, rows in zip(batch, pipe.execute()):
+                    records += self._export_feed(client, writer, key, rows,
+                        chunk_size)
+
+                if progress is not None:
+                    progress(transfer.TransferStats(keys, records,
+                        writer.bytes, time.time() - started))
 
-        return "{}:{}".format(self.namespace, user_id)
+        if self.archive is not None:
+            for batch in chunked(self.archive.keys(), chunk_size):
+                batch = self._archived_only(batch)
+                keys += len(batch)
+
+                for key in batch:
+                    records += self._export_archived(writer, key)
+
+                if progress is not None and batch:
+                    progress(transfer.TransferStats(keys, records,
+                        writer.bytes, time.time() - started))
+
+        return transfer.TransferStats(keys, records, writer.bytes,
+            time.time() - started)
+
+    def _export_feed(self, client, writer, key, rows, chunk_size):
+        '''Write the feed `key` starting with its first `rows`, reading the
+        rest `chunk_size` items at a time, then its archived items, so the
+        records of a feed are contiguous. Returns the number of records.'''
+        start = records = 0
+
+        while True:
+            for member, score in rows:
+                writer.write(key, member, score)
+
+            records += len(rows)
+
+            if len(rows) < chunk_size:
+                break
+
+            start += chunk_size
+            rows = client.zrange(key, start, start + chunk_size - 1,
+                withscores=True)
+
+        if self.archive is not None:
+            records += self._export_archived(writer, key)
+
+        return records
+
+    def _export_archived(self, writer, key):
+        rows = self.archive.rows(key)
+
+        for member, score in rows:
+            writer.write(key, member, score)
+
+        return len(rows)
+
+    def _archived_only(self, keys):
+        '''Return the archive `keys` of this namespace with archived items and
+        no hot tier in Redis, checked with one pipeline per node.'''
+        keys = [k for k in keys if safe_unicode(k).startswith(self._key_prefix)
+                and self.archive.count(k)]
+        groups = OrderedDict()
+
+        for key in keys:
+            groups.setdefault(self._node_index(self._user_id_for_key(key)),
+                []).append(key)
+
+        archived = []
+
+        for node, node_keys in groups.items():
+            pipe = self.nodes[node].pipeline(transaction=False)
+
+            for key in node_keys:
+                pipe.exists(key)
+
+            archived += [k for k, exists in zip(node_keys, pipe.execute())
+                         if not exists]
+
+        return archived
+
+    def import_feeds(self, fileobj, format='binary', chunk_size=None,
+            skip=0, progress=None):
+        """Restore feeds written by `ActivityFeed.export_feeds`. Records are
+        added with pipelined ZADD, `chunk_size` records per pipeline and
+        node, and every feed is routed to the node of its user.
+
+        Adding an item twice is harmless, so an interrupted import can be
+        resumed by passing the `records` count of the last reported
+        `TransferStats` as `skip`.
+
+        :param fileobj: [file] Binary file object to read from.
+        :param format: [string, 'binary'] `binary` or `ndjson`.
+        :param chunk_size: [int, None] Number of records per pipeline. If None
+                           the fanout chunk size of this object will be used.
+        :param skip: [int, 0] Number of leading records to skip.
+        :param progress: [callable, None] Called with a `TransferStats`
+                         after every chunk.
+
+        @return `TransferStats` of the import.
+        """
+        chunk_size = chunk_size or self.fanout_chunk_size
+        reader = transfer.reader(fileobj, format)
+        started = time.time()
+        state = {'keys': 0, 'records': 0, 'last': None}
+
+        def counted(records):
+            for key, member, score in records:
+                if key != state['last']:
+                    state['keys'] += 1
+                    state['last'] = key
+
+                state['records'] += 1
+                yield key, member, score
+
+        records = counted(reader)
+
+        for _ in itertools.islice(records, skip):
+            pass
+
+        for chunk in chunked(records, chunk_size):
+            groups = OrderedDict()
+
+            for key, member, score in chunk:
+                node = self._node_index(self._user_id_for_key(key))
+                groups.setdefault(node, OrderedDict()).setdefault(key,
+                    []).append((score, member))
+
+            for node, feeds in groups.items():
+                pipe = self.nodes[node].pipeline(transaction=False)
+
+                for key, rows in feeds.items():
+                    zadd_many(pipe, key, rows)
+
+                self._bump_versions(pipe, feeds)
+                pipe.execute()
+
+            if progress is not None:
+                progress(transfer.TransferStats(state['keys'],
+                    state['records'], reader.bytes, time.time() - started))
+
+        return transfer.TransferStats(state['keys'], state['records'],
+            reader.bytes, time.time() - started)
+
+    def _user_id_for_key(self, key):
+        '''User ID of a feed key of this namespace, used to route restored
+        feeds. Keys of other namespaces are routed by the key itself.'''
+        if isinstance(key, bytes):
+            key = key.decode('utf-8')
+
+        for prefix in (self._aggregate_key_prefix, self._key_prefix):
+            if key.startswith(prefix):
+                user_id = key[len(prefix):]
+
+                if self.hash_tags and user_id.startswith('{') and \
+                        user_id.endswith('}'):
+                    user_id = user_id[1:-1]
+
+                return user_id
+
+        return key
+
+    def batch(self):
+        """Return a `activity_feed.batch.Batch` queueing calls to this
+        object, reads included, and sending them in one round trip per node.
+
+            with activity_feed.batch() as b:
+                page = b.feed(user_id, 1)
+                b.update_item(user_id, item_id, timestamp)
+
+            page.result()
+        """
+        return Batch(self)
 
     def feederboard_for(self, user_id, aggregate=None):
         """Retrieve a reference to the activity feed for a given `user_id`.
+        `ActivityFeed` itself talks to Redis directly, this is kept for callers
+        who want the `Leaderboard` API on a feed.
 
         :param user_id: [string] User ID.
         :param aggregate: [boolean, False] Whether to retrieve the aggregate
@@ -350,4 +1779,4 @@ class ActivityFeed(object):
             aggregate = self.aggregate
 
         return Leaderboard(self.feed_key(user_id, aggregate),
-            connection_pool=self.redis.connection_pool)
+            connection_pool=self.redis_for(user_id).connection_pool)
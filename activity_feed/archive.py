@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+"""
+Append-only on-disk archive for the cold tier of activity feeds.
+"""
+from __future__ import absolute_import
+
+import bisect
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+
+from ._compat import text_type
+from .cache import LRUCache
+from .sharding import _hash
+
+#: Record header: operation, key length, member length, score.
+_HEADER = struct.Struct('>BHHd')
+
+_ADD = 0
+_REMOVE = 1
+_CLEAR = 2
+_EXPIRE = 3
+
+class _Shard(object):
+    """A single append-only log file, the index of its records and a cache
+    of replayed feeds."""
+
+    def __init__(self, path, cache_size):
+        self.path = path
+        self.lock = threading.RLock()
+        self.cache = LRUCache(cache_size)
+        self.map = None
+        self.open()
+
+    def open(self):
+        self.fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT,
+            0o644)
+        self.index = {}
+        self.indexed = 0
+        self.cache.clear()
+
+    def append(self, records):
+        '''Append encoded records with a single write.'''
+        with self.lock:
+            os.write(self.fd, b''.join(records))
+
+    def view(self):
+        '''Return an mmap covering the whole file, indexing new records.'''
+        with self.lock:
+            size = os.fstat(self.fd).st_size
+
+            if size and (self.map is None or len(self.map) < size):
+                if self.map is not None:
+                    self.map.close()
+
+                self.map = mmap.mmap(self.fd, size, access=mmap.ACCESS_READ)
+
+            if size > self.indexed:
+                self._index(size)
+
+            return self.map
+
+    def _index(self, size):
+        pos = self.indexed
+        buf = self.map
+
+        while pos + _HEADER.size <= size:
+            _, key_len, member_len, _ = _HEADER.unpack_from(buf, pos)
+            end = pos + _HEADER.size + key_len + member_len
+
+            if end > size:
+                break
+
+            key = buf[pos + _HEADER.size:pos + _HEADER.size + key_len]
+            self.index.setdefault(key, array('L')).append(pos)
+            self.cache.delete(key)
+            pos = end
+
+        self.indexed = pos
+
+    def read(self, key):
+        '''Replay the records of `key` into a dict of member -> score and
+        the expiry timestamp of the feed, or None.'''
+        with self.lock:
+            buf = self.view()
+            members = {}
+            expires = None
+
+            for pos in self.index.get(key, ()):
+                op, key_len, member_len, score = _HEADER.unpack_from(buf, pos)
+                start = pos + _HEADER.size + key_len
+                member = buf[start:start + member_len]
+
+                if op == _ADD:
+                    members[member] = score
+                elif op == _REMOVE:
+                    members.pop(member, None)
+                elif op == _EXPIRE:
+                    expires = score
+                else:
+                    members.clear()
+                    expires = None
+
+            return members, expires
+
+    def close(self):
+        with self.lock:
+            if self.map is not None:
+                self.map.close()
+                self.map = None
+
+            os.close(self.fd)
+
+def _record(op, key, member=b'', score=0.0):
+    return _HEADER.pack(op, len(key), len(member), score) + key + member
+
+def _bytes(value):
+    if isinstance(value, bytes):
+        return value
+
+    if not isinstance(value, text_type):
+        value = text_type(value)
+
+    return value.encode('utf-8')
+
+class Archive(object):
+    """Cold tier of activity feeds, stored in `shards` append-only files.
+
+    Every feed key maps to one shard file. Adds, removals, feed deletions
+    and expiry times are appended as small binary records, files are read with mmap and an
+    in-memory index keeps the offsets of the records of every feed. Records
+    appended by other processes are picked up on the next read.
+
+    :param directory: [string] Directory holding the shard files.
+    :param shards: [int, 16] Number of shard files.
+    :param cache_size: [int, 128] Number of replayed feeds kept in memory.
+    """
+
+    def __init__(self, directory, shards=16, cache_size=128):
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self.directory = directory
+        self._shards = [
+            _Shard(os.path.join(directory, 'shard-%03d.log' % i),
+                max(1, cache_size // shards))
+            for i in range(shards)]
+
+    def _shard(self, key):
+        return self._shards[_hash(key) % len(self._shards)]
+
+    def append(self, key, rows):
+        '''Archive `rows`, an iterable of (member, score) tuples. Rows added
+        to an expired feed start a new one, like ZADD to an expired key.'''
+        key = _bytes(key)
+        records = [_record(_ADD, key, _bytes(m), float(s)) for m, s in rows]
+
+        if records:
+            if key in self and self._expired(self._read(key)[2]):
+                records.insert(0, _record(_CLEAR, key))
+
+            self._shard(key).append(records)
+
+    def remove(self, key, members):
+        '''Remove `members` from the archived part of a feed.'''
+        key = _bytes(key)
+
+        if key in self:
+            self._shard(key).append(
+                [_record(_REMOVE, key, _bytes(m)) for m in members])
+
+    def remove_range_by_score(self, key, min_score, max_score):
+        '''Remove the archived items of a feed scored between `min_score`
+        and `max_score`, both inclusive.
+
+        @return the number of items removed.'''
+        members = [m for m, s in self.rows(key) if min_score <= s <= max_score]
+
+        if members:
+            self.remove(key, members)
+
+        return len(members)
+
+    def trim_to_size(self, key, size):
+        '''Keep the newest `size` archived items of a feed.
+
+        @return the number of items removed.'''
+        members = [m for m, _ in self.rows(key)[size:]]
+
+        if members:
+            self.remove(key, members)
+
+        return len(members)
+
+    def expire_at(self, key, timestamp):
+        '''Expire the archived part of a feed at `timestamp`.'''
+        key = _bytes(key)
+
+        if key in self:
+            self._shard(key).append([_record(_EXPIRE, key, b'',
+                float(timestamp))])
+
+    def clear(self, key):
+        '''Remove the archived part of a feed.'''
+        key = _bytes(key)
+
+        if key in self:
+            self._shard(key).append([_record(_CLEAR, key)])
+
+    def __contains__(self, key):
+        key = _bytes(key)
+        shard = self._shard(key)
+
+        with shard.lock:
+            shard.view()
+            return key in shard.index
+
+    def _read(self, key):
+        '''Return the cached (rows, negated scores, expires) of a feed, see
+        `rows`. The negated scores are ascending, for bisection.'''
+        shard = self._shard(key)
+
+        with shard.lock:
+            shard.view()
+            entry = shard.cache.get(key)
+
+            if entry is None:
+                members, expires = shard.read(key)
+                rows = sorted(members.items(), key=lambda r: (r[1], r[0]),
+                              reverse=True)
+                entry = (rows, [-s for _, s in rows], expires)
+                shard.cache.set(key, entry)
+
+            return entry
+
+    def _expired(self, expires):
+        return expires is not None and expires <= time.time()
+
+    def rows(self, key):
+        '''Return the archived (member, score) rows of a feed, ordered by
+        score and member, both descending.'''
+        rows, _, expires = self._read(_bytes(key))
+        return [] if self._expired(expires) else rows
+
+    def _bounds(self, key, min_score, max_score):
+        rows, scores, expires = self._read(_bytes(key))
+
+        if self._expired(expires):
+            return rows, 0, 0
+
+        return rows, bisect.bisect_left(scores, -float(max_score)), \
+            bisect.bisect_right(scores, -float(min_score))
+
+    def rows_between(self, key, min_score, max_score, start=0, num=None):
+        '''Return the archived rows of a feed scored between `min_score` and
+        `max_score`, both inclusive, ordered like `rows`. `start` rows are
+        skipped and at most `num` returned if `num` is not None.'''
+        rows, lo, hi = self._bounds(key, min_score, max_score)
+        lo += start
+
+        if num is not None:
+            hi = min(hi, lo + num)
+
+        return rows[lo:hi]
+
+    def count_between(self, key, min_score, max_score):
+        '''Number of archived items of a feed scored between `min_score` and
+        `max_score`, both inclusive.'''
+        _, lo, hi = self._bounds(key, min_score, max_score)
+        return max(hi - lo, 0)
+
+    def keys(self):
+        '''Iterate the keys of the feeds with archived records, including
+        feeds whose records have all been removed since.'''
+        for shard in self._shards:
+            with shard.lock:
+                shard.view()
+                keys = list(shard.index)
+
+            for key in keys:
+                yield key
+
+    def count(self, key):
+        return len(self.rows(key))
+
+    def score(self, key, member):
+        '''Return the archived score of `member`, or None.'''
+        member = _bytes(member)
+
+        for m, score in self.rows(key):
+            if m == member:
+                return score
+
+    def compact(self):
+        '''Rewrite every shard with only the live records. Must not run
+        while other processes append to the archive.'''
+        for shard in self._shards:
+            with shard.lock:
+                shard.view()
+                tmp = shard.path + '.tmp'
+
+                with open(tmp, 'wb') as f:
+                    for key in list(shard.index):
+                        members, expires = shard.read(key)
+
+                        if self._expired(expires):
+                            continue
+
+                        f.write(b''.join(_record(_ADD, key, m, s)
+                                         for m, s in members.items()))
+
+                        if expires is not None:
+                            f.write(_record(_EXPIRE, key, b'', expires))
+
+                shard.close()
+                os.rename(tmp, shard.path)
+                shard.open()
+
+    def close(self):
+        for shard in self._shards:
+            shard.close()
+
+class Demoter(threading.Thread):
+    """Background thread calling `ActivityFeed.demote_all()` every
+    `interval` seconds until `stop()` is called."""
+
+    def __init__(self, activity_feed, interval=60):
+        super(Demoter, self).__init__()
+        self.daemon = True
+        self.activity_feed = activity_feed
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.activity_feed.demote_all()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+Storage backends usable in place of a Redis client.
+
+`ActivityFeed` talks to its storage through the redis-py client API, so a
+backend is any object implementing the commands it uses::
+
+    zadd(key, mapping) or zadd(key, score, member)
+    zrem(key, *members)
+    zscore(key, member)
+    zcard(key)
+    zcount(key, min, max)
+    zrange(key, start, end, withscores=False)
+    zrevrange(key, start, end, withscores=False)
+    zrangebyscore(key, min, max, start=None, num=None, withscores=False)
+    zrevrangebyscore(key, max, min, start=None, num=None, withscores=False)
+    zremrangebyscore(key, min, max)
+    zremrangebyrank(key, start, end)
+    sadd(key, *members), srem(key, *members), scard(key)
+    sismember(key, member), smembers(key)
+    sscan(key, cursor=0, match=None, count=None), sscan_iter(key)
+    get(key), incr(key)
+    delete(*keys), exists(*keys), keys(pattern), scan_iter(match), type(key)
+    expire(key, seconds), expireat(key, timestamp), ttl(key)
+    pipeline(transaction=True)
+    register_script(script)
+
+Members are returned as byte strings and scores as floats, like redis-py
+does without `decode_responses`. `Backend` provides pipelines and the
+server side scripts on top of these commands.
+"""
+from __future__ import absolute_import
+
+import binascii
+
+from .. import scripts
+from .._compat import text_type
+
+def _encode(value):
+    '''Encode a member or key the way redis-py sends it.'''
+    if isinstance(value, bytes):
+        return value
+
+    if isinstance(value, float):
+        return repr(value).encode('ascii')
+
+    if not isinstance(value, text_type):
+        value = text_type(value)
+
+    return value.encode('utf-8')
+
+def _member_cursor(member):
+    '''SSCAN cursor resuming after `member`. Unlike an offset it stays valid
+    when members are removed between calls, as Redis cursors do.'''
+    return int(binascii.hexlify(b'\x01' + member), 16)
+
+def _cursor_member(cursor):
+    '''Member a cursor of `_member_cursor` resumes after, None for 0.'''
+    cursor = int(cursor)
+
+    if not cursor:
+        return None
+
+    return binascii.unhexlify('0%x' % cursor)[1:]
+
+def _parse_bound(value):
+    '''Parse a ZRANGEBYSCORE bound into (score, exclusive).'''
+    if isinstance(value, bytes):
+        value = value.decode('ascii')
+
+    if isinstance(value, text_type) and value.startswith('('):
+        return float(value[1:]), True
+
+    return float(value), False
+
+def _zadd_pairs(args, kwargs):
+    '''(score, member) pairs of a ZADD in either redis-py calling style.'''
+    if len(args) == 1 and isinstance(args[0], dict):
+        return [(s, m) for m, s in args[0].items()]
+
+    return list(zip(args[::2], args[1::2])) + \
+        [(s, m) for m, s in kwargs.items()]
+
+def _index_range(length, start, end):
+    '''Python slice bounds for inclusive Redis ranks, which may be negative.'''
+    if start < 0:
+        start = max(length + start, 0)
+
+    if end < 0:
+        end = length + end
+
+    return start, min(end, length - 1) + 1
+
+class Backend(object):
+    """Base class for storage backends."""
+
+    #: Python implementations of the Lua scripts in `activity_feed.scripts`.
+    scripts = {
+        scripts.ADD_CAPPED: 'add_capped',
+        scripts.MERGE_FEEDS: 'merge_feeds',
+        scripts.ADD_IF_ACTIVE: 'add_if_active',
+    }
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return Pipeline(self, transaction)
+
+    def execute_pipeline(self, commands, transaction):
+        '''Run queued `(name, args, kwargs)` commands and return the results.
+        Backends make the run atomic if `transaction` is set.'''
+        return [getattr(self, name)(*args, **kwargs)
+                for name, args, kwargs in commands]
+
+    def scan_iter(self, match=None, count=None):
+        return iter(self.keys(match or '*'))
+
+    def sscan_iter(self, name, match=None, count=None):
+        cursor = '0'
+
+        while cursor != 0:
+            cursor, members = self.sscan(name, cursor, match, count)
+
+            for member in members:
+                yield member
+
+    def register_script(self, script):
+        if script not in self.scripts:
+            raise ValueError('unsupported script')
+
+        return Script(self, self.scripts[script])
+
+    def run_script(self, name, keys, args):
+        return getattr(self, name)(keys, args)
+
+    def add_capped(self, keys, args):
+        '''Python version of `scripts.ADD_CAPPED`.'''
+        score, member, size = args
+
+        for key in keys:
+            self.zadd(key, {member: score})
+            self.zremrangebyrank(key, 0, -int(size) - 1)
+
+        return len(keys)
+
+    def merge_feeds(self, keys, args):
+        '''Python version of `scripts.MERGE_FEEDS`.'''
+        limit = int(args[0])
+
+        for key in keys[1:]:
+            for member, score in self.zrevrange(key, 0, limit - 1,
+                    withscores=True):
+                current = self.zscore(keys[0], member)
+
+                if current is None or current < score:
+                    self.zadd(keys[0], {member: score})
+
+        return self.zcard(keys[0])
+
+    def add_if_active(self, keys, args):
+        '''Python version of `scripts.ADD_IF_ACTIVE`.'''
+        ttl = self.ttl(keys[0])
+
+        if ttl == -2:
+            return 0
+
+        score, member, size = args
+
+        for key in keys[1:]:
+            self.zadd(key, {member: score})
+
+            if int(size) > 0:
+                self.zremrangebyrank(key, 0, -int(size) - 1)
+
+            if ttl > 0:
+                self.expire(key, ttl)
+
+        return len(keys) - 1
+
+class Pipeline(object):
+    """Queue commands for a `Backend` and run them on `execute()`."""
+
+    def __init__(self, backend, transaction=True):
+        self.backend = backend
+        self.transaction = transaction
+        self.commands = []
+
+    def __getattr__(self, name):
+        if not callable(getattr(self.backend, name, None)):
+            raise AttributeError(name)
+
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+
+        return queue
+
+    def __len__(self):
+        return len(self.commands)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.reset()
+
+    def multi(self):
+        self.transaction = True
+
+    def reset(self):
+        self.commands = []
+
+    def execute(self):
+        commands, self.commands = self.commands, []
+        return self.backend.execute_pipeline(commands, self.transaction)
+
+class Script(object):
+    """Callable returned by `Backend.register_script`."""
+
+    def __init__(self, backend, name):
+        self.backend = backend
+        self.name = name
+
+    def __call__(self, keys=[], args=[], client=None):
+        client = client if client is not None else self.backend
+        return client.run_script(self.name, list(keys), list(args))
@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+"""
+Pure Python in-memory storage backend.
+"""
+from __future__ import absolute_import
+
+import bisect
+import fnmatch
+import threading
+import time
+
+from redis.exceptions import ResponseError
+
+from . import Backend, _encode, _parse_bound, _index_range, _zadd_pairs, \
+    _member_cursor, _cursor_member
+
+class _Top(object):
+    '''Sorts after every member, used to bisect past a run of equal scores.'''
+
+    def __lt__(self, other):
+        return False
+
+    def __gt__(self, other):
+        return True
+
+_TOP = _Top()
+
+class SortedSet(object):
+    """A sorted set kept as a sorted list of (score, member) tuples and a
+    dict mapping members to scores."""
+
+    def __init__(self):
+        self.entries = []
+        self.scores = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, member, score):
+        '''Add or update `member`, returns True if it was added.'''
+        old = self.scores.get(member)
+
+        if old is not None:
+            if old == score:
+                return False
+
+            self._remove_entry(old, member)
+
+        self.scores[member] = score
+        bisect.insort(self.entries, (score, member))
+        return old is None
+
+    def remove(self, member):
+        score = self.scores.pop(member, None)
+
+        if score is None:
+            return False
+
+        self._remove_entry(score, member)
+        return True
+
+    def _remove_entry(self, score, member):
+        del self.entries[bisect.bisect_left(self.entries, (score, member))]
+
+    def score_range(self, min_score, max_score):
+        '''Return the slice bounds of the entries between two bounds.'''
+        score, exclusive = _parse_bound(min_score)
+
+        if exclusive:
+            lo = bisect.bisect_right(self.entries, (score, _TOP))
+        else:
+            lo = bisect.bisect_left(self.entries, (score,))
+
+        score, exclusive = _parse_bound(max_score)
+
+        if exclusive:
+            hi = bisect.bisect_left(self.entries, (score,))
+        else:
+            hi = bisect.bisect_right(self.entries, (score, _TOP))
+
+        return lo, max(lo, hi)
+
+class MemoryBackend(Backend):
+    """Thread safe in-memory backend for tests and single process tools.
+
+    Feeds are `SortedSet` instances, so adding, removing and locating an
+    item is a bisect plus a list insert or delete. Keys can expire, expiry
+    is checked when a key is accessed.
+
+        activity_feed = ActivityFeed(connection=MemoryBackend())
+
+    :param timer: [callable, time.time] Clock used for key expiry.
+    """
+
+    def __init__(self, timer=time.time):
+        self._data = {}
+        self._expires = {}
+        self._timer = timer
+        self._lock = threading.RLock()
+
+    def _get(self, key, kind=None, create=False):
+        key = _encode(key)
+        deadline = self._expires.get(key)
+
+        if deadline is not None and deadline <= self._timer():
+            self._delete(key)
+
+        value = self._data.get(key)
+
+        if value is None and create:
+            value = self._data[key] = kind()
+
+        if value is not None and kind is not None and \
+                not isinstance(value, kind):
+            raise ResponseError('WRONGTYPE Operation against a key holding '
+                'the wrong kind of value')
+
+        return value
+
+    def _delete(self, key):
+        self._expires.pop(key, None)
+        return self._data.pop(key, None) is not None
+
+    def _zset(self, key, create=False):
+        return self._get(key, SortedSet, create)
+
+    def _rows(self, zset, lo, hi, reverse, withscores):
+        rows = zset.entries[lo:hi]
+
+        if reverse:
+            rows.reverse()
+
+        if withscores:
+            return [(m, s) for s, m in rows]
+
+        return [m for _, m in rows]
+
+    def execute_pipeline(self, commands, transaction):
+        with self._lock:
+            return super(MemoryBackend, self).execute_pipeline(commands,
+                transaction)
+
+    def zadd(self, key, *args, **kwargs):
+        pairs = _zadd_pairs(args, kwargs)
+
+        with self._lock:
+            zset = self._zset(key, create=True)
+            return sum(zset.add(_encode(m), float(s)) for s, m in pairs)
+
+    def zrem(self, key, *members):
+        with self._lock:
+            zset = self._zset(key)
+
+            if zset is None:
+                return 0
+
+            removed = sum(zset.remove(_encode(m)) for m in members)
+
+            if not zset:
+                self._delete(_encode(key))
+
+            return removed
+
+    def zscore(self, key, member):
+        with self._lock:
+            zset = self._zset(key)
+            return zset.scores.get(_encode(member)) if zset else None
+
+    def zcard(self, key):
+        with self._lock:
+            zset = self._zset(key)
+            return len(zset) if zset else 0
+
+    def zcount(self, key, min, max):
+        with self._lock:
+            zset = self._zset(key)
+
+            if not zset:
+                return 0
+
+            lo, hi = zset.score_range(min, max)
+            return hi - lo
+
+    def _range(self, key, start, end, reverse, withscores):
+        with self._lock:
+            zset = self._zset(key)
+
+            if not zset:
+                return []
+
+            n = len(zset)
+            lo, hi = _index_range(n, start, end)
+
+            if lo >= hi:
+                return []
+
+            if reverse:
+                lo, hi = n - hi, n - lo
+
+            return self._rows(zset, lo, hi, reverse, withscores)
+
+    def zrange(self, key, start, end, desc=False, withscores=False):
+        return self._range(key, start, end, desc, withscores)
+
+    def zrevrange(self, key, start, end, withscores=False):
+        return self._range(key, start, end, True, withscores)
+
+    def _range_by_score(self, key, min_score, max_score, start, num,
+            reverse, withscores):
+        with self._lock:
+            zset = self._zset(key)
+
+            if not zset:
+                return []
+
+            lo, hi = zset.score_range(min_score, max_score)
+
+            if start is not None:
+                limit = num if num is not None and num >= 0 else hi - lo
+
+                if reverse:
+                    hi = max(lo, hi - start)
+                    lo = max(lo, hi - limit)
+                else:
+                    lo = min(hi, lo + start)
+                    hi = min(hi, lo + limit)
+
+            return self._rows(zset, lo, hi, reverse, withscores)
+
+    def zrangebyscore(self, key, min, max, start=None, num=None,
+            withscores=False):
+        return self._range_by_score(key, min, max, start, num, False,
+            withscores)
+
+    def zrevrangebyscore(self, key, max, min, start=None, num=None,
+            withscores=False):
+        return self._range_by_score(key, min, max, start, num, True,
+            withscores)
+
+    def zremrangebyscore(self, key, min, max):
+        with self._lock:
+            zset = self._zset(key)
+
+            if not zset:
+                return 0
+
+            lo, hi = zset.score_range(min, max)
+            return self._remove_slice(key, zset, lo, hi)
+
+    def zremrangebyrank(self, key, start, end):
+        with self._lock:
+            zset = self._zset(key)
+
+            if not zset:
+                return 0
+
+            lo, hi = _index_range(len(zset), start, end)
+            return self._remove_slice(key, zset, lo, hi)
+
+    def _remove_slice(self, key, zset, lo, hi):
+        if lo >= hi:
+            return 0
+
+        for _, member in zset.entries[lo:hi]:
+            del zset.scores[member]
+
+        del zset.entries[lo:hi]
+
+        if not zset:
+            self._delete(_encode(key))
+
+        return hi - lo
+
+    def sadd(self, key, *members):
+        with self._lock:
+            members = set(_encode(m) for m in members)
+            value = self._get(key, set, create=True)
+            added = len(members - value)
+            value.update(members)
+            return added
+
+    def srem(self, key, *members):
+        with self._lock:
+            value = self._get(key, set)
+
+            if value is None:
+                return 0
+
+            members = set(_encode(m) for m in members)
+            removed = len(members & value)
+            value.difference_update(members)
+
+            if not value:
+                self._delete(_encode(key))
+
+            return removed
+
+    def scard(self, key):
+        with self._lock:
+            return len(self._get(key, set) or ())
+
+    def sismember(self, key, member):
+        with self._lock:
+            return _encode(member) in (self._get(key, set) or ())
+
+    def smembers(self, key):
+        with self._lock:
+            return set(self._get(key, set) or ())
+
+    def sscan(self, key, cursor=0, match=None, count=None):
+        '''Members are scanned in sorted order, the cursor encodes the last
+        member returned.'''
+        after, count = _cursor_member(cursor), count or 10
+
+        with self._lock:
+            members = sorted(self._get(key, set) or ())
+
+        start = 0 if after is None else bisect.bisect_right(members, after)
+        page = members[start:start + count]
+        cursor = _member_cursor(page[-1]) \
+            if start + count < len(members) else 0
+
+        if match is not None:
+            match = _encode(match)
+            page = [m for m in page if fnmatch.fnmatchcase(m, match)]
+
+        return cursor, page
+
+    def get(self, key):
+        with self._lock:
+            return self._get(key, bytes)
+
+    def set(self, key, value):
+        with self._lock:
+            key = _encode(key)
+            self._delete(key)
+            self._data[key] = _encode(value)
+            return True
+
+    def incr(self, key, amount=1):
+        with self._lock:
+            value = int(self._get(key, bytes) or 0) + amount
+            key = _encode(key)
+            self._data[key] = _encode(value)
+            return value
+
+    def delete(self, *keys):
+        with self._lock:
+            return sum(self._get(k) is not None and self._delete(_encode(k))
+                       for k in keys)
+
+    def exists(self, *keys):
+        with self._lock:
+            return sum(self._get(k) is not None for k in keys)
+
+    def keys(self, pattern='*'):
+        pattern = _encode(pattern)
+
+        with self._lock:
+            return [k for k in list(self._data)
+                    if self._get(k) is not None
+                    and fnmatch.fnmatchcase(k, pattern)]
+
+    def type(self, key):
+        with self._lock:
+            value = self._get(key)
+
+            if value is None:
+                return b'none'
+
+            if isinstance(value, SortedSet):
+                return b'zset'
+
+            return b'set' if isinstance(value, set) else b'string'
+
+    def expire(self, key, seconds):
+        return self.expireat(key, self._timer() + seconds)
+
+    def expireat(self, key, timestamp):
+        with self._lock:
+            if self._get(key) is None:
+                return False
+
+            self._expires[_encode(key)] = timestamp
+            return True
+
+    def ttl(self, key):
+        with self._lock:
+            if self._get(key) is None:
+                return -2
+
+            deadline = self._expires.get(_encode(key))
+
+            if deadline is None:
+                return -1
+
+            return int(round(deadline - self._timer()))
+
+    def flushdb(self):
+        with self._lock:
+            self._data.clear()
+            self._expires.clear()
+            return True
@@ -0,0 +1,487 @@
+# -*- coding: utf-8 -*-
+"""
+SQLite storage backend for feeds kept on local disk.
+"""
+from __future__ import absolute_import
+
+import fnmatch
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from . import Backend, _encode, _parse_bound, _index_range, _zadd_pairs, \
+    _member_cursor, _cursor_member
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS feed_items (
+    feed_key BLOB NOT NULL,
+    member BLOB NOT NULL,
+    score REAL NOT NULL,
+    PRIMARY KEY (feed_key, member)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS feed_items_score
+    ON feed_items (feed_key, score, member);
+CREATE TABLE IF NOT EXISTS set_members (
+    set_key BLOB NOT NULL,
+    member BLOB NOT NULL,
+    PRIMARY KEY (set_key, member)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS strings (
+    key BLOB PRIMARY KEY,
+    value BLOB NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS expires (
+    key BLOB PRIMARY KEY,
+    deadline REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+#: Maximum number of bound parameters used in a single IN (...) clause.
+MAX_IN_PARAMS = 500
+
+def _blob(value):
+    return sqlite3.Binary(_encode(value))
+
+def _score_clause(min_score, max_score):
+    '''SQL condition and parameters selecting scores between two bounds.'''
+    lo, lo_exclusive = _parse_bound(min_score)
+    hi, hi_exclusive = _parse_bound(max_score)
+    sql = 'score {} ? AND score {} ?'.format('>' if lo_exclusive else '>=',
+        '<' if hi_exclusive else '<=')
+    return sql, (lo, hi)
+
+class SQLiteBackend(Backend):
+    """Backend storing feeds in a SQLite database.
+
+    Feed items are rows of `feed_items`, indexed by (feed_key, score, member)
+    so every read is a range scan of that index in either direction. File
+    databases use WAL mode, so readers in other processes are not blocked by
+    writers. Every pipeline runs in one transaction and runs of ZADD
+    commands, e.g. a fan-out chunk, are written with a few batched
+    statements.
+
+        activity_feed = ActivityFeed(connection=SQLiteBackend('feeds.db'))
+
+    :param path: [string, ':memory:'] Database file.
+    :param timer: [callable, time.time] Clock used for key expiry.
+    :param timeout: [float, 30] Seconds to wait for a lock held by another
+                    connection.
+    """
+
+    def __init__(self, path=':memory:', timer=time.time, timeout=30):
+        self.path = path
+        self._timer = timer
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._conn = sqlite3.connect(path, timeout=timeout,
+            isolation_level=None, check_same_thread=False)
+
+        with self._lock:
+            if path != ':memory:':
+                self._conn.execute('PRAGMA journal_mode=WAL')
+
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(SCHEMA)
+            self._has_expires = self._one(
+                'SELECT 1 FROM expires LIMIT 1') is not None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            if self._depth:
+                self._depth += 1
+
+                try:
+                    yield
+                finally:
+                    self._depth -= 1
+
+                return
+
+            self._conn.execute('BEGIN IMMEDIATE')
+            self._depth = 1
+
+            try:
+                yield
+            except BaseException:
+                self._depth = 0
+                self._conn.execute('ROLLBACK')
+                raise
+
+            self._depth = 0
+            self._conn.execute('COMMIT')
+
+    def _all(self, sql, params=()):
+        return self._conn.execute(sql, params).fetchall()
+
+    def _one(self, sql, params=()):
+        return self._conn.execute(sql, params).fetchone()
+
+    def _live(self, key):
+        '''Return `key` as a blob after deleting it if it expired.'''
+        key = _blob(key)
+
+        if self._has_expires:
+            row = self._one('SELECT deadline FROM expires WHERE key = ?',
+                (key,))
+
+            if row is not None and row[0] <= self._timer():
+                with self._transaction():
+                    self._delete(key)
+
+        return key
+
+    def _delete(self, key):
+        n = self._conn.execute('DELETE FROM feed_items WHERE feed_key = ?',
+            (key,)).rowcount
+        n += self._conn.execute('DELETE FROM set_members WHERE set_key = ?',
+            (key,)).rowcount
+        n += self._conn.execute('DELETE FROM strings WHERE key = ?',
+            (key,)).rowcount
+        self._conn.execute('DELETE FROM expires WHERE key = ?', (key,))
+        return n > 0
+
+    def _rows(self, rows, withscores):
+        if withscores:
+            return [(bytes(m), s) for m, s in rows]
+
+        return [bytes(m) for m, _ in rows]
+
+    def execute_pipeline(self, commands, transaction):
+        results = []
+
+        with self._transaction():
+            i = 0
+
+            while i < len(commands):
+                j = i
+
+                while j < len(commands) and commands[j][0] == 'zadd':
+                    j += 1
+
+                if j - i > 1:
+                    results.extend(self._zadd_batch(commands[i:j]))
+                    i = j
+                    continue
+
+                name, args, kwargs = commands[i]
+                results.append(getattr(self, name)(*args, **kwargs))
+                i += 1
+
+        return results
+
+    def _zadd_batch(self, commands):
+        '''Apply several ZADD commands with batched statements, returning
+        the number of members added by each.'''
+        rows = []
+
+        for index, (_, args, kwargs) in enumerate(commands):
+            key = self._live(args[0])
+
+            for score, member in _zadd_pairs(args[1:], kwargs):
+                rows.append((index, key, _blob(member), float(score)))
+
+        existing = self._existing([(k, m) for _, k, m, _ in rows])
+        added = [0] * len(commands)
+
+        for index, key, member, _ in rows:
+            pair = (bytes(key), bytes(member))
+
+            if pair not in existing:
+                existing.add(pair)
+                added[index] += 1
+
+        self._conn.executemany('UPDATE feed_items SET score = ? '
+            'WHERE feed_key = ? AND member = ?',
+            [(s, k, m) for _, k, m, s in rows])
+        self._conn.executemany('INSERT OR IGNORE INTO feed_items '
+            '(feed_key, member, score) VALUES (?, ?, ?)',
+            [(k, m, s) for _, k, m, s in rows])
+        return added
+
+    def _existing(self, pairs):
+        '''Return the set of (key, member) pairs already stored.'''
+        by_member = {}
+        found = set()
+
+        for key, member in pairs:
+            by_member.setdefault(bytes(member), []).append(key)
+
+        for member, keys in by_member.items():
+            for i in range(0, len(keys), MAX_IN_PARAMS):
+                chunk = keys[i:i + MAX_IN_PARAMS]
+                sql = 'SELECT feed_key FROM feed_items WHERE member = ? ' \
+                    'AND feed_key IN ({})'.format(', '.join('?' * len(chunk)))
+
+                for (key,) in self._all(sql, [sqlite3.Binary(member)] + chunk):
+                    found.add((bytes(key), member))
+
+        return found
+
+    def zadd(self, key, *args, **kwargs):
+        with self._transaction():
+            return self._zadd_batch([('zadd', (key,) + args, kwargs)])[0]
+
+    def zrem(self, key, *members):
+        with self._transaction():
+            key = self._live(key)
+            return self._conn.executemany('DELETE FROM feed_items '
+                'WHERE feed_key = ? AND member = ?',
+                [(key, _blob(m)) for m in members]).rowcount
+
+    def zscore(self, key, member):
+        with self._lock:
+            row = self._one('SELECT score FROM feed_items '
+                'WHERE feed_key = ? AND member = ?',
+                (self._live(key), _blob(member)))
+            return row[0] if row else None
+
+    def zcard(self, key):
+        with self._lock:
+            return self._one('SELECT COUNT(*) FROM feed_items '
+                'WHERE feed_key = ?', (self._live(key),))[0]
+
+    def zcount(self, key, min, max):
+        sql, params = _score_clause(min, max)
+
+        with self._lock:
+            return self._one('SELECT COUNT(*) FROM feed_items '
+                'WHERE feed_key = ? AND ' + sql,
+                (self._live(key),) + params)[0]
+
+    def _rank_range(self, key, start, end):
+        '''Return (offset, limit) for inclusive, possibly negative ranks.'''
+        if start < 0 or end < 0:
+            length = self._one('SELECT COUNT(*) FROM feed_items '
+                'WHERE feed_key = ?', (key,))[0]
+            lo, hi = _index_range(length, start, end)
+        else:
+            lo, hi = start, end + 1
+
+        return lo, max(hi - lo, 0)
+
+    def _range(self, key, start, end, reverse, withscores):
+        order = 'DESC' if reverse else 'ASC'
+
+        with self._lock:
+            key = self._live(key)
+            offset, limit = self._rank_range(key, start, end)
+
+            if not limit:
+                return []
+
+            rows = self._all('SELECT member, score FROM feed_items '
+                'WHERE feed_key = ? ORDER BY score {0}, member {0} '
+                'LIMIT ? OFFSET ?'.format(order), (key, limit, offset))
+            return self._rows(rows, withscores)
+
+    def zrange(self, key, start, end, desc=False, withscores=False):
+        return self._range(key, start, end, desc, withscores)
+
+    def zrevrange(self, key, start, end, withscores=False):
+        return self._range(key, start, end, True, withscores)
+
+    def _range_by_score(self, key, min_score, max_score, start, num,
+            reverse, withscores):
+        sql, params = _score_clause(min_score, max_score)
+        order = 'DESC' if reverse else 'ASC'
+
+        if start is None:
+            start, num = 0, -1
+        elif num is None:
+            num = -1
+
+        with self._lock:
+            rows = self._all('SELECT member, score FROM feed_items '
+                'WHERE feed_key = ? AND {0} ORDER BY score {1}, member {1} '
+                'LIMIT ? OFFSET ?'.format(sql, order),
+                (self._live(key),) + params + (num, start))
+            return self._rows(rows, withscores)
+
+    def zrangebyscore(self, key, min, max, start=None, num=None,
+            withscores=False):
+        return self._range_by_score(key, min, max, start, num, False,
+            withscores)
+
+    def zrevrangebyscore(self, key, max, min, start=None, num=None,
+            withscores=False):
+        return self._range_by_score(key, min, max, start, num, True,
+            withscores)
+
+    def zremrangebyscore(self, key, min, max):
+        sql, params = _score_clause(min, max)
+
+        with self._transaction():
+            return self._conn.execute('DELETE FROM feed_items '
+                'WHERE feed_key = ? AND ' + sql,
+                (self._live(key),) + params).rowcount
+
+    def zremrangebyrank(self, key, start, end):
+        with self._transaction():
+            key = self._live(key)
+            offset, limit = self._rank_range(key, start, end)
+
+            if not limit:
+                return 0
+
+            return self._conn.execute('DELETE FROM feed_items '
+                'WHERE feed_key = ? AND member IN (SELECT member '
+                'FROM feed_items WHERE feed_key = ? ORDER BY score, member '
+                'LIMIT ? OFFSET ?)', (key, key, limit, offset)).rowcount
+
+    def sadd(self, key, *members):
+        with self._transaction():
+            return self._conn.executemany('INSERT OR IGNORE INTO set_members '
+                '(set_key, member) VALUES (?, ?)',
+                [(self._live(key), _blob(m)) for m in members]).rowcount
+
+    def srem(self, key, *members):
+        with self._transaction():
+            return self._conn.executemany('DELETE FROM set_members '
+                'WHERE set_key = ? AND member = ?',
+                [(self._live(key), _blob(m)) for m in members]).rowcount
+
+    def scard(self, key):
+        with self._lock:
+            return self._one('SELECT COUNT(*) FROM set_members '
+                'WHERE set_key = ?', (self._live(key),))[0]
+
+    def sismember(self, key, member):
+        with self._lock:
+            return self._one('SELECT 1 FROM set_members '
+                'WHERE set_key = ? AND member = ?',
+                (self._live(key), _blob(member))) is not None
+
+    def smembers(self, key):
+        with self._lock:
+            return set(bytes(m) for m, in self._all('SELECT member '
+                'FROM set_members WHERE set_key = ?', (self._live(key),)))
+
+    def sscan(self, key, cursor=0, match=None, count=None):
+        '''Members are scanned in order, the cursor encodes the last member
+        returned.'''
+        after, count = _cursor_member(cursor), count or 10
+        sql = 'SELECT member FROM set_members WHERE set_key = ? {}' \
+            'ORDER BY member LIMIT ?'
+
+        with self._lock:
+            if after is None:
+                rows = self._all(sql.format(''), (self._live(key), count + 1))
+            else:
+                rows = self._all(sql.format('AND member > ? '),
+                    (self._live(key), _blob(after), count + 1))
+
+        page = [bytes(m) for m, in rows]
+        cursor = _member_cursor(page[count - 1]) if len(page) > count else 0
+        page = page[:count]
+
+        if match is not None:
+            match = _encode(match)
+            page = [m for m in page if fnmatch.fnmatchcase(m, match)]
+
+        return cursor, page
+
+    def get(self, key):
+        with self._lock:
+            row = self._one('SELECT value FROM strings WHERE key = ?',
+                (self._live(key),))
+            return bytes(row[0]) if row else None
+
+    def set(self, key, value):
+        with self._transaction():
+            key = self._live(key)
+            self._delete(key)
+            self._conn.execute('INSERT INTO strings (key, value) '
+                'VALUES (?, ?)', (key, _blob(value)))
+            return True
+
+    def incr(self, key, amount=1):
+        with self._transaction():
+            value = int(self.get(key) or 0) + amount
+            self._conn.execute('INSERT OR REPLACE INTO strings (key, value) '
+                'VALUES (?, ?)', (_blob(key), _blob(value)))
+            return value
+
+    def delete(self, *keys):
+        with self._transaction():
+            return sum(self._delete(self._live(k)) for k in keys)
+
+    def exists(self, *keys):
+        with self._lock:
+            return sum(self._exists(self._live(k)) for k in keys)
+
+    def _exists(self, key):
+        return self._one('SELECT 1 FROM feed_items WHERE feed_key = ? '
+            'UNION ALL SELECT 1 FROM set_members WHERE set_key = ? '
+            'UNION ALL SELECT 1 FROM strings WHERE key = ? LIMIT 1',
+            (key, key, key)) is not None
+
+    def keys(self, pattern='*'):
+        pattern = _encode(pattern)
+
+        with self._lock:
+            rows = self._all('SELECT DISTINCT feed_key FROM feed_items '
+                'UNION SELECT DISTINCT set_key FROM set_members '
+                'UNION SELECT key FROM strings')
+            keys = [bytes(k) for k, in rows
+                    if fnmatch.fnmatchcase(bytes(k), pattern)]
+            return [k for k in keys if self._exists(self._live(k))]
+
+    def type(self, key):
+        with self._lock:
+            key = self._live(key)
+
+            if self._one('SELECT 1 FROM feed_items WHERE feed_key = ? '
+                    'LIMIT 1', (key,)):
+                return b'zset'
+
+            if self._one('SELECT 1 FROM set_members WHERE set_key = ? '
+                    'LIMIT 1', (key,)):
+                return b'set'
+
+            if self._one('SELECT 1 FROM strings WHERE key = ?', (key,)):
+                return b'string'
+
+            return b'none'
+
+    def expire(self, key, seconds):
+        return self.expireat(key, self._timer() + seconds)
+
+    def expireat(self, key, timestamp):
+        with self._transaction():
+            key = self._live(key)
+
+            if not self._exists(key):
+                return False
+
+            self._conn.execute('INSERT OR REPLACE INTO expires '
+                '(key, deadline) VALUES (?, ?)', (key, timestamp))
+            self._has_expires = True
+            return True
+
+    def ttl(self, key):
+        with self._lock:
+            key = self._live(key)
+
+            if not self._exists(key):
+                return -2
+
+            row = self._one('SELECT deadline FROM expires WHERE key = ?',
+                (key,))
+
+            if row is None:
+                return -1
+
+            return int(round(row[0] - self._timer()))
+
+    def flushdb(self):
+        with self._transaction():
+            for table in ('feed_items', 'set_members', 'strings', 'expires'):
+                self._conn.execute('DELETE FROM ' + table)
+
+            return True
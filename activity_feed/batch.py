@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import math
+import sys
+import time
+
+try:
+    from ._utils_speedups import isiterable
+except ImportError:
+    from .utils import isiterable
+
+from ._compat import reraise
+
+_PENDING = object()
+
+class Future(object):
+    """Result of a call queued in a `Batch`, available once the batch has
+    been executed."""
+
+    def __init__(self):
+        self._value = _PENDING
+        self._error = None
+
+    def done(self):
+        return self._value is not _PENDING or self._error is not None
+
+    def result(self):
+        '''Return the result of the call, or raise its error.'''
+        if self._error is not None:
+            reraise(*self._error)
+
+        if self._value is _PENDING:
+            raise RuntimeError('the batch has not been executed')
+
+        return self._value
+
+class Batch(object):
+    """Queue `ActivityFeed` calls and send them in one pipeline per node.
+
+    Every call returns a `Future`. Reads resolve to what the `ActivityFeed`
+    method would return, writes to None. Calls are executed in order when
+    leaving the `with` block, or on `execute()`, and the commands of a node
+    run in one MULTI/EXEC transaction, except in cluster mode where the keys
+    of a batch may span slots. Leaving the block with an exception discards
+    the queued calls.
+
+        with activity_feed.batch() as b:
+            page = b.feed(user_id, 1)
+            count = b.total_items(user_id)
+            b.update_item(user_id, item_id, timestamp)
+
+        page.result(), count.result()
+
+    Reads in a batch do not use the page cache of `ActivityFeed`. Aggregate
+    feeds merging pulled accounts, see
+    `activity_feed.delivery.HybridDelivery`, cannot be paged or counted in a
+    batch. With `ActivityFeed.active_window`, `feed` on an aggregate feed
+    touches the user when the call is queued, so the feed of a returning
+    user is rebuilt before the batch reads it.
+
+    :param activity_feed: [ActivityFeed] Feeds to read and write.
+    """
+
+    def __init__(self, activity_feed):
+        self.activity_feed = activity_feed
+        self._pipes = {}
+        self._calls = []
+
+    def __len__(self):
+        return len(self._calls)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.execute()
+        else:
+            self.reset()
+
+    def _queue(self, user_id, commands, transform=None):
+        '''Queue `commands(pipe)` on the pipeline of the node of `user_id`.
+        `transform` turns the results of the queued commands into the value
+        of the returned future.'''
+        a = self.activity_feed
+        node = a._node_index(user_id)
+        pipe = self._pipes.get(node)
+
+        if pipe is None:
+            pipe = self._pipes[node] = a.nodes[node].pipeline(
+                transaction=not a.cluster)
+
+        start = len(pipe)
+        commands(pipe)
+        future = Future()
+        self._calls.append((node, start, len(pipe), transform, future))
+        return future
+
+    def reset(self):
+        '''Discard the queued calls.'''
+        for pipe in self._pipes.values():
+            pipe.reset()
+
+        self._pipes = {}
+        self._calls = []
+
+    def execute(self):
+        """Send the queued calls and resolve their futures. If a node fails,
+        the futures of its calls raise the error, which is also raised here
+        after every node has been tried.
+
+        @return list of the results of the calls, in order.
+        """
+        pipes, calls = self._pipes, self._calls
+        self._pipes, self._calls = {}, []
+        results = {}
+        errors = {}
+
+        for node, pipe in pipes.items():
+            try:
+                results[node] = pipe.execute()
+            except Exception:
+                errors[node] = sys.exc_info()
+
+        for node, start, end, transform, future in calls:
+            if node in errors:
+                future._error = errors[node]
+                continue
+
+            value = results[node][start:end]
+
+            try:
+                future._value = transform(value) if transform else None
+            except Exception:
+                future._error = sys.exc_info()
+
+        for node in sorted(errors):
+            reraise(*errors[node])
+
+        return [future.result() for _, _, _, _, future in calls]
+
+    def _aggregate(self, aggregate):
+        if aggregate is None:
+            return self.activity_feed.aggregate
+
+        return aggregate
+
+    def _check_pulled(self, user_id, aggregate):
+        '''Raise if the aggregate feed of `user_id` merges pulled accounts
+        at read time, which a single pipeline cannot do.'''
+        if self.activity_feed._pulled_sources(user_id, aggregate):
+            raise RuntimeError('aggregate feeds with pulled sources cannot '
+                'be read in a batch')
+
+    def update_item(self, user_id, item_id, timestamp, aggregate=None):
+        '''See `ActivityFeed.update_item`.'''
+        a = self.activity_feed
+        keys = [a.feed_key(user_id, False)]
+        aggregate = self._aggregate(aggregate)
+        timestamp = a._encode_score(timestamp)
+        item_id = a._encode_member(item_id)
+
+        def commands(pipe):
+            a._add_item(pipe, keys, timestamp, item_id)
+
+            if aggregate:
+                a._add_aggregate(pipe, user_id, timestamp, item_id)
+
+        return self._queue(user_id, commands)
+
+    add_item = update_item
+
+    def aggregate_item(self, user_id, item_id, timestamp):
+        '''See `ActivityFeed.aggregate_item`, for a single user.'''
+        a = self.activity_feed
+
+        return self._queue(user_id, lambda pipe: a._add_aggregate(pipe,
+            user_id, a._encode_score(timestamp), a._encode_member(item_id)))
+
+    def remove_item(self, user_id, item_id):
+        '''See `ActivityFeed.remove_item`, for a single user.'''
+        a = self.activity_feed
+        keys = [a.feed_key(user_id, False), a.feed_key(user_id, True)]
+        items = list(map(a._encode_member,
+            item_id if isiterable(item_id) else (item_id,)))
+
+        def commands(pipe):
+            for key in keys:
+                pipe.zrem(key, *items)
+
+            a._bump_versions(pipe, keys)
+
+        def transform(results):
+            if a.archive is not None:
+                for key in keys:
+                    a.archive.remove(key, items)
+
+        return self._queue(user_id, commands, transform)
+
+    def remove_feeds(self, user_id):
+        '''See `ActivityFeed.remove_feeds`.'''
+        a = self.activity_feed
+        keys = [a.feed_key(user_id, False), a.feed_key(user_id, True)]
+
+        def commands(pipe):
+            pipe.delete(*keys)
+            a._bump_versions(pipe, keys)
+
+        def transform(results):
+            if a.archive is not None:
+                for key in keys:
+                    a.archive.clear(key)
+
+        return self._queue(user_id, commands, transform)
+
+    def trim_feed(self, user_id, starting_timestamp, ending_timestamp,
+            aggregate=None):
+        '''See `ActivityFeed.trim_feed`.'''
+        a = self.activity_feed
+        key = a.feed_key(user_id, self._aggregate(aggregate))
+        score_range = a._score_range(starting_timestamp, ending_timestamp)
+
+        def commands(pipe):
+            pipe.zremrangebyscore(key, *score_range)
+            a._bump_versions(pipe, [key])
+
+        def transform(results):
+            if a.archive is not None:
+                a.archive.remove_range_by_score(key, *score_range)
+
+        return self._queue(user_id, commands, transform)
+
+    trim = trim_feed
+
+    def expire_feed(self, user_id, seconds, aggregate=None):
+        '''See `ActivityFeed.expire_feed`.'''
+        a = self.activity_feed
+        key = a.feed_key(user_id, self._aggregate(aggregate))
+
+        def transform(results):
+            if a.archive is not None:
+                a.archive.expire_at(key, time.time() + seconds)
+
+        return self._queue(user_id, lambda pipe: a._queue_expire(pipe, key,
+            'expire', seconds), transform)
+
+    expire_in = expire_feed
+    expire_feed_in = expire_feed
+
+    def expire_feed_at(self, user_id, timestamp, aggregate=None):
+        '''See `ActivityFeed.expire_feed_at`.'''
+        a = self.activity_feed
+        key = a.feed_key(user_id, self._aggregate(aggregate))
+
+        def transform(results):
+            if a.archive is not None:
+                a.archive.expire_at(key, timestamp)
+
+        return self._queue(user_id, lambda pipe: a._queue_expire(pipe, key,
+            'expireat', timestamp), transform)
+
+    expire_at = expire_feed_at
+
+    def feed(self, user_id, page, aggregate=None, page_size=None):
+        '''See `ActivityFeed.feed`.'''
+        a = self.activity_feed
+        aggregate = self._aggregate(aggregate)
+        self._check_pulled(user_id, aggregate)
+        key = a.feed_key(user_id, aggregate)
+        start, end = a._page_range(page, page_size)
+
+        if aggregate and a.active_window is not None:
+            a.touch(user_id)
+
+        def commands(pipe):
+            pipe.zrevrange(key, start, end)
+
+            if a.archive is not None:
+                pipe.zcard(key)
+
+        def transform(results):
+            members = results[0]
+
+            if a.archive is not None and len(members) <= end - start:
+                members = a._read_through(key, start, end, members,
+                    results[1])
+
+            return a._load_items(members)
+
+        return self._queue(user_id, commands, transform)
+
+    def full_feed(self, user_id, aggregate=None):
+        '''See `ActivityFeed.full_feed`.'''
+        a = self.activity_feed
+        key = a.feed_key(user_id, self._aggregate(aggregate))
+
+        def transform(results):
+            members = results[0]
+
+            if a.archive is not None:
+                members += [m for m, _ in a.archive.rows(key)]
+
+            return a._load_items(members)
+
+        return self._queue(user_id, lambda pipe: pipe.zrevrange(key, 0, -1),
+            transform)
+
+    def feed_between_timestamps(self, user_id, starting_timestamp,
+            ending_timestamp, aggregate=None, limit=None, offset=0):
+        '''See `ActivityFeed.feed_between_timestamps`.'''
+        a = self.activity_feed
+        key = a.feed_key(user_id, self._aggregate(aggregate))
+        min_score, max_score = a._score_range(starting_timestamp,
+            ending_timestamp)
+
+        if limit is None and not offset:
+            start = num = None
+        else:
+            start, num = offset, limit if limit is not None else -1
+
+        def commands(pipe):
+            pipe.zrevrangebyscore(key, max_score, min_score, start=start,
+                num=num)
+
+            if a.archive is not None:
+                pipe.zcount(key, min_score, max_score)
+
+        def transform(results):
+            members = results[0]
+
+            if a.archive is not None and (limit is None or
+                                          len(members) < limit):
+                members += [m for m, _ in a._archived_between(key, min_score,
+                    max_score, max(offset - results[1], 0),
+                    limit - len(members) if limit is not None else None)]
+
+            return a._load_items(members)
+
+        return self._queue(user_id, commands, transform)
+
+    between = feed_between_timestamps
+
+    def count_between(self, user_id, starting_timestamp, ending_timestamp,
+            aggregate=None):
+        '''See `ActivityFeed.count_between`.'''
+        a = self.activity_feed
+        key = a.feed_key(user_id, self._aggregate(aggregate))
+        score_range = a._score_range(starting_timestamp, ending_timestamp)
+
+        def transform(results):
+            count = results[0]
+
+            if a.archive is not None:
+                count += a.archive.count_between(key, *score_range)
+
+            return count
+
+        return self._queue(user_id, lambda pipe: pipe.zcount(key,
+            *score_range), transform)
+
+    def total_items_in_feed(self, user_id, aggregate=None):
+        '''See `ActivityFeed.total_items_in_feed`.'''
+        a = self.activity_feed
+        aggregate = self._aggregate(aggregate)
+        self._check_pulled(user_id, aggregate)
+        key = a.feed_key(user_id, aggregate)
+
+        def transform(results):
+            total = results[0]
+
+            if a.archive is not None:
+                total += a.archive.count(key)
+
+            return total
+
+        return self._queue(user_id, lambda pipe: pipe.zcard(key), transform)
+
+    total_items = total_items_in_feed
+
+    def total_pages_in_feed(self, user_id, aggregate=None, page_size=None):
+        '''See `ActivityFeed.total_pages_in_feed`.'''
+        a = self.activity_feed
+        aggregate = self._aggregate(aggregate)
+        self._check_pulled(user_id, aggregate)
+        key = a.feed_key(user_id, aggregate)
+        page_size = float(page_size or a.page_size)
+
+        def transform(results):
+            total = results[0]
+
+            if a.archive is not None:
+                total += a.archive.count(key)
+
+            return int(math.ceil(total / page_size))
+
+        return self._queue(user_id, lambda pipe: pipe.zcard(key), transform)
+
+    total_pages = total_pages_in_feed
+
+    def check_item(self, user_id, item_id, aggregate=None):
+        '''See `ActivityFeed.check_item`.'''
+        a = self.activity_feed
+        key = a.feed_key(user_id, self._aggregate(aggregate))
+        member = a._encode_member(item_id)
+
+        def transform(results):
+            score = results[0]
+
+            if score is None and a.archive is not None:
+                score = a.archive.score(key, member)
+
+            return score is not None
+
+        return self._queue(user_id, lambda pipe: pipe.zscore(key, member),
+            transform)
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import threading
+import time
+from collections import OrderedDict
+
+class LRUCache(object):
+    """A bounded, thread safe least recently used cache. Entries optionally
+    expire `ttl` seconds after they were set.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, timer=time.time):
+        if maxsize < 1:
+            raise ValueError('maxsize must be a positive integer')
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                expires, value = self._data.pop(key)
+            except KeyError:
+                return default
+
+            if expires is not None and expires <= self._timer():
+                return default
+
+            self._data[key] = (expires, value)
+            return value
+
+    def set(self, key, value):
+        expires = self._timer() + self.ttl if self.ttl else None
+
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (expires, value)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Codecs controlling how item IDs and timestamps are stored in feeds.
+"""
+from __future__ import absolute_import
+
+import itertools
+import struct
+import threading
+
+class Codec(object):
+    """Store item IDs and timestamps unchanged. Subclasses override the
+    methods below to change the stored representation."""
+
+    def encode_member(self, item_id):
+        return item_id
+
+    def decode_member(self, member):
+        return member
+
+    def encode_score(self, timestamp):
+        return timestamp
+
+    def score_range(self, starting_timestamp, ending_timestamp):
+        '''Return the (min, max) scores of items stored between two
+        timestamps, both inclusive.'''
+        return starting_timestamp, ending_timestamp
+
+class CompactCodec(Codec):
+    """Pack integer item IDs into fixed width big-endian binary and
+    optionally combine timestamps with a sequence number.
+
+    With `sequence_bits` the score of an item is `timestamp << sequence_bits`
+    plus a process local sequence number, so items added in the same second
+    keep their insertion order instead of being ordered by member. Scores
+    must fit into the 53 bit mantissa of a double, which leaves at most 21
+    bits next to a 32 bit timestamp.
+
+    :param member_width: [int, 8] Width of a packed item ID in bytes, 4 or 8.
+                         If None item IDs are stored unchanged.
+    :param sequence_bits: [int, 0] Number of score bits used for the sequence
+                          number. If 0 scores are stored unchanged.
+    """
+
+    _formats = {4: '>I', 8: '>Q'}
+
+    def __init__(self, member_width=8, sequence_bits=0):
+        if member_width is not None and member_width not in self._formats:
+            raise ValueError('member_width must be 4 or 8')
+
+        if not 0 <= sequence_bits <= 21:
+            raise ValueError('sequence_bits must be between 0 and 21')
+
+        self.member_width = member_width
+        self.sequence_bits = sequence_bits
+
+        if member_width is not None:
+            self._struct = struct.Struct(self._formats[member_width])
+
+        self._sequence = itertools.count()
+        self._sequence_lock = threading.Lock()
+
+    def encode_member(self, item_id):
+        if self.member_width is None:
+            return item_id
+
+        return self._struct.pack(int(item_id))
+
+    def decode_member(self, member):
+        if self.member_width is None:
+            return member
+
+        return self._struct.unpack(member)[0]
+
+    def encode_score(self, timestamp):
+        if not self.sequence_bits:
+            return timestamp
+
+        with self._sequence_lock:
+            seq = next(self._sequence)
+
+        mask = (1 << self.sequence_bits) - 1
+        return (int(timestamp) << self.sequence_bits) | (seq & mask)
+
+    def score_range(self, starting_timestamp, ending_timestamp):
+        if not self.sequence_bits:
+            return starting_timestamp, ending_timestamp
+
+        mask = (1 << self.sequence_bits) - 1
+        return (int(starting_timestamp) << self.sequence_bits,
+                (int(ending_timestamp) << self.sequence_bits) | mask)
@@ -1,6 +1,7 @@
-import urlparse
 import redis
 
+from ._compat import urlparse
+
 try:
     import pack_command
 
@@ -9,6 +10,23 @@ try:
 except ImportError:
     Connection = redis.Connection
 
+#: redis-py 3.0 changed ZADD to take a mapping of members to scores.
+LEGACY_ZADD = int(redis.__version__.split('.')[0]) < 3
+
+def zadd(client, key, score, member):
+    '''ZADD a single member on a client or pipeline of any redis-py version.'''
+    if LEGACY_ZADD:
+        return client.zadd(key, score, member)
+
+    return client.zadd(key, {member: score})
+
+def zadd_many(client, key, rows):
+    '''ZADD (score, member) `rows` to a single key in one command.'''
+    if LEGACY_ZADD:
+        return client.zadd(key, *[v for row in rows for v in row])
+
+    return client.zadd(key, dict((m, s) for s, m in rows))
+
 def redis_from_url(url, db=None, charset='utf-8', errors='strict',
         decode_responses=False, socket_timeout=None, **kwargs):
     """Return a Redis client object configured from the given URL.
@@ -23,7 +41,7 @@ def redis_from_url(url, db=None, charset='utf-8', errors='strict',
     Any additional keyword arguments will be passed along to the Redis
     class's initializer.
     """
-    url = urlparse.urlparse(url)
+    url = urlparse(url)
 
     # We only support redis:// schemes.
     assert url.scheme == 'redis' or not url.scheme
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+class Delivery(object):
+    """Delivery policy pushing every item into the aggregate feeds of the
+    followers of its author at write time, see `ActivityFeed.publish`. It
+    also provides the follow graph used to rebuild the aggregate feeds of
+    returning users when `ActivityFeed.active_window` is set.
+
+    :param followers: [callable] Called as `followers(user_id)`, returns an
+                      iterable of the IDs of the followers of a user.
+    :param followees: [callable] Called as `followees(user_id)`, returns an
+                      iterable of the IDs of the users a user follows.
+    """
+
+    def __init__(self, followers, followees):
+        self.followers = followers
+        self.followees = followees
+
+    def is_pushed(self, user_id):
+        '''Whether the items of `user_id` are pushed to its followers.'''
+        return True
+
+    def pulled_sources(self, user_id):
+        '''IDs of the users followed by `user_id` whose items are pulled.'''
+        return []
+
+class HybridDelivery(Delivery):
+    """Delivery policy pushing the items of most accounts into the aggregate
+    feeds of their followers at write time and pulling the items of accounts
+    with many followers into the aggregate feed at read time.
+
+    Accounts with at most `threshold` followers are pushed by
+    `ActivityFeed.publish`. Items of larger accounts only go to their own
+    feeds, and `ActivityFeed.feed` and `total_items` merge the feeds of the
+    large accounts a user follows into the aggregate feed of the user.
+
+    :param threshold: [int] Number of followers above which items are pulled.
+    :param followers: [callable] Called as `followers(user_id)`, returns an
+                      iterable of the IDs of the followers of a user.
+    :param followees: [callable] Called as `followees(user_id)`, returns an
+                      iterable of the IDs of the users a user follows.
+    :param follower_count: [callable] Called as `follower_count(user_id)`,
+                           returns the number of followers of a user. It
+                           should be a stored counter, not a walk of
+                           `followers`.
+    :param follower_counts: [callable, None] Called as
+                            `follower_counts(user_ids)`, returns the numbers
+                            of followers of a list of users in one round
+                            trip. Every aggregate read counts the followers
+                            of all followees of the reader, with one
+                            `follower_count` call each if this is None.
+    """
+
+    def __init__(self, threshold, followers, followees, follower_count,
+            follower_counts=None):
+        super(HybridDelivery, self).__init__(followers, followees)
+        self.threshold = threshold
+        self.follower_count = follower_count
+        self.follower_counts = follower_counts
+
+    def is_pushed(self, user_id):
+        '''Whether the items of `user_id` are pushed to its followers.'''
+        return self.follower_count(user_id) <= self.threshold
+
+    def pulled_sources(self, user_id):
+        '''IDs of the users followed by `user_id` whose items are pulled.'''
+        followees = list(self.followees(user_id))
+
+        if self.follower_counts is None:
+            counts = [self.follower_count(uid) for uid in followees]
+        else:
+            counts = self.follower_counts(followees)
+
+        return [uid for uid, count in zip(followees, counts)
+                if count > self.threshold]
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import threading
+import time
+from collections import namedtuple
+
+try:
+    from queue import Queue
+except ImportError:
+    from Queue import Queue
+
+from .utils import chunked
+
+#: Statistics for a single chunk sent by :class:`FanOut`. `node` is the index
+#: of the node the chunk was sent to.
+ChunkStats = namedtuple('ChunkStats', ['index', 'size', 'elapsed', 'node'])
+
+class FanOut(object):
+    """Apply a write to a large number of feeds in bounded, pipelined chunks.
+
+    User IDs are consumed lazily from any iterable and grouped into chunks of
+    `chunk_size`. Every chunk is sent as one non-transactional pipeline, so a
+    single huge fan-out never builds an unbounded client side buffer or
+    blocks Redis for longer than one chunk takes to apply.
+
+    With `max_in_flight` > 1 chunks are executed by a pool of worker threads,
+    each using its own connection from the pool. The producer never runs more
+    than `max_in_flight` chunks ahead of the workers.
+
+    `redis` may also be a list of clients, one per shard, together with a
+    `router` returning the index of the node for a user ID. User IDs are then
+    grouped into per node chunks, and chunks for different nodes are written
+    in parallel when `max_in_flight` > 1.
+
+    If `slot` is given the user IDs of every chunk are ordered by the Redis
+    Cluster slot it returns, so a cluster client sends contiguous per slot
+    batches.
+    """
+
+    def __init__(self, redis, chunk_size=1000, max_in_flight=1, router=None,
+            slot=None):
+        if chunk_size < 1:
+            raise ValueError('chunk_size must be a positive integer')
+
+        if max_in_flight < 1:
+            raise ValueError('max_in_flight must be a positive integer')
+
+        self.nodes = redis if isinstance(redis, (list, tuple)) else [redis]
+        self.router = router
+        self.slot = slot
+        self.chunk_size = chunk_size
+        self.max_in_flight = max_in_flight
+
+    def execute(self, user_ids, command):
+        """Run `command` for every user ID in `user_ids`.
+
+        :param user_ids: [iterable] User IDs, consumed lazily.
+        :param command: [callable] Called as `command(pipeline, user_id)` to
+                        queue the writes for a single user.
+
+        :return list of `ChunkStats`, one per chunk, ordered by chunk index.
+        """
+        chunks = ((i, node, chunk) for i, (node, chunk)
+                  in enumerate(self._chunks(user_ids)))
+
+        if self.max_in_flight == 1:
+            return [self._execute_chunk(i, node, chunk, command)
+                    for i, node, chunk in chunks]
+
+        return self._execute_concurrent(chunks, command)
+
+    def _chunks(self, user_ids):
+        for node, chunk in self._route(user_ids):
+            if self.slot is not None:
+                chunk = sorted(chunk, key=self.slot)
+
+            yield node, chunk
+
+    def _route(self, user_ids):
+        '''Yield (node, chunk) pairs, every chunk holding users of one node.'''
+        if self.router is None or len(self.nodes) == 1:
+            for chunk in chunked(user_ids, self.chunk_size):
+                yield 0, chunk
+            return
+
+        buffers = {}
+
+        for user_id in user_ids:
+            node = self.router(user_id)
+            buf = buffers.setdefault(node, [])
+            buf.append(user_id)
+
+            if len(buf) >= self.chunk_size:
+                yield node, buf
+                buffers[node] = []
+
+        for node in sorted(buffers):
+            if buffers[node]:
+                yield node, buffers[node]
+
+    def _execute_chunk(self, index, node, chunk, command):
+        t = time.time()
+        pipe = self.nodes[node].pipeline(transaction=False)
+
+        for user_id in chunk:
+            command(pipe, user_id)
+
+        pipe.execute()
+        return ChunkStats(index, len(chunk), time.time() - t, node)
+
+    def _execute_concurrent(self, chunks, command):
+        queue = Queue(self.max_in_flight)
+        stats = []
+        errors = []
+
+        def worker():
+            while True:
+                job = queue.get()
+
+                if job is None:
+                    return
+
+                if errors:
+                    continue
+
+                try:
+                    stats.append(self._execute_chunk(job[0], job[1], job[2],
+                        command))
+                except Exception as e:
+                    errors.append(e)
+
+        workers = [threading.Thread(target=worker)
+                   for _ in range(self.max_in_flight)]
+
+        for w in workers:
+            w.daemon = True
+            w.start()
+
+        try:
+            for job in chunks:
+                if errors:
+                    break
+
+                queue.put(job)
+        finally:
+            for _ in workers:
+                queue.put(None)
+
+            for w in workers:
+                w.join()
+
+        if errors:
+            raise errors[0]
+
+        stats.sort(key=lambda s: s.index)
+        return stats
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+from collections import OrderedDict
+
+from .utils import chunked
+from .delivery import Delivery, HybridDelivery
+
+class FollowGraph(object):
+    """Followers and followees of users, stored in Redis sets next to the
+    feeds of each user: `namespace`:`followers_key`:`user_id` holds the
+    followers of a user and `namespace`:`following_key`:`user_id` the users
+    it follows. Both sets honour `hash_tags` and sharding like the feeds.
+
+    Following a user merges its newest `backfill_size` items into the
+    aggregate feed of the follower server side, unfollowing removes its
+    items from the aggregate feed in one pipeline. `followers` and
+    `followees` iterate the sets with SSCAN and plug into the delivery
+    policies, see `FollowGraph.delivery`:
+
+        graph = FollowGraph(activity_feed)
+        activity_feed.delivery = graph.delivery()
+        graph.follow('david', 'tom')
+        activity_feed.publish('tom', 1, timestamp)
+
+    :param activity_feed: [ActivityFeed] Feeds of the users.
+    :param backfill_size: [int, 100] Number of newest items of a followee
+                          merged into the aggregate feed on follow, all of
+                          them if 0.
+    :param followers_key: [string, 'followers'] Key part of follower sets.
+    :param following_key: [string, 'following'] Key part of followee sets.
+    :param scan_count: [int, 1000] COUNT hint of the SSCAN commands.
+    """
+
+    def __init__(self, activity_feed, backfill_size=100,
+            followers_key='followers', following_key='following',
+            scan_count=1000):
+        self.activity_feed = activity_feed
+        self.backfill_size = backfill_size
+        self.followers_key = followers_key
+        self.following_key = following_key
+        self.scan_count = scan_count
+
+    def _key(self, name, user_id):
+        a = self.activity_feed
+
+        if a.hash_tags:
+            user_id = '{{{}}}'.format(user_id)
+
+        return '{}:{}:{}'.format(a.namespace, name, user_id)
+
+    def followers_set_key(self, user_id):
+        '''Key of the set of followers of `user_id`.'''
+        return self._key(self.followers_key, user_id)
+
+    def following_set_key(self, user_id):
+        '''Key of the set of users followed by `user_id`.'''
+        return self._key(self.following_key, user_id)
+
+    def follow(self, follower_id, followee_id, backfill_size=None):
+        """Make `follower_id` follow `followee_id` and merge the newest items
+        of the followee into the aggregate feed of the follower. On a single
+        node the items are merged in one server side step, with ZUNIONSTORE
+        if all items are taken, otherwise they are read from the node of the
+        followee and added in one pipeline. Users outside the
+        `ActivityFeed.active_window` are not backfilled, their aggregate feed
+        is rebuilt from the graph when they return.
+
+        :param follower_id: [string] User ID of the follower.
+        :param followee_id: [string] User ID of the followed user.
+        :param backfill_size: [int, None] Number of newest items merged, all
+                              of them if 0. If None `backfill_size` is used.
+
+        @return True if `follower_id` did not follow `followee_id` yet.
+        """
+        added = self._link('sadd', follower_id, followee_id)
+
+        if backfill_size is None:
+            backfill_size = self.backfill_size
+
+        a = self.activity_feed
+        client = a.redis_for(follower_id)
+
+        if a.active_window is not None and \
+                not client.exists(a.last_seen_marker_key(follower_id)):
+            return added
+
+        a._materialize(client, a.feed_key(follower_id, True), [followee_id],
+            backfill_size, a.active_window, replace=False)
+        return added
+
+    def unfollow(self, follower_id, followee_id):
+        """Make `follower_id` stop following `followee_id` and remove the
+        items of the followee from the aggregate feed of the follower. The
+        feed of the followee is read `ActivityFeed.fanout_chunk_size` items
+        at a time, archived items included, and every chunk is removed with
+        one variadic ZREM in its own pipeline.
+
+        :param follower_id: [string] User ID of the follower.
+        :param followee_id: [string] User ID of the unfollowed user.
+
+        @return True if `follower_id` followed `followee_id`.
+        """
+        removed = self._link('srem', follower_id, followee_id)
+
+        a = self.activity_feed
+        key = a.feed_key(follower_id, True)
+        source = a.feed_key(followee_id, False)
+        client = a.redis_for(followee_id)
+        size = a.fanout_chunk_size
+        start = 0
+
+        while True:
+            items = client.zrange(source, start, start + size - 1)
+
+            if items:
+                self._purge(follower_id, key, items)
+
+            if len(items) < size:
+                break
+
+            start += size
+
+        if a.archive is not None:
+            for items in chunked([m for m, _ in a.archive.rows(source)], size):
+                self._purge(follower_id, key, items)
+
+        return removed
+
+    def _purge(self, follower_id, key, items):
+        '''Remove `items` from the aggregate feed `key` of `follower_id`, in
+        both tiers.'''
+        a = self.activity_feed
+        pipe = a.redis_for(follower_id).pipeline(transaction=not a.cluster)
+        pipe.zrem(key, *items)
+        a._bump_versions(pipe, [key])
+        pipe.execute()
+
+        if a.archive is not None:
+            a.archive.remove(key, items)
+
+    def _link(self, command, follower_id, followee_id):
+        '''Send `command` to the followee set of the follower and to the
+        follower set of the followee, with one pipeline per node.'''
+        a = self.activity_feed
+        commands = OrderedDict()
+        commands.setdefault(a._node_index(follower_id), []).append(
+            (self.following_set_key(follower_id), followee_id))
+        commands.setdefault(a._node_index(followee_id), []).append(
+            (self.followers_set_key(followee_id), follower_id))
+        results = []
+
+        for node, args in commands.items():
+            pipe = a.nodes[node].pipeline(transaction=not a.cluster)
+
+            for key, member in args:
+                getattr(pipe, command)(key, member)
+
+            results.extend(pipe.execute())
+
+        return bool(results[0])
+
+    def is_following(self, follower_id, followee_id):
+        '''Whether `follower_id` follows `followee_id`.'''
+        return bool(self.activity_feed.redis_for(follower_id).sismember(
+            self.following_set_key(follower_id), followee_id))
+
+    def followers(self, user_id):
+        """Iterate the IDs of the followers of `user_id` with SSCAN, in no
+        particular order, without loading the whole set.
+
+        :param user_id: [string] User ID.
+
+        @return iterator of follower IDs.
+        """
+        return self._scan(user_id, self.followers_set_key(user_id))
+
+    def followees(self, user_id):
+        """Iterate the IDs of the users followed by `user_id` with SSCAN, in
+        no particular order, without loading the whole set.
+
+        :param user_id: [string] User ID.
+
+        @return iterator of followee IDs.
+        """
+        return self._scan(user_id, self.following_set_key(user_id))
+
+    def _scan(self, user_id, key):
+        client = self.activity_feed.redis_for(user_id)
+
+        for member in client.sscan_iter(key, count=self.scan_count):
+            yield member.decode('utf-8') if isinstance(member, bytes) \
+                else member
+
+    def follower_count(self, user_id):
+        '''Number of followers of `user_id`.'''
+        return self.activity_feed.redis_for(user_id).scard(
+            self.followers_set_key(user_id))
+
+    def follower_counts(self, user_ids):
+        """Numbers of followers of many users, read with one pipeline of
+        SCARD commands per node and `ActivityFeed.fanout_chunk_size` users.
+
+        :param user_ids: [iterable] User IDs.
+
+        @return list of follower counts, in the order of `user_ids`.
+        """
+        a = self.activity_feed
+        user_ids = list(user_ids)
+        counts = {}
+
+        for node, uids in a._group_by_node(user_ids).items():
+            for chunk in chunked(uids, a.fanout_chunk_size):
+                pipe = a.nodes[node].pipeline(transaction=False)
+
+                for uid in chunk:
+                    pipe.scard(self.followers_set_key(uid))
+
+                counts.update(zip(chunk, pipe.execute()))
+
+        return [counts[uid] for uid in user_ids]
+
+    def followee_count(self, user_id):
+        '''Number of users followed by `user_id`.'''
+        return self.activity_feed.redis_for(user_id).scard(
+            self.following_set_key(user_id))
+
+    def delivery(self, threshold=None):
+        """Delivery policy reading the follow graph, see
+        `activity_feed.delivery`.
+
+        :param threshold: [int, None] Number of followers above which items
+                          are pulled at read time. If None every item is
+                          pushed.
+
+        @return `Delivery`, or `HybridDelivery` if `threshold` is given.
+        """
+        if threshold is None:
+            return Delivery(self.followers, self.followees)
+
+        return HybridDelivery(threshold, self.followers, self.followees,
+            self.follower_count, self.follower_counts)
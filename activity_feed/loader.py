@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from multiprocessing.pool import ThreadPool
+
+from .cache import LRUCache
+
+# sentinel
+_missing = object()
+
+class ItemLoader(object):
+    """Batching item loader which can be used as `ActivityFeed.items_loader`.
+
+    Item IDs are de-duplicated and looked up in an optional LRU cache shared
+    by every caller; only the remaining IDs are passed to `batch_loader` in a
+    single call. Without a `batch_loader` the per item `item_loader` is run
+    for the missing IDs in a thread pool of `max_workers` threads.
+
+    Inside `ItemLoader.scope()` calls return `LazyItems` instead of lists.
+    Loading is deferred until the first result is accessed, and then every ID
+    requested in the scope so far is loaded in one batch::
+
+        with loader.scope():
+            a = activity_feed.feed('david', 1)
+            b = activity_feed.feed('luke', 1)
+            render(a, b)  # one call to batch_loader
+
+    :param batch_loader: [callable, None] Called with a list of IDs, returns
+                         a list of items in the same order or a dict mapping
+                         IDs to items.
+    :param item_loader: [callable, None] Called with a single ID.
+    :param cache_size: [int, 0] Number of items kept in the shared cache.
+    :param cache_ttl: [int, None] Seconds an item is kept in the shared cache.
+    :param max_workers: [int, 4] Size of the `item_loader` thread pool.
+    """
+
+    def __init__(self, batch_loader=None, item_loader=None, cache_size=0,
+            cache_ttl=None, max_workers=4):
+        if batch_loader is None and item_loader is None:
+            raise ValueError('batch_loader or item_loader is required')
+
+        self.batch_loader = batch_loader
+        self.item_loader = item_loader
+        self.cache = LRUCache(cache_size, cache_ttl) if cache_size else None
+        self.max_workers = max_workers
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._local = threading.local()
+
+    def __call__(self, ids):
+        scope = getattr(self._local, 'scope', None)
+
+        if scope is not None:
+            return scope.defer(ids)
+
+        return self.load_many(ids)
+
+    @contextmanager
+    def scope(self):
+        '''Collect the IDs of every call made in this thread until the first
+        result is used, and memoize loaded items for the rest of the scope.'''
+        previous = getattr(self._local, 'scope', None)
+        self._local.scope = scope = LoaderScope(self)
+
+        try:
+            yield scope
+        finally:
+            self._local.scope = previous
+
+    def load_many(self, ids, memo=None):
+        '''Load the items for `ids`, returned in the same order. Missing
+        items are returned as None.
+
+        :param memo: [dict, None] Items already loaded, updated in place.
+        '''
+        ids = list(ids)
+        found = {}
+        missing = []
+
+        for id_ in OrderedDict.fromkeys(ids):
+            if memo is not None and id_ in memo:
+                found[id_] = memo[id_]
+                continue
+
+            if self.cache is not None:
+                item = self.cache.get(id_, _missing)
+
+                if item is not _missing:
+                    found[id_] = item
+                    continue
+
+            missing.append(id_)
+
+        if missing:
+            loaded = self._fetch(missing)
+
+            for id_ in missing:
+                item = found[id_] = loaded.get(id_)
+
+                if self.cache is not None and item is not None:
+                    self.cache.set(id_, item)
+
+        if memo is not None:
+            memo.update(found)
+
+        return [found[id_] for id_ in ids]
+
+    def _fetch(self, ids):
+        if self.batch_loader is not None:
+            res = self.batch_loader(ids)
+
+            if isinstance(res, dict):
+                return res
+
+            return dict(zip(ids, res))
+
+        return dict(zip(ids, self.pool.map(self.item_loader, ids)))
+
+    @property
+    def pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPool(self.max_workers)
+
+            return self._pool
+
+    def in_scope(self):
+        '''Whether calls in this thread are deferred by a `scope()`.'''
+        return getattr(self._local, 'scope', None) is not None
+
+    def close(self):
+        '''Shut down the `item_loader` thread pool.'''
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool.join()
+                self._pool = None
+
+class LoaderScope(object):
+    """IDs requested from an `ItemLoader` inside a single `scope()`."""
+
+    def __init__(self, loader):
+        self.loader = loader
+        self.pending = []
+        self.loaded = {}
+
+    def defer(self, ids):
+        ids = list(ids)
+        self.pending.extend(ids)
+        return LazyItems(self, ids)
+
+    def dispatch(self):
+        '''Load every pending ID in one batch.'''
+        pending, self.pending = self.pending, []
+
+        if pending:
+            self.loader.load_many(pending, memo=self.loaded)
+
+    def resolve(self, ids):
+        if any(id_ not in self.loaded for id_ in ids):
+            self.dispatch()
+
+        return [self.loaded[id_] for id_ in ids]
+
+class LazyItems(object):
+    """List-like result of a deferred load, resolved on first access."""
+
+    def __init__(self, scope, ids):
+        self._scope = scope
+        self._ids = ids
+        self._items = None
+
+    def _resolve(self):
+        if self._items is None:
+            self._items = self._scope.resolve(self._ids)
+
+        return self._items
+
+    def __iter__(self):
+        return iter(self._resolve())
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __getitem__(self, index):
+        return self._resolve()[index]
+
+    def __eq__(self, other):
+        try:
+            return self._resolve() == list(other)
+        except TypeError:
+            return NotImplemented
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return repr(self._resolve())
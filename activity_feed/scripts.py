@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Lua scripts executed server side with EVALSHA.
+"""
+
+#: Add `ARGV[2]` with score `ARGV[1]` to every feed in KEYS and trim each feed
+#: to the newest `ARGV[3]` items.
+ADD_CAPPED = """
+local size = tonumber(ARGV[3])
+for _, key in ipairs(KEYS) do
+    redis.call('ZADD', key, ARGV[1], ARGV[2])
+    redis.call('ZREMRANGEBYRANK', key, 0, -size - 1)
+end
+return #KEYS
+"""
+
+#: Merge the feeds in KEYS[2..] into KEYS[1], keeping the highest score of
+#: every member. With `ARGV[1]` > 0 only the newest `ARGV[1]` items of every
+#: feed are merged.
+MERGE_FEEDS = """
+local limit = tonumber(ARGV[1])
+if limit <= 0 then
+    local args = {KEYS[1], #KEYS}
+    for _, key in ipairs(KEYS) do
+        args[#args + 1] = key
+    end
+    args[#args + 1] = 'AGGREGATE'
+    args[#args + 1] = 'MAX'
+    return redis.call('ZUNIONSTORE', unpack(args))
+end
+for i = 2, #KEYS do
+    local rows = redis.call('ZREVRANGE', KEYS[i], 0, limit - 1, 'WITHSCORES')
+    for j = 1, #rows, 2 do
+        local score = redis.call('ZSCORE', KEYS[1], rows[j])
+        if not score or tonumber(score) < tonumber(rows[j + 1]) then
+            redis.call('ZADD', KEYS[1], rows[j + 1], rows[j])
+        end
+    end
+end
+return redis.call('ZCARD', KEYS[1])
+"""
+
+#: Add `ARGV[2]` with score `ARGV[1]` to every feed in KEYS[2..] if the
+#: last seen marker KEYS[1] exists, trim each feed to the newest `ARGV[3]`
+#: items unless `ARGV[3]` is 0 and expire it together with the marker.
+ADD_IF_ACTIVE = """
+local ttl = redis.call('TTL', KEYS[1])
+if ttl == -2 then
+    return 0
+end
+local size = tonumber(ARGV[3])
+for i = 2, #KEYS do
+    redis.call('ZADD', KEYS[i], ARGV[1], ARGV[2])
+    if size > 0 then
+        redis.call('ZREMRANGEBYRANK', KEYS[i], 0, -size - 1)
+    end
+    if ttl > 0 then
+        redis.call('EXPIRE', KEYS[i], ttl)
+    end
+end
+return #KEYS - 1
+"""
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import bisect
+import hashlib
+
+from ._compat import text_type
+
+def _hash(key):
+    if not isinstance(key, bytes):
+        key = text_type(key).encode('utf-8')
+
+    return int(hashlib.md5(key).hexdigest()[:8], 16)
+
+class HashRing(object):
+    """Consistent hash ring mapping keys onto a list of named nodes.
+
+    Every node is placed on the ring `replicas` times, so adding or removing
+    a node only moves about 1/N of the keys.
+    """
+
+    def __init__(self, names, replicas=160):
+        if not names:
+            raise ValueError('at least one node is required')
+
+        points = []
+
+        for index, name in enumerate(names):
+            for i in range(replicas):
+                points.append((_hash('%s-%d' % (name, i)), index))
+
+        points.sort()
+        self.names = list(names)
+        self._hashes = [h for h, _ in points]
+        self._nodes = [index for _, index in points]
+
+    def get_node(self, key):
+        '''Return the index of the node responsible for `key`.'''
+        i = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._nodes[i]
+
+def node_name(client):
+    '''Stable name of the Redis server a client is connected to.'''
+    kw = client.connection_pool.connection_kwargs
+
+    if kw.get('path'):
+        return 'unix://%s/%s' % (kw['path'], kw.get('db', 0))
+
+    return '%s:%s/%s' % (kw.get('host', 'localhost'), kw.get('port', 6379),
+        kw.get('db', 0))
+
+def _crc16_table():
+    table = []
+
+    for i in range(256):
+        crc = i << 8
+
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021 if crc & 0x8000 else crc << 1) & 0xffff
+
+        table.append(crc)
+
+    return table
+
+_CRC16_TABLE = _crc16_table()
+
+#: Number of hash slots in a Redis Cluster.
+CLUSTER_SLOTS = 16384
+
+def key_slot(key):
+    '''Redis Cluster hash slot of `key`. Only the part between the first `{`
+    and the following `}` is hashed if it is not empty.'''
+    if not isinstance(key, bytes):
+        key = text_type(key).encode('utf-8')
+
+    start = key.find(b'{')
+
+    if start != -1:
+        end = key.find(b'}', start + 1)
+
+        if end > start + 1:
+            key = key[start + 1:end]
+
+    crc = 0
+
+    for byte in bytearray(key):
+        crc = ((crc << 8) & 0xffff) ^ _CRC16_TABLE[(crc >> 8) ^ byte]
+
+    return crc % CLUSTER_SLOTS
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming formats used by `ActivityFeed.export_feeds()` and
+`ActivityFeed.import_feeds()`.
+
+A stream is a sequence of (key, member, score) records, grouped by key.
+Two formats are supported, both read and written through binary files:
+
+binary
+    The magic bytes `AFEED\\x01` followed by records made of a big-endian
+    header (key length, member length, score as a double) and the raw key
+    and member bytes.
+
+ndjson
+    One JSON object per line with `key`, `member` and `score`. Members that
+    are not valid UTF-8, e.g. packed by `CompactCodec`, are stored base64
+    encoded as `member_b64`.
+"""
+from __future__ import absolute_import
+
+import base64
+import json
+import struct
+from collections import namedtuple
+
+from ._compat import text_type
+
+MAGIC = b'AFEED\x01'
+
+#: Record header: key length, member length, score.
+_RECORD = struct.Struct('>HHd')
+
+class TransferStats(namedtuple('TransferStats',
+        ['keys', 'records', 'bytes', 'elapsed'])):
+    """Progress of an export or import. `records` counts the records read
+    or written so far, including skipped ones, so it can be passed as `skip`
+    to resume an import."""
+
+    @property
+    def rate(self):
+        '''Records per second.'''
+        return self.records / self.elapsed if self.elapsed else 0.0
+
+def _bytes(value):
+    if isinstance(value, bytes):
+        return value
+
+    if not isinstance(value, text_type):
+        value = text_type(value)
+
+    return value.encode('utf-8')
+
+class BinaryWriter(object):
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.fileobj.write(MAGIC)
+        self.bytes = len(MAGIC)
+
+    def write(self, key, member, score):
+        key, member = _bytes(key), _bytes(member)
+        data = _RECORD.pack(len(key), len(member), score) + key + member
+        self.fileobj.write(data)
+        self.bytes += len(data)
+
+class BinaryReader(object):
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+
+        if self._read(len(MAGIC)) != MAGIC:
+            raise ValueError('not an activity feed export')
+
+        self.bytes = len(MAGIC)
+
+    def _read(self, size):
+        data = self.fileobj.read(size)
+
+        if data and len(data) < size:
+            raise ValueError('truncated activity feed export')
+
+        return data
+
+    def __iter__(self):
+        while True:
+            header = self._read(_RECORD.size)
+
+            if not header:
+                return
+
+            key_len, member_len, score = _RECORD.unpack(header)
+            data = self._read(key_len + member_len)
+
+            if len(data) < key_len + member_len:
+                raise ValueError('truncated activity feed export')
+
+            self.bytes += len(header) + len(data)
+            yield data[:key_len], data[key_len:], score
+
+class JSONWriter(object):
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.bytes = 0
+
+    def write(self, key, member, score):
+        record = {'key': _bytes(key).decode('utf-8'), 'score': score}
+        member = _bytes(member)
+
+        try:
+            record['member'] = member.decode('utf-8')
+        except UnicodeDecodeError:
+            record['member_b64'] = base64.b64encode(member).decode('ascii')
+
+        data = json.dumps(record, sort_keys=True).encode('utf-8') + b'\n'
+        self.fileobj.write(data)
+        self.bytes += len(data)
+
+class JSONReader(object):
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.bytes = 0
+
+    def __iter__(self):
+        for line in self.fileobj:
+            self.bytes += len(line)
+
+            if not line.strip():
+                continue
+
+            record = json.loads(line.decode('utf-8'))
+
+            if 'member_b64' in record:
+                member = base64.b64decode(record['member_b64'])
+            else:
+                member = record['member'].encode('utf-8')
+
+            yield record['key'].encode('utf-8'), member, record['score']
+
+FORMATS = {
+    'binary': (BinaryWriter, BinaryReader),
+    'ndjson': (JSONWriter, JSONReader),
+}
+
+def _format(format):
+    if format not in FORMATS:
+        raise ValueError('unknown format {!r}, expected one of {}'.format(
+            format, ', '.join(sorted(FORMATS))))
+
+    return FORMATS[format]
+
+def writer(fileobj, format='binary'):
+    '''Return a record writer for a binary file object.'''
+    return _format(format)[0](fileobj)
+
+def reader(fileobj, format='binary'):
+    '''Return an iterable of (key, member, score) records read from a binary
+    file object.'''
+    return _format(format)[1](fileobj)
@@ -1,9 +1,14 @@
+from __future__ import print_function
+
+import base64
 import datetime
 import os
 import pkgutil
 import sys
 import time
 
+from ._compat import PY2, text_type, string_types, reraise
+
 try:
     from IPython.core.debugger import Pdb, BdbQuit_excepthook
 except ImportError:
@@ -17,17 +22,17 @@ def timeit(method):
     def wrapper(*args, **kw):
         t = time.time()
         result = method(*args, **kw)
-        print '%r (%r, %r) %2.3f sec' % \
-              (method.__name__, args, kw, time.time() - t)
+        print('%r (%r, %r) %2.3f sec' % \
+              (method.__name__, args, kw, time.time() - t))
         return result
     return wrapper
 
 def safe_unicode(s):
-    if isinstance(s, unicode):
+    if isinstance(s, text_type):
         return s
 
-    if not isinstance(s, basestring):
-        s = unicode(str(s))
+    if not isinstance(s, (bytes,) + string_types):
+        s = text_type(str(s))
 
     return s.decode('utf-8')
 
@@ -35,7 +40,7 @@ def safe_bytestr(s):
     try:
         return str(s)
     except UnicodeEncodeError:
-        return unicode(s).encode('utf-8')
+        return text_type(s).encode('utf-8')
 
 def datetime_to_timestamp(v):
     "Converts a Python datetime object to a unix timestamp"
@@ -59,7 +64,43 @@ def utcnow():
 
 def isiterable(v):
     '''check if v is iterable, but not a string'''
-    return not isinstance(v, basestring) and getattr(v, '__iter__', False)
+    return (not isinstance(v, (bytes,) + string_types)
+            and getattr(v, '__iter__', False))
+
+def encode_cursor(score, member):
+    '''Encode a (score, member) position in a feed as an opaque cursor.'''
+    if not isinstance(member, bytes):
+        member = text_type(member).encode('utf-8')
+
+    raw = repr(float(score)).encode('ascii') + b':' + member
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_cursor(cursor):
+    '''Decode a cursor created by `encode_cursor` into (score, member). The
+    member is returned as a byte string.
+
+    :raises ValueError: if the cursor is malformed.
+    '''
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii'))
+        score, member = raw.split(b':', 1)
+        return float(score), member
+    except (AttributeError, TypeError, ValueError):
+        raise ValueError('invalid cursor: %r' % (cursor,))
+
+def chunked(iterable, size):
+    '''Lazily split `iterable` into lists of at most `size` elements.'''
+    chunk = []
+
+    for v in iterable:
+        chunk.append(v)
+
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
 
 # Copyright (c) 2013 by Armin Ronacher and contributors.
 #
@@ -150,7 +191,7 @@ def import_string(import_name, silent=False):
     :return: imported object
     """
     # force the import name to automatically convert to strings
-    if isinstance(import_name, unicode):
+    if isinstance(import_name, text_type):
         import_name = str(import_name)
     try:
         if ':' in import_name:
@@ -161,7 +202,7 @@ def import_string(import_name, silent=False):
             return __import__(import_name)
         # __import__ is not able to handle unicode strings in the fromlist
         # if the module is a package
-        if isinstance(obj, unicode):
+        if PY2 and isinstance(obj, text_type):
             obj = obj.encode('utf-8')
         try:
             return getattr(__import__(module, None, None, [obj]), obj)
@@ -171,9 +212,10 @@ def import_string(import_name, silent=False):
             modname = module + '.' + obj
             __import__(modname)
             return sys.modules[modname]
-    except ImportError, e:
+    except ImportError as e:
         if not silent:
-            raise ImportStringError(import_name, e), None, sys.exc_info()[2]
+            reraise(ImportStringError, ImportStringError(import_name, e),
+                    sys.exc_info()[2])
 
 def get_root_path(import_name):
     """Returns the path to a package or cwd if that cannot be found.  This
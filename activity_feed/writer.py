@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    from ._utils_speedups import isiterable
+except ImportError:
+    from .utils import isiterable
+
+from .connection import zadd_many
+
+class BufferedFeedWriter(object):
+    """Collect item writes in memory and apply them in one pipeline per node.
+
+    Repeated writes of the same item to the same feed are merged, the last
+    timestamp wins as it would with ZADD. Buffered writes are flushed when
+    `max_items` distinct writes are pending, when the oldest pending write
+    is older than `max_delay` seconds, on `flush()`, on `close()` and when
+    leaving a `with` block. `start()` runs a background thread flushing
+    every `interval` seconds, for writers that may go idle.
+
+        with BufferedFeedWriter(activity_feed) as writer:
+            for event in events:
+                writer.add_item(event.user_id, event.id, event.timestamp)
+
+    Writes are not visible to readers until flushed. If a flush fails its
+    writes are put back into the buffer and the error is raised.
+
+    :param activity_feed: [ActivityFeed] Feeds to write to.
+    :param max_items: [int, 1000] Number of pending writes triggering a
+                      flush.
+    :param max_delay: [float, None] Age in seconds of the oldest pending
+                      write triggering a flush on the next write.
+    :param timer: [callable, time.time] Clock used for `max_delay`.
+    """
+
+    def __init__(self, activity_feed, max_items=1000, max_delay=None,
+            timer=time.time):
+        if max_items < 1:
+            raise ValueError('max_items must be a positive integer')
+
+        self.activity_feed = activity_feed
+        self.max_items = max_items
+        self.max_delay = max_delay
+        self._timer = timer
+        self._lock = threading.RLock()
+        self._pending = OrderedDict()
+        self._size = 0
+        self._since = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def __len__(self):
+        return self._size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def update_item(self, user_id, item_id, timestamp, aggregate=None):
+        """Buffer adding or updating an item in the activity feed of
+        `user_id`, see `ActivityFeed.update_item`."""
+        a = self.activity_feed
+
+        if aggregate is None:
+            aggregate = a.aggregate
+
+        feeds = [(a.feed_key(user_id, False), None)]
+
+        if aggregate:
+            feeds.append((a.feed_key(user_id, True), user_id))
+
+        self._add(a._node_index(user_id), feeds, timestamp, item_id)
+
+    add_item = update_item
+
+    def aggregate_item(self, user_id, item_id, timestamp):
+        """Buffer adding an item to the aggregate activity feed of `user_id`,
+        or of every user if `user_id` is an iterable."""
+        a = self.activity_feed
+        user_ids = user_id if isiterable(user_id) else (user_id,)
+
+        for uid in user_ids:
+            self._add(a._node_index(uid), [(a.feed_key(uid, True), uid)],
+                timestamp, item_id)
+
+    def _add(self, node, keys, timestamp, item_id):
+        '''Buffer a write of `item_id` to `keys`, (feed key, user ID) pairs
+        where the user ID is set for aggregate feeds only.'''
+        score = self.activity_feed._encode_score(timestamp)
+        member = self.activity_feed._encode_member(item_id)
+
+        with self._lock:
+            feeds = self._pending.setdefault(node, OrderedDict())
+
+            for key in keys:
+                members = feeds.setdefault(key, OrderedDict())
+
+                if member not in members:
+                    self._size += 1
+
+                members[member] = score
+
+            if self._since is None:
+                self._since = self._timer()
+
+            if self._size >= self.max_items or (self.max_delay is not None
+                    and self._timer() - self._since >= self.max_delay):
+                self.flush()
+
+    def flush(self):
+        """Apply every pending write, one pipeline per node.
+
+        @return the number of writes applied.
+        """
+        with self._lock:
+            pending, size = self._pending, self._size
+            self._pending, self._size, self._since = OrderedDict(), 0, None
+
+            try:
+                for node, feeds in pending.items():
+                    self._flush_node(node, feeds)
+            except Exception:
+                self._restore(pending)
+                raise
+
+            return size
+
+    def _flush_node(self, node, feeds):
+        a = self.activity_feed
+        # Keys of many users span slots, which MULTI rejects in a cluster.
+        pipe = a.nodes[node].pipeline(transaction=not a.cluster)
+        written = []
+
+        for (key, user_id), members in feeds.items():
+            if user_id is not None and a.active_window is not None:
+                # Skips users outside the window, one script call per item.
+                for member, score in members.items():
+                    a._add_aggregate(pipe, user_id, score, member)
+
+                continue
+
+            written.append(key)
+            zadd_many(pipe, key, [(s, m) for m, s in members.items()])
+
+            if a.max_size:
+                pipe.zremrangebyrank(key, 0, -a.max_size - 1)
+
+            a._unarchive([key], list(members))
+
+            if user_id is not None:
+                for member in members:
+                    a._index_item(pipe, key, member)
+
+        a._bump_versions(pipe, written)
+        pipe.execute()
+
+    def _restore(self, pending):
+        '''Put the writes of a failed flush back, keeping newer writes.'''
+        for node, feeds in pending.items():
+            for key, members in feeds.items():
+                current = self._pending.setdefault(node,
+                    OrderedDict()).setdefault(key, OrderedDict())
+
+                for member, score in members.items():
+                    if member not in current:
+                        current[member] = score
+                        self._size += 1
+
+        if self._size and self._since is None:
+            self._since = self._timer()
+
+    def start(self, interval=1.0):
+        """Flush from a background thread every `interval` seconds until
+        `close()` is called."""
+        if self._thread is not None:
+            raise RuntimeError('writer already started')
+
+        self._stopped.clear()
+
+        def run():
+            while not self._stopped.wait(interval):
+                if self._size:
+                    try:
+                        self.flush()
+                    except Exception:
+                        # Kept in the buffer and retried on the next tick.
+                        pass
+
+        self._thread = threading.Thread(target=run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def close(self):
+        '''Stop the background thread, if any, and flush.'''
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+
+        self.flush()
@@ -13,7 +13,7 @@ def timestamp_utcnow():
     return datetime_to_timestamp(utcnow())
 
 def _empty(a):
-    keys = a.redis.keys('{}*'.format(a.namespace))
+    keys = list(a.redis.scan_iter(match='{}*'.format(a.namespace)))
 
     if keys:
         a.redis.delete(*keys)
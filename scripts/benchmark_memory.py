@@ -0,0 +1,63 @@
+#! /usr/bin/python
+"""
+Measure the Redis memory used per feed item with and without a codec.
+
+Fills feeds of different sizes with random 64 bit item IDs, one item per
+second, and reports `MEMORY USAGE` (Redis 4+) divided by the number of
+items. Small feeds use the listpack encoding, large feeds a skiplist.
+
+    python scripts/benchmark_memory.py [redis-url]
+"""
+from __future__ import print_function
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from activity_feed import ActivityFeed
+from activity_feed.codec import CompactCodec
+
+CODECS = [
+    ('plain', None),
+    ('sequence', CompactCodec(None, 20)),
+    ('packed-8', CompactCodec(8)),
+    ('packed-4', CompactCodec(4)),
+    ('packed-8+sequence', CompactCodec(8, 20)),
+]
+
+SIZES = [100, 1000, 10000]
+
+def bytes_per_item(url, codec, size):
+    a = ActivityFeed(redis=url, namespace='benchmark_memory', codec=codec)
+    rnd = random.Random(size)
+    max_id = 2 ** 31 if codec is not None and codec.member_width == 4 \
+        else 2 ** 62
+    now = 1400000000
+    pipe = a.redis.pipeline(transaction=False)
+    key = a.feed_key('user')
+
+    a.redis.delete(key)
+
+    for i in range(size):
+        a._add_item(pipe, [key], a._encode_score(now + i),
+            a._encode_member(rnd.randint(1, max_id)))
+
+    pipe.execute()
+
+    try:
+        used = a.redis.execute_command('MEMORY', 'USAGE', key, 'SAMPLES', 0)
+        return used / float(size)
+    finally:
+        a.redis.delete(key)
+
+def main(url):
+    print('%-20s' % 'codec' + ''.join('%12s' % n for n in SIZES))
+
+    for name, codec in CODECS:
+        row = [bytes_per_item(url, codec, n) for n in SIZES]
+        print('%-20s' % name + ''.join('%12.1f' % v for v in row))
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else 'redis://:@localhost:6379/15')
@@ -0,0 +1,54 @@
+#! /usr/bin/python
+"""
+Export the feeds of a namespace to a file or import them back, printing the
+throughput while running.
+
+    python scripts/transfer_feeds.py export feeds.bin [--redis URL]
+    python scripts/transfer_feeds.py import feeds.bin [--skip N]
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from activity_feed import ActivityFeed
+
+def report(stats):
+    print('\r%d keys, %d records, %.1f MB, %.0f records/s' % (stats.keys,
+        stats.records, stats.bytes / 1e6, stats.rate), end='')
+    sys.stdout.flush()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('command', choices=['export', 'import'])
+    parser.add_argument('path')
+    parser.add_argument('--redis', action='append',
+        help='Redis URL, repeat for sharded feeds')
+    parser.add_argument('--namespace', default='activity_feed')
+    parser.add_argument('--format', default='binary',
+        choices=['binary', 'ndjson'])
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--skip', type=int, default=0,
+        help='records to skip when resuming an import')
+    args = parser.parse_args()
+
+    redis = args.redis or ['redis://:@localhost:6379/0']
+    a = ActivityFeed(redis=redis if len(redis) > 1 else redis[0],
+        namespace=args.namespace)
+
+    if args.command == 'export':
+        with open(args.path, 'wb') as f:
+            stats = a.export_feeds(f, args.format, args.chunk_size, report)
+    else:
+        with open(args.path, 'rb') as f:
+            stats = a.import_feeds(f, args.format, args.chunk_size,
+                args.skip, report)
+
+    report(stats)
+    print()
+
+if __name__ == '__main__':
+    main()
@@ -66,10 +66,12 @@ def run_setup(with_binary):
         long_description=__doc__,
         keywords="redis",
         platforms='any',
-        packages=['activity_feed'],
+        packages=['activity_feed', 'activity_feed.backends'],
         install_requires=[
             'redis',
             'leaderboard>=3.5.0'],
+        extras_require={
+            'asyncio': ['redis>=5.0.1']},
         cmdclass=cmdclass,
         features=features,
         test_suite="nose.collector",
@@ -80,6 +82,8 @@ def run_setup(with_binary):
             "License :: OSI Approved :: MIT License",
             "Operating System :: POSIX",
             "Programming Language :: Python",
+            "Programming Language :: Python :: 2",
+            "Programming Language :: Python :: 3",
             "Topic :: Software Development",
             "Topic :: Software Development :: Libraries",
         ],
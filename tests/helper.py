@@ -1,8 +1,11 @@
+import os
 import unittest
 
 import datetime
 
 from activity_feed import ActivityFeed
+from activity_feed.backends.memory import MemoryBackend
+from activity_feed.backends.sqlite import SQLiteBackend
 from activity_feed.utils import datetime_to_timestamp, utcnow
 
 def timestamp(*args):
@@ -11,14 +14,50 @@ def timestamp(*args):
 def timestamp_utcnow():
     return datetime_to_timestamp(utcnow())
 
+def connection():
+    '''The backend selected by ACTIVITY_FEED_BACKEND (memory or sqlite), or
+    None to use the Redis test database.'''
+    backend = os.environ.get('ACTIVITY_FEED_BACKEND')
+
+    if backend == 'memory':
+        return MemoryBackend()
+
+    if backend == 'sqlite':
+        return SQLiteBackend()
+
+class Recording(object):
+    '''Client wrapper recording the transaction flag of its pipelines. Like
+    the pipelines of a Redis Cluster client, pipelines that are not
+    transactions reject MULTI.'''
+
+    def __init__(self, client):
+        self.client = client
+        self.transactions = []
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def pipeline(self, transaction=True):
+        self.transactions.append(transaction)
+        pipe = self.client.pipeline(transaction=transaction)
+
+        if not transaction:
+            def multi():
+                raise RuntimeError('MULTI is not supported in cluster mode')
+
+            pipe.multi = multi
+
+        return pipe
+
 class BaseTest(unittest.TestCase):
     def setUp(self):
-        self.a = ActivityFeed(redis='redis://:@localhost:6379/15')
+        self.a = ActivityFeed(redis='redis://:@localhost:6379/15',
+            connection=connection())
         self._empty()
 
     def _empty(self):
         a = self.a
-        keys = a.redis.keys('{}*'.format(a.namespace))
+        keys = list(a.redis.scan_iter(match='{}*'.format(a.namespace)))
 
         if keys:
             a.redis.delete(*keys)
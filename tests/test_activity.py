@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+from tests.helper import BaseTest, timestamp_utcnow
+
+from activity_feed import ActivityFeed, BufferedFeedWriter
+from activity_feed.delivery import Delivery
+
+FOLLOWERS = {
+    'tom': ['david', 'anna'],
+    'anna': ['david'],
+}
+
+def followers(user_id):
+    return FOLLOWERS.get(user_id, [])
+
+def followees(user_id):
+    return [uid for uid, f in sorted(FOLLOWERS.items()) if user_id in f]
+
+class ActiveUsersTest(BaseTest):
+    def setUp(self):
+        super(ActiveUsersTest, self).setUp()
+        self.a.delivery = Delivery(followers, followees)
+        self.a.active_window = 100
+        self.now = timestamp_utcnow()
+
+    def ints(self, items):
+        return [int(v) for v in items]
+
+    def fanout_skips_dormant_users_test(self):
+        'should not aggregate items for users not seen within the window'
+        self.a.publish('tom', 1, self.now + 1)
+        self.a.aggregate_item('david', 2, self.now + 2)
+
+        self.assertEqual(self.a.total_items('david', True), 0)
+        self.assertEqual(self.a.total_items('anna', True), 0)
+        self.assertEqual(self.a.total_items('tom', False), 1)
+
+    def rebuild_on_read_test(self):
+        'should rebuild the aggregate feed of a returning user'
+        self.a.publish('tom', 1, self.now + 1)
+        self.a.publish('anna', 2, self.now + 2)
+        self.a.update_item('david', 3, self.now + 3)
+
+        self.assertEqual(self.ints(self.a.feed('david', 1, aggregate=True)),
+            [3, 2, 1])
+        marker = self.a.last_seen_marker_key('david')
+        self.assertTrue(0 < self.a.redis.ttl(marker) <= 100)
+        self.assertTrue(0 < self.a.redis.ttl(self.a.feed_key('david', True))
+                        <= 100)
+
+    def active_users_receive_items_test(self):
+        'should push items to users seen within the window'
+        self.assertTrue(self.a.touch('david'))
+        self.assertFalse(self.a.touch('david'))
+
+        self.a.publish('tom', 4, self.now + 4)
+        self.a.aggregate_item(['david', 'anna'], 5, self.now + 5)
+
+        key = self.a.feed_key('david', True)
+        self.assertEqual(self.ints(self.a.redis.zrevrange(key, 0, -1)), [5, 4])
+        self.assertTrue(0 < self.a.redis.ttl(key) <= 100)
+        self.assertEqual(self.a.total_items('anna', True), 0)
+
+    def expired_user_test(self):
+        'should rebuild after the marker expired'
+        self.a.touch('david')
+        self.a.publish('tom', 1, self.now + 1)
+        self.a.redis.delete(self.a.last_seen_marker_key('david'),
+            self.a.feed_key('david', True))
+        self.a.publish('tom', 2, self.now + 2)
+
+        self.assertEqual(self.a.total_items('david', True), 0)
+        self.assertTrue(self.a.touch('david'))
+        self.assertEqual(self.ints(self.a.feed('david', 1, aggregate=True)),
+            [2, 1])
+
+    def batch_test(self):
+        'should skip dormant users in batches'
+        with self.a.batch() as b:
+            b.aggregate_item('david', 1, self.now)
+            b.update_item('anna', 2, self.now, aggregate=True)
+
+        self.assertEqual(self.a.total_items('david', True), 0)
+        self.assertEqual(self.a.total_items('anna', True), 0)
+        self.assertEqual(self.a.total_items('anna', False), 1)
+
+    def batch_feed_test(self):
+        'should rebuild the aggregate feed of a returning user read in a batch'
+        self.a.publish('tom', 1, self.now + 1)
+
+        with self.a.batch() as b:
+            page = b.feed('david', 1, True)
+
+        self.assertEqual(self.ints(page.result()), [1])
+        self.assertTrue(self.a.redis.exists(self.a.last_seen_marker_key(
+            'david')))
+
+    def buffered_writer_test(self):
+        'should skip dormant users in buffered writes'
+        self.a.touch('anna')
+
+        with BufferedFeedWriter(self.a) as writer:
+            writer.aggregate_item(['david', 'anna'], 1, self.now + 1)
+            writer.update_item('david', 2, self.now + 2, aggregate=True)
+            writer.aggregate_item('anna', 3, self.now + 3)
+
+        key = self.a.feed_key('anna', True)
+        self.assertEqual(self.ints(self.a.redis.zrevrange(key, 0, -1)), [3, 1])
+        self.assertTrue(0 < self.a.redis.ttl(key) <= 100)
+        self.assertEqual(self.a.redis.exists(self.a.feed_key('david', True)),
+            0)
+        self.assertEqual(self.a.total_items('david', False), 1)
+
+    def touch_requires_window_test(self):
+        'should require an active window and a delivery policy'
+        self.a.active_window = None
+        self.assertRaises(RuntimeError, self.a.touch, 'david')
+
+        self.a.active_window = 100
+        self.a.delivery = None
+        self.assertRaises(RuntimeError, self.a.touch, 'david')
+        self.assertFalse(self.a.redis.exists(self.a.last_seen_marker_key(
+            'david')))
+        self.assertRaises(ValueError, ActivityFeed, active_window=100)
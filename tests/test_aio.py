@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import sys
+import time
+import unittest
+
+from tests.helper import timestamp_utcnow
+
+class AsyncActivityFeedTest(unittest.TestCase):
+    def setUp(self):
+        if sys.version_info < (3, 6):
+            raise unittest.SkipTest('asyncio client requires Python 3.6+')
+
+        import asyncio
+        from activity_feed.aio import AsyncActivityFeed
+
+        self.loop = asyncio.new_event_loop()
+        self.a = AsyncActivityFeed(redis='redis://:@localhost:6379/15')
+        keys = self.run_async(self.a.redis.keys('{}*'.format(self.a.namespace)))
+
+        if keys:
+            self.run_async(self.a.redis.delete(*keys))
+
+    def tearDown(self):
+        self.run_async(self.a.close())
+        self.loop.close()
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def collect(self, agen):
+        items = []
+
+        while True:
+            try:
+                items.append(self.run_async(agen.__anext__()))
+            except StopAsyncIteration:
+                return items
+
+    def add_items_to_feed(self, user_id, items_to_add=5, aggregate=None):
+        now = timestamp_utcnow()
+
+        for i in range(1, items_to_add + 1):
+            self.run_async(self.a.update_item(user_id, i, now, aggregate))
+            now += 5
+
+    def feed_test(self):
+        'should return an activity feed with the items correctly ordered'
+        self.add_items_to_feed('david', 5, True)
+
+        feed = self.run_async(self.a.feed('david', 1))
+        self.assertEqual([int(v) for v in feed], [5, 4, 3, 2, 1])
+        feed = self.run_async(self.a.feed('david', 2, True, page_size=3))
+        self.assertEqual([int(v) for v in feed], [2, 1])
+        self.assertEqual(self.run_async(self.a.total_items('david')), 5)
+        self.assertEqual(self.run_async(self.a.total_pages('david', True, 2)), 3)
+
+    def async_items_loader_test(self):
+        'should await coroutine item loaders'
+        calls = []
+
+        def item_loader(v):
+            fut = self.loop.create_future()
+            fut.set_result('item-%d' % int(v))
+            calls.append(v)
+            return fut
+
+        self.a._resolve_item_loaders(item_loader=item_loader)
+        self.add_items_to_feed('david', 3)
+
+        feed = self.run_async(self.a.feed('david', 1))
+        self.assertEqual(feed, ['item-3', 'item-2', 'item-1'])
+        self.assertEqual(len(calls), 3)
+
+    def feeds_for_test(self):
+        'should return a page of many feeds at once'
+        self.add_items_to_feed('david', 3)
+        self.add_items_to_feed('luke', 1)
+
+        feeds = self.run_async(self.a.feeds_for(['david', 'luke'], 1))
+        self.assertEqual([int(v) for v in feeds['david']], [3, 2, 1])
+        self.assertEqual([int(v) for v in feeds['luke']], [1])
+
+        calls = []
+        dropped = []
+
+        def items_loader(ids):
+            calls.append(len(ids))
+            return [int(v) for v in ids if int(v) not in dropped]
+
+        self.a.items_loader = items_loader
+        feeds = self.run_async(self.a.feeds_for(['david', 'luke'], 1))
+        self.assertEqual(feeds, {'david': [3, 2, 1], 'luke': [1]})
+        self.assertEqual(calls, [3])
+
+        dropped.append(2)
+        feeds = self.run_async(self.a.feeds_for(['david', 'luke'], 1))
+        self.assertEqual(feeds, {'david': [3, 1], 'luke': [1]})
+        self.assertEqual(calls, [3, 3, 3, 1])
+
+    def feed_after_test(self):
+        'should page through an activity feed with a cursor'
+        self.add_items_to_feed('david', 5)
+
+        items, cursor = self.run_async(self.a.feed_after('david', limit=3))
+        self.assertEqual([int(v) for v in items], [5, 4, 3])
+        items, cursor = self.run_async(self.a.feed_after('david', cursor, 3))
+        self.assertEqual([int(v) for v in items], [2, 1])
+        self.assertEqual(cursor, None)
+
+    def iter_feed_test(self):
+        'should iterate over the full activity feed in batches'
+        self.add_items_to_feed('david', 12)
+
+        items = self.collect(self.a.iter_feed('david', batch_size=5))
+        self.assertEqual([int(v) for v in items], list(range(12, 0, -1)))
+
+    def fanout_item_test(self):
+        'should fan out an item with several pipelines in flight'
+        users = ('user_%d' % i for i in range(20))
+        stats = self.run_async(self.a.fanout_item(users, 1, timestamp_utcnow(),
+            chunk_size=3, max_in_flight=3))
+
+        self.assertEqual([s.size for s in stats], [3] * 6 + [2])
+
+        for i in range(20):
+            self.assertEqual(
+                self.run_async(self.a.check_item('user_%d' % i, 1, True)), True)
+
+    def max_size_test(self):
+        'should keep capped feeds bounded'
+        self.a.max_size = 2
+        self.add_items_to_feed('david', 4, True)
+        self.run_async(self.a.aggregate_item(['luke'], 9, timestamp_utcnow()))
+
+        self.assertEqual([int(v) for v in self.run_async(self.a.feed('david', 1))], [4, 3])
+        self.assertEqual([int(v) for v in self.run_async(self.a.feed('david', 1, True))], [4, 3])
+        self.assertEqual(self.run_async(self.a.total_items('luke', True)), 1)
+
+    def remove_item_test(self):
+        'should remove items from the feeds of many users'
+        self.add_items_to_feed('david', 3, True)
+        self.add_items_to_feed('luke', 3, True)
+
+        self.run_async(self.a.remove_item(['david', 'luke'], [1, 2]))
+
+        for user_id in ('david', 'luke'):
+            self.assertEqual([int(v) for v in self.run_async(self.a.feed(user_id, 1))], [3])
+            self.assertEqual([int(v) for v in self.run_async(self.a.feed(user_id, 1, True))], [3])
+
+    def trim_and_remove_feeds_test(self):
+        'should trim and remove activity feeds'
+        self.add_items_to_feed('david', 5, True)
+
+        self.assertEqual(self.run_async(self.a.trim_feed_to_size('david', 3)), 2)
+        self.assertEqual(self.run_async(self.a.total_items('david')), 3)
+
+        self.run_async(self.a.remove_feeds('david'))
+        self.assertEqual(self.run_async(self.a.total_items('david')), 0)
+        self.assertEqual(self.run_async(self.a.total_items('david', True)), 0)
+
+    def expire_test(self):
+        'should expire a feed and its version counter'
+        self.a.versioned = True
+        self.add_items_to_feed('david', 2)
+        version_key = self.a._version_key(self.a.feed_key('david'))
+        version = int(self.run_async(self.a.redis.get(version_key)))
+
+        self.run_async(self.a.expire_feed('david', 60))
+        self.assertEqual(int(self.run_async(self.a.redis.get(version_key))),
+            version + 1)
+        self.assertTrue(0 < self.run_async(self.a.redis.ttl(version_key)) <= 60)
+
+        self.run_async(self.a.expire_feed_at('david', int(time.time()) + 30))
+        self.assertTrue(0 < self.run_async(self.a.redis.ttl(version_key)) <= 30)
+        self.assertTrue(0 < self.run_async(self.a.redis.ttl(
+            self.a.feed_key('david'))) <= 30)
+
+    def codec_test(self):
+        'should encode items and timestamps with the configured codec'
+        from activity_feed.codec import CompactCodec
+
+        self.a.codec = CompactCodec(8, 20)
+        now = timestamp_utcnow()
+
+        for i in (3, 1, 2):
+            self.run_async(self.a.update_item('david', i, now))
+
+        self.run_async(self.a.fanout_item(['luke'], 4, now + 1))
+
+        self.assertEqual(self.run_async(self.a.feed('david', 1)), [2, 1, 3])
+        self.assertEqual(self.run_async(self.a.feeds_for(['luke'], 1, True)),
+            {'luke': [4]})
+        self.assertEqual(self.run_async(self.a.count_between('david', now, now)), 3)
+        self.assertEqual(self.run_async(self.a.check_item('david', 1)), True)
+
+        self.run_async(self.a.remove_item('david', [1, 2]))
+        self.assertEqual(self.run_async(self.a.feed('david', 1)), [3])
+
+    def unsupported_options_test(self):
+        'should reject options the asyncio client does not implement'
+        from activity_feed.aio import AsyncActivityFeed
+
+        self.assertRaises(ValueError, AsyncActivityFeed, item_index=True)
+        self.assertRaises(ValueError, AsyncActivityFeed, active_window=60)
+        self.assertRaises(ValueError, AsyncActivityFeed, delivery=object())
+        self.assertRaises(ValueError, AsyncActivityFeed, archive=object())
+        self.assertRaises(ValueError, AsyncActivityFeed,
+            redis=['redis://localhost:6379/14', 'redis://localhost:6379/15'])
+        self.assertRaises(ValueError, AsyncActivityFeed,
+            connection=[self.a.redis])
@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from tests.helper import BaseTest, timestamp_utcnow
+
+from activity_feed import ActivityFeed
+from activity_feed.archive import Archive, Demoter
+from activity_feed.graph import FollowGraph
+
+class ArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.archive = Archive(self.directory, shards=4)
+
+    def tearDown(self):
+        self.archive.close()
+        shutil.rmtree(self.directory)
+
+    def rows_test(self):
+        'should return archived rows ordered by score, newest first'
+        self.archive.append('feed', [(b'1', 1.0), (b'3', 3.0), (b'2', 2.0)])
+
+        self.assertEqual(self.archive.rows('feed'),
+            [(b'3', 3.0), (b'2', 2.0), (b'1', 1.0)])
+        self.assertEqual(self.archive.count('feed'), 3)
+        self.assertEqual(self.archive.score('feed', 2), 2.0)
+        self.assertEqual(self.archive.score('feed', 4), None)
+        self.assertTrue('feed' in self.archive)
+        self.assertFalse('other' in self.archive)
+
+    def remove_and_clear_test(self):
+        'should replay removals and cleared feeds'
+        self.archive.append('feed', [(b'1', 1.0), (b'2', 2.0)])
+        self.archive.remove('feed', [b'1'])
+        self.assertEqual(self.archive.rows('feed'), [(b'2', 2.0)])
+
+        self.archive.clear('feed')
+        self.assertEqual(self.archive.rows('feed'), [])
+
+        self.archive.append('feed', [(b'5', 5.0)])
+        self.assertEqual(self.archive.rows('feed'), [(b'5', 5.0)])
+
+    def ranges_and_expiry_test(self):
+        'should trim archived feeds and expire them'
+        self.archive.append('feed', [(b'1', 1.0), (b'2', 2.0), (b'3', 3.0)])
+        self.assertEqual(self.archive.remove_range_by_score('feed', 2, 3), 2)
+        self.assertEqual(self.archive.rows('feed'), [(b'1', 1.0)])
+
+        self.archive.append('feed', [(b'4', 4.0), (b'5', 5.0)])
+        self.assertEqual(self.archive.trim_to_size('feed', 1), 2)
+        self.assertEqual(self.archive.rows('feed'), [(b'5', 5.0)])
+
+        self.archive.expire_at('feed', time.time() + 60)
+        self.assertEqual(self.archive.count('feed'), 1)
+        self.archive.expire_at('feed', time.time() - 1)
+        self.assertEqual(self.archive.rows('feed'), [])
+
+        self.archive.append('feed', [(b'6', 6.0)])
+        self.assertEqual(self.archive.rows('feed'), [(b'6', 6.0)])
+
+    def reopen_test(self):
+        'should read records appended by another instance'
+        self.archive.append('feed', [(b'1', 1.0)])
+        other = Archive(self.directory, shards=4)
+
+        try:
+            self.assertEqual(other.rows('feed'), [(b'1', 1.0)])
+            self.archive.append('feed', [(b'2', 2.0)])
+            self.assertEqual(other.rows('feed'), [(b'2', 2.0), (b'1', 1.0)])
+        finally:
+            other.close()
+
+    def compact_test(self):
+        'should drop dead records when compacting'
+        self.archive.append('feed', [(str(i).encode(), float(i))
+                                     for i in range(100)])
+        self.archive.remove('feed', [str(i).encode() for i in range(90)])
+        rows = self.archive.rows('feed')
+        size = sum(os.path.getsize(os.path.join(self.directory, name))
+                   for name in os.listdir(self.directory))
+
+        self.archive.compact()
+
+        self.assertEqual(self.archive.rows('feed'), rows)
+        self.assertTrue(sum(os.path.getsize(os.path.join(self.directory, n))
+                            for n in os.listdir(self.directory)) < size)
+
+class TieredFeedTest(BaseTest):
+    def setUp(self):
+        super(TieredFeedTest, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.a = ActivityFeed(connection=self.a.redis,
+            archive=Archive(self.directory), hot_size=3)
+
+    def tearDown(self):
+        self.a.archive.close()
+        shutil.rmtree(self.directory)
+
+    def demote_test(self):
+        'should move items past the hot tier to the archive'
+        self.add_items_to_feed('david', 5)
+
+        self.assertEqual(self.a.demote('david'), 2)
+        self.assertEqual(self.a.redis.zcard(self.a.feed_key('david')), 3)
+        self.assertEqual(self.a.demote('david'), 0)
+
+    def read_through_test(self):
+        'should read feeds through to the archive'
+        self.add_items_to_feed('david', 5)
+        self.a.demote('david')
+
+        self.assertEqual([int(i) for i in self.a.feed('david', 1)],
+            [5, 4, 3, 2, 1])
+        self.assertEqual([int(i) for i in
+                          self.a.feed('david', 2, page_size=2)], [3, 2])
+        self.assertEqual([int(i) for i in
+                          self.a.feed('david', 3, page_size=2)], [1])
+        self.assertEqual([int(i) for i in self.a.full_feed('david')],
+            [5, 4, 3, 2, 1])
+        self.assertEqual([int(i) for i in
+                          self.a.iter_feed('david', batch_size=2)],
+            [5, 4, 3, 2, 1])
+        self.assertEqual(self.a.total_items('david'), 5)
+        self.assertEqual(self.a.total_pages('david', page_size=2), 3)
+        self.assertTrue(self.a.check_item('david', 1))
+        self.assertFalse(self.a.check_item('david', 6))
+
+    def cursor_read_through_test(self):
+        'should read cursor pages and multi-user pages through to the archive'
+        self.add_items_to_feed('david', 5)
+        self.a.demote('david')
+        pages = []
+        items, cursor = self.a.feed_after('david', limit=2)
+        pages.append([int(i) for i in items])
+
+        while cursor is not None:
+            items, cursor = self.a.feed_after('david', cursor, limit=2)
+            pages.append([int(i) for i in items])
+
+        self.assertEqual(pages, [[5, 4], [3, 2], [1]])
+        self.assertEqual([int(i) for i in self.a.feeds_for(['david', 'tom'],
+            2, page_size=2)['david']], [3, 2])
+        self.assertEqual([int(i) for i in self.a.feeds_for(['david'], 3,
+            page_size=2)['david']], [1])
+
+    def between_test(self):
+        'should include archived items in score ranges'
+        now = timestamp_utcnow()
+
+        for i in range(1, 6):
+            self.a.update_item('david', i, now + i)
+
+        self.a.demote('david')
+
+        self.assertEqual([int(i) for i in
+                          self.a.feed_between_timestamps('david', now,
+                              now + 4)], [4, 3, 2, 1])
+        self.assertEqual([int(i) for i in
+                          self.a.iter_between('david', now, now + 4,
+                              batch_size=2)], [4, 3, 2, 1])
+        self.assertEqual(self.a.count_between('david', now, now + 4), 4)
+        self.assertEqual([int(i) for i in
+                          self.a.feed_between_timestamps('david', now,
+                              now + 5, limit=2, offset=2)], [3, 2])
+        self.assertEqual([int(i) for i in
+                          self.a.feed_between_timestamps('david', now,
+                              now + 5, limit=2, offset=3)], [2, 1])
+        self.assertEqual([int(i) for i in
+                          self.a.feed_between_timestamps('david', now,
+                              now + 5, offset=4)], [1])
+
+        with self.a.batch() as b:
+            page = b.feed_between_timestamps('david', now, now + 5, limit=2,
+                offset=2)
+
+        self.assertEqual([int(i) for i in page.result()], [3, 2])
+        self.assertEqual(self.a.archive.rows_between(self.a.feed_key('david'),
+            now + 1, now + 2, start=1), [(b'1', now + 1)])
+
+    def remove_test(self):
+        'should remove archived items and feeds'
+        self.add_items_to_feed('david', 5)
+        self.a.demote('david')
+
+        self.a.remove_item('david', 1)
+        self.assertEqual(self.a.total_items('david'), 4)
+        self.assertFalse(self.a.check_item('david', 1))
+
+        self.a.remove_feeds('david')
+        self.assertEqual(self.a.total_items('david'), 0)
+        self.assertEqual(self.a.full_feed('david'), [])
+
+    def trim_test(self):
+        'should trim archived items in the trimmed range'
+        now = timestamp_utcnow()
+
+        for i in range(1, 6):
+            self.a.update_item('david', i, now + i)
+
+        self.a.demote('david')
+        self.a.trim_feed('david', now + 1, now + 4)
+
+        self.assertEqual([int(i) for i in self.a.full_feed('david')], [5])
+        self.assertEqual(self.a.feed_between_timestamps('david', now,
+            now + 4), [])
+        self.assertEqual(self.a.total_items('david'), 1)
+
+    def trim_to_size_test(self):
+        'should count archived items when trimming to a size'
+        self.add_items_to_feed('david', 5)
+        self.a.demote('david')
+
+        self.assertEqual(self.a.trim_feed_to_size('david', 4), 1)
+        self.assertEqual([int(i) for i in self.a.full_feed('david')],
+            [5, 4, 3, 2])
+        self.assertEqual(self.a.trim_feed_to_size('david', 2), 2)
+        self.assertEqual([int(i) for i in self.a.full_feed('david')], [5, 4])
+        self.assertEqual(self.a.total_items('david'), 2)
+
+    def expire_test(self):
+        'should expire archived items with their feed'
+        self.add_items_to_feed('david', 5)
+        self.a.demote('david')
+        self.a.expire_feed('david', 60)
+        self.assertEqual(self.a.total_items('david'), 5)
+
+        self.a.expire_feed_at('david', int(time.time()) - 1)
+        self.assertEqual(self.a.total_items('david'), 0)
+        self.assertEqual(self.a.full_feed('david'), [])
+        self.assertFalse(self.a.check_item('david', 1))
+
+    def batch_trim_and_expire_test(self):
+        'should trim and expire archived items in a batch'
+        now = timestamp_utcnow()
+
+        for i in range(1, 6):
+            self.a.update_item('david', i, now + i)
+
+        self.a.demote('david')
+
+        with self.a.batch() as b:
+            b.trim_feed('david', now + 1, now + 2)
+            b.expire_feed('david', 60)
+
+        self.assertEqual([int(i) for i in self.a.full_feed('david')],
+            [5, 4, 3])
+
+        with self.a.batch() as b:
+            b.expire_feed_at('david', int(time.time()) - 1)
+
+        self.assertEqual(self.a.total_items('david'), 0)
+
+    def unfollow_test(self):
+        'should purge archived items of the followee on unfollow'
+        graph = FollowGraph(self.a, backfill_size=0)
+        self.add_items_to_feed('tom', 5)
+        graph.follow('david', 'tom')
+        self.a.aggregate_item('david', 10, timestamp_utcnow() + 100)
+        self.a.demote('tom')
+        self.a.demote('david')
+
+        graph.unfollow('david', 'tom')
+        self.assertEqual([int(i) for i in self.a.full_feed('david', True)],
+            [10])
+
+    def update_archived_item_test(self):
+        'should move an archived item back to the hot tier when re-added'
+        self.add_items_to_feed('david', 5)
+        self.a.demote('david')
+        self.a.update_item('david', 1, timestamp_utcnow() + 100)
+
+        self.assertEqual([int(i) for i in self.a.full_feed('david')],
+            [1, 5, 4, 3, 2])
+        self.assertEqual(self.a.total_items('david'), 5)
+
+    def demote_all_test(self):
+        'should demote every feed of the namespace'
+        self.add_items_to_feed('david', 5)
+        self.add_items_to_feed('tom', 4)
+
+        self.assertEqual(self.a.demote_all(), 3)
+        self.assertEqual(self.a.total_items('tom'), 4)
+
+    def hot_ttl_test(self):
+        'should demote items older than hot_ttl seconds'
+        self.a.hot_size = None
+        self.a.hot_ttl = 60
+        now = timestamp_utcnow()
+        self.a.update_item('david', 1, now - 120)
+        self.a.update_item('david', 2, now)
+
+        self.assertEqual(self.a.demote('david'), 1)
+        self.assertEqual([int(i) for i in self.a.feed('david', 1)], [2, 1])
+
+    def demoter_test(self):
+        'should demote feeds from a background thread'
+        self.add_items_to_feed('david', 5)
+        demoter = Demoter(self.a, interval=0.01)
+        demoter.start()
+        deadline = time.time() + 5
+
+        while self.a.redis.zcard(self.a.feed_key('david')) > 3 and \
+                time.time() < deadline:
+            time.sleep(0.01)
+
+        demoter.stop()
+        self.assertEqual(self.a.redis.zcard(self.a.feed_key('david')), 3)
+        self.assertEqual(self.a.total_items('david'), 5)
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+from tests.helper import BaseTest, timestamp_utcnow
+
+from activity_feed import ActivityFeed
+from activity_feed.batch import Future
+
+class CountingClient(object):
+    '''Client wrapper counting executed pipelines and recording whether
+    they are transactions.'''
+
+    def __init__(self, client):
+        self.client = client
+        self.executed = 0
+        self.transactions = []
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def pipeline(self, transaction=True):
+        self.transactions.append(transaction)
+        pipe = self.client.pipeline(transaction=transaction)
+        execute = pipe.execute
+
+        def counted():
+            self.executed += 1
+            return execute()
+
+        pipe.execute = counted
+        return pipe
+
+class BatchTest(BaseTest):
+    def ints(self, future):
+        return [int(v) for v in future.result()]
+
+    def reads_and_writes_test(self):
+        'should resolve reads queued in a batch in call order'
+        self.add_items_to_feed('david', 5)
+        now = timestamp_utcnow()
+
+        with self.a.batch() as b:
+            before = b.feed('david', 1, page_size=2)
+            b.update_item('david', 10, now + 100, aggregate=True)
+            after = b.feed('david', 1, page_size=2)
+            aggregate = b.full_feed('david', True)
+            total = b.total_items('david')
+            pages = b.total_pages('david', page_size=2)
+            exists = b.check_item('david', 10)
+            missing = b.check_item('david', 11)
+            between = b.feed_between_timestamps('david', now + 100, now + 100)
+            count = b.count_between('david', now, now + 100)
+
+            self.assertFalse(before.done())
+            self.assertEqual(len(b), 10)
+
+        self.assertEqual(self.ints(before), [5, 4])
+        self.assertEqual(self.ints(after), [10, 5])
+        self.assertEqual(self.ints(aggregate), [10])
+        self.assertEqual(total.result(), 6)
+        self.assertEqual(pages.result(), 3)
+        self.assertEqual(exists.result(), True)
+        self.assertEqual(missing.result(), False)
+        self.assertEqual(self.ints(between), [10])
+        self.assertEqual(count.result(), 6)
+
+    def single_round_trip_test(self):
+        'should send the calls of a batch in one pipeline'
+        client = CountingClient(self.a.redis)
+        a = ActivityFeed(connection=client)
+
+        with a.batch() as b:
+            for i in range(10):
+                b.update_item('david', i, timestamp_utcnow())
+
+            b.feed('david', 1)
+            b.total_items('david')
+
+        self.assertEqual(client.executed, 1)
+
+    def cluster_test(self):
+        'should not send cluster batches in MULTI'
+        client = CountingClient(self.a.redis)
+        a = ActivityFeed(connection=client, cluster=True)
+
+        with a.batch() as b:
+            b.update_item('david', 1, timestamp_utcnow())
+            b.update_item('tom', 1, timestamp_utcnow())
+
+        self.assertEqual(client.transactions, [False])
+        self.assertEqual(a.total_items('tom'), 1)
+
+    def remove_and_expire_test(self):
+        'should queue removals, trims and expiry'
+        self.add_items_to_feed('david', 5)
+        self.add_items_to_feed('tom', 2)
+
+        b = self.a.batch()
+        b.remove_item('david', [1, 2])
+        b.trim_feed('david', 0, 0)
+        b.expire_feed('david', 100)
+        b.remove_feeds('tom')
+        results = b.execute()
+
+        self.assertEqual(results, [None, None, None, None])
+        self.assertEqual([int(v) for v in self.a.full_feed('david')],
+            [5, 4, 3])
+        self.assertTrue(0 < self.a.redis.ttl(self.a.feed_key('david')) <= 100)
+        self.assertEqual(self.a.total_items('tom'), 0)
+        self.assertEqual(len(b), 0)
+
+    def discard_on_error_test(self):
+        'should discard queued calls when the block raises'
+        def run():
+            with self.a.batch() as b:
+                b.update_item('david', 1, timestamp_utcnow())
+                raise KeyError('boom')
+
+        self.assertRaises(KeyError, run)
+        self.assertEqual(self.a.total_items('david'), 0)
+
+    def between_limit_test(self):
+        'should page timestamp ranges on the server'
+        self.add_items_to_feed('david', 5)
+        now = timestamp_utcnow()
+
+        with self.a.batch() as b:
+            page = b.feed_between_timestamps('david', now - 100, now + 100,
+                limit=2, offset=1)
+            rest = b.feed_between_timestamps('david', now - 100, now + 100,
+                offset=3)
+
+        self.assertEqual(self.ints(page), [4, 3])
+        self.assertEqual(self.ints(rest), [2, 1])
+
+    def pending_future_test(self):
+        'should refuse to return the result of a pending future'
+        future = Future()
+        self.assertFalse(future.done())
+        self.assertRaises(RuntimeError, future.result)
+
+    def cache_invalidation_test(self):
+        'should invalidate cached pages on writes in a batch'
+        self.a.cache_size = 10
+        self.a.versioned = True
+        self.add_items_to_feed('david', 2)
+        self.assertEqual([int(v) for v in self.a.feed('david', 1)], [2, 1])
+
+        with self.a.batch() as b:
+            b.remove_item('david', 2)
+
+        self.assertEqual([int(v) for v in self.a.feed('david', 1)], [1])
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import unittest
+
+from tests.helper import BaseTest, timestamp_utcnow
+
+from activity_feed import ActivityFeed, ItemLoader
+from activity_feed.cache import LRUCache
+
+class LRUCacheTest(unittest.TestCase):
+    def test_eviction(self):
+        'should evict the least recently used entry'
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(len(cache), 2)
+
+    def test_ttl(self):
+        'should expire entries after their ttl'
+        now = [100]
+        cache = LRUCache(2, ttl=10, timer=lambda: now[0])
+        cache.set('a', 1)
+        now[0] += 9
+        self.assertEqual(cache.get('a'), 1)
+        now[0] += 1
+        self.assertEqual(cache.get('a', 'missing'), 'missing')
+        self.assertEqual(len(cache), 0)
+
+class FeedCacheTest(BaseTest):
+    def setUp(self):
+        super(FeedCacheTest, self).setUp()
+        self.loaded = []
+
+        def items_loader(ids):
+            self.loaded.append(len(ids))
+            return [int(v) for v in ids]
+
+        self.a = ActivityFeed(connection=self.a.redis,
+            items_loader=items_loader, cache_size=10)
+
+    def feed_cache_test(self):
+        'should serve repeated reads of a page from the cache'
+        self.add_items_to_feed('david', 5)
+
+        self.assertEqual(self.a.feed('david', 1), [5, 4, 3, 2, 1])
+        self.a.redis.zrem(self.a.feed_key('david'), 5)
+        self.assertEqual(self.a.feed('david', 1), [5, 4, 3, 2, 1])
+        self.assertEqual(self.loaded, [5])
+
+        self.assertEqual(self.a.feed('david', 1, page_size=2), [4, 3])
+
+    def feed_cache_invalidation_test(self):
+        'should invalidate cached pages on every write to the feed'
+        self.add_items_to_feed('david', 5, True)
+        self.a.feed('david', 1, True)
+
+        self.a.aggregate_item('david', 6, timestamp_utcnow() + 60)
+        self.assertEqual(self.a.feed('david', 1, True), [6, 5, 4, 3, 2, 1])
+
+        self.a.remove_item('david', 6)
+        self.assertEqual(self.a.feed('david', 1, True), [5, 4, 3, 2, 1])
+
+        self.a.trim_feed_to_size('david', 3, True)
+        self.assertEqual(self.a.feed('david', 1, True), [5, 4, 3])
+
+        self.a.remove_feeds('david')
+        self.assertEqual(self.a.feed('david', 1, True), [])
+
+    def feed_cache_other_writer_test(self):
+        'should invalidate cached pages on writes from other versioned clients'
+        writer = ActivityFeed(connection=self.a.redis,
+            versioned=True)
+        self.add_items_to_feed('david', 2)
+
+        self.assertEqual(self.a.feed('david', 1), [2, 1])
+        writer.update_item('david', 3, timestamp_utcnow() + 60)
+        self.assertEqual(self.a.feed('david', 1), [3, 2, 1])
+
+    def feed_cache_expire_test(self):
+        'should invalidate cached pages when the feed is expired'
+        self.add_items_to_feed('david', 3)
+        self.assertEqual(self.a.feed('david', 1), [3, 2, 1])
+
+        self.a.expire_feed('david', 60)
+        self.a.redis.zrem(self.a.feed_key('david'), 3)
+        self.assertEqual(self.a.feed('david', 1), [2, 1])
+        self.assertEqual(self.a.redis.ttl(
+            self.a._version_key(self.a.feed_key('david'))) > 0, True)
+
+        self.a.expire_feed_at('david', timestamp_utcnow() + 60)
+        self.a.redis.delete(self.a.feed_key('david'),
+            self.a._version_key(self.a.feed_key('david')))
+        self.assertEqual(self.a.feed('david', 1), [])
+
+    def feed_cache_batch_expire_test(self):
+        'should invalidate cached pages when a batch expires the feed'
+        self.add_items_to_feed('david', 3)
+        self.assertEqual(self.a.feed('david', 1), [3, 2, 1])
+
+        with self.a.batch() as b:
+            b.expire_feed('david', 60)
+
+        version_key = self.a._version_key(self.a.feed_key('david'))
+        self.assertTrue(0 < self.a.redis.ttl(version_key) <= 60)
+        self.a.redis.zrem(self.a.feed_key('david'), 3)
+        self.assertEqual(self.a.feed('david', 1), [2, 1])
+
+        with self.a.batch() as b:
+            b.expire_feed_at('david', timestamp_utcnow() + 30)
+
+        self.assertTrue(0 < self.a.redis.ttl(version_key) <= 30)
+
+    def feed_cache_scope_test(self):
+        'should only defer loading of cached pages inside an item loader scope'
+        calls = []
+
+        def batch_loader(ids):
+            calls.append(sorted(int(v) for v in ids))
+            return [int(v) for v in ids]
+
+        loader = ItemLoader(batch_loader)
+        self.a = ActivityFeed(connection=self.a.redis,
+            items_loader=loader, cache_size=10)
+        self.add_items_to_feed('david', 2)
+        self.add_items_to_feed('luke', 3)
+        self.a.feed('david', 1)
+        del calls[:]
+
+        with loader.scope():
+            david = self.a.feed('david', 1)
+            luke = self.a.feed('luke', 1)
+            self.assertEqual(calls, [])
+
+            self.assertEqual(list(david), [2, 1])
+            self.assertEqual(list(luke), [3, 2, 1])
+            self.assertEqual(calls, [[1, 2, 3]])
+
+        self.assertEqual(self.a.feed('luke', 1), [3, 2, 1])
+        self.assertEqual(self.a.feed('luke', 1), [3, 2, 1])
+        self.assertEqual(calls, [[1, 2, 3], [1, 2, 3]])
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import unittest
+
+from tests.helper import BaseTest, timestamp_utcnow
+
+from activity_feed.codec import Codec, CompactCodec
+
+class CompactCodecTest(unittest.TestCase):
+    def member_test(self):
+        'should pack integer item IDs into fixed width binary'
+        codec = CompactCodec(4)
+        self.assertEqual(codec.encode_member(258), b'\x00\x00\x01\x02')
+        self.assertEqual(codec.decode_member(b'\x00\x00\x01\x02'), 258)
+        self.assertEqual(len(CompactCodec().encode_member('7')), 8)
+        self.assertEqual(CompactCodec(None).encode_member('7'), '7')
+
+    def score_test(self):
+        'should combine timestamps with a sequence number'
+        codec = CompactCodec(sequence_bits=4)
+        scores = [codec.encode_score(100) for _ in range(3)]
+
+        self.assertEqual(scores, [1600, 1601, 1602])
+        self.assertEqual(codec.score_range(100, 101), (1600, 1631))
+        self.assertEqual(Codec().score_range(100, 101), (100, 101))
+
+    def invalid_arguments_test(self):
+        'should reject unsupported widths and sequence sizes'
+        self.assertRaises(ValueError, CompactCodec, 3)
+        self.assertRaises(ValueError, CompactCodec, 8, 22)
+
+class CodecFeedTest(BaseTest):
+    def setUp(self):
+        super(CodecFeedTest, self).setUp()
+        self.a.codec = CompactCodec(8, 20)
+
+    def feed_test(self):
+        'should decode items read from the feed'
+        now = timestamp_utcnow()
+
+        for i in (3, 1, 2):
+            self.a.update_item('david', i, now, True)
+
+        self.assertEqual(self.a.feed('david', 1), [2, 1, 3])
+        self.assertEqual(self.a.feed('david', 1, True), [2, 1, 3])
+        self.assertEqual(self.a.full_feed('david'), [2, 1, 3])
+        self.assertEqual(list(self.a.iter_feed('david', batch_size=2)), [2, 1, 3])
+        self.assertEqual(self.a.feeds_for(['david'], 1), {'david': [2, 1, 3]})
+        self.assertEqual(self.a.check_item('david', 3), True)
+        self.assertEqual(self.a.check_item('david', 4), False)
+
+    def between_test(self):
+        'should translate timestamps into score ranges'
+        now = timestamp_utcnow()
+
+        for i in range(1, 6):
+            self.a.update_item('david', i, now + i)
+            self.a.update_item('david', i + 10, now + i)
+
+        self.assertEqual(self.a.between('david', now + 2, now + 3),
+            [13, 3, 12, 2])
+        self.assertEqual(list(self.a.iter_between('david', now + 2, now + 3,
+            batch_size=3)), [13, 3, 12, 2])
+        self.assertEqual(self.a.count_between('david', now + 2, now + 3), 4)
+
+        self.a.trim_feed('david', now + 1, now + 4)
+        self.assertEqual(self.a.feed('david', 1), [15, 5])
+
+    def remove_item_test(self):
+        'should remove encoded items'
+        now = timestamp_utcnow()
+        self.a.fanout_item(['david', 'luke'], 1, now)
+        self.a.aggregate_item('david', 2, now)
+
+        self.a.remove_item(['david', 'luke'], [1, 2])
+        self.assertEqual(self.a.feed('david', 1, True), [])
+        self.assertEqual(self.a.feed('luke', 1, True), [])
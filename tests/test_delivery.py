@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+from tests.helper import BaseTest, timestamp_utcnow
+
+from activity_feed.delivery import HybridDelivery
+
+FOLLOWERS = {
+    'star': ['david', 'tom', 'anna', 'kate'],
+    'tom': ['david'],
+    'anna': ['david', 'kate'],
+}
+
+def followers(user_id):
+    return FOLLOWERS.get(user_id, [])
+
+def followees(user_id):
+    return [uid for uid, f in sorted(FOLLOWERS.items()) if user_id in f]
+
+def follower_count(user_id):
+    return len(FOLLOWERS.get(user_id, ()))
+
+class HybridDeliveryTest(BaseTest):
+    def setUp(self):
+        super(HybridDeliveryTest, self).setUp()
+        self.a.delivery = HybridDelivery(2, followers, followees,
+            follower_count)
+        self.now = timestamp_utcnow()
+
+    def ints(self, items):
+        return [int(v) for v in items]
+
+    def policy_test(self):
+        'should pull the items of accounts above the threshold'
+        policy = self.a.delivery
+        self.assertTrue(policy.is_pushed('tom'))
+        self.assertTrue(policy.is_pushed('anna'))
+        self.assertFalse(policy.is_pushed('star'))
+        self.assertEqual(policy.pulled_sources('david'), ['star'])
+        self.assertEqual(policy.pulled_sources('star'), [])
+
+        counted = HybridDelivery(2, followers, followees,
+            follower_count=lambda uid: 100)
+        self.assertFalse(counted.is_pushed('tom'))
+
+    def publish_test(self):
+        'should push to followers below the threshold only'
+        self.assertEqual(len(self.a.publish('tom', 1, self.now + 1)), 1)
+        self.assertEqual(self.a.publish('star', 2, self.now + 2), [])
+
+        key = self.a.feed_key('david', True)
+        self.assertEqual(self.ints(self.a.redis.zrevrange(key, 0, -1)), [1])
+        self.assertEqual(self.ints(self.a.feed('star', 1, aggregate=False)),
+            [2])
+        self.assertEqual(self.ints(self.a.feed('star', 1, aggregate=True)),
+            [2])
+
+    def merged_read_test(self):
+        'should merge pulled items into the aggregate feed on read'
+        self.a.publish('tom', 1, self.now + 1)
+        self.a.publish('star', 2, self.now + 2)
+        self.a.publish('anna', 3, self.now + 3)
+        self.a.publish('star', 4, self.now + 4)
+
+        self.assertEqual(self.ints(self.a.feed('david', 1, aggregate=True)),
+            [4, 3, 2, 1])
+        self.assertEqual(self.ints(self.a.feed('david', 2, aggregate=True,
+            page_size=3)), [1])
+        self.assertEqual(self.a.total_items('david', aggregate=True), 4)
+        self.assertEqual(self.a.total_pages('david', aggregate=True,
+            page_size=3), 2)
+        self.assertEqual(self.ints(self.a.feed('kate', 1, aggregate=True)),
+            [4, 3, 2])
+        self.assertEqual(self.ints(self.a.feed('david', 1, aggregate=False)),
+            [])
+
+    def multi_user_read_test(self):
+        'should merge pulled items into feeds_for and reject them in batches'
+        self.a.publish('star', 1, self.now + 1)
+        self.a.publish('tom', 2, self.now + 2)
+        pages = self.a.feeds_for(['david', 'star', 'tom'], 1, aggregate=True)
+
+        self.assertEqual(self.ints(pages['david']), [2, 1])
+        self.assertEqual(self.ints(pages['star']), [1])
+        self.assertEqual(self.ints(pages['tom']), [2, 1])
+
+        b = self.a.batch()
+        self.assertRaises(RuntimeError, b.feed, 'david', 1, True)
+        self.assertRaises(RuntimeError, b.total_items, 'david', True)
+        self.assertRaises(RuntimeError, b.total_pages, 'david', True)
+        self.assertEqual(b.total_items('star', True).done(), False)
+        self.assertEqual(b.execute(), [1])
+
+    def duplicate_items_test(self):
+        'should keep one entry for items both pushed and pulled'
+        self.a.aggregate_item('david', 2, self.now + 2)
+        self.a.update_item('star', 2, self.now + 2)
+
+        self.assertEqual(self.ints(self.a.feed('david', 1, aggregate=True)),
+            [2])
+
+    def duplicate_count_test(self):
+        'should count items both pushed and pulled once'
+        self.a.aggregate_item('david', 1, self.now + 1)
+        self.a.update_item('star', 1, self.now + 1)
+        self.a.update_item('star', 2, self.now + 2)
+
+        self.assertEqual(self.ints(self.a.feed('david', 1, aggregate=True)),
+            [2, 1])
+        self.assertEqual(self.a.total_items('david', aggregate=True), 2)
+        self.assertEqual(self.a.total_pages('david', aggregate=True,
+            page_size=1), 2)
+        self.assertEqual(self.a.redis.exists(
+            self.a.feed_key('david', True) + ':count'), 0)
+
+    def publish_requires_policy_test(self):
+        'should require a delivery policy to publish'
+        self.a.delivery = None
+        self.assertRaises(RuntimeError, self.a.publish, 'tom', 1, self.now)
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+from tests.helper import BaseTest, timestamp_utcnow
+
+from activity_feed.fanout import FanOut
+
+class FanOutTest(BaseTest):
+    def fanout_item_test(self):
+        'should aggregate an item into every feed in bounded chunks'
+        users = ('user_%d' % i for i in range(10))
+        stats = self.a.fanout_item(users, 1, timestamp_utcnow(), chunk_size=3)
+
+        self.assertEqual([s.index for s in stats], [0, 1, 2, 3])
+        self.assertEqual([s.size for s in stats], [3, 3, 3, 1])
+
+        for i in range(10):
+            self.assertEqual(self.a.check_item('user_%d' % i, 1, True), True)
+            self.assertEqual(self.a.redis.exists(self.a.feed_key('user_%d' % i)), False)
+
+    def fanout_item_concurrent_test(self):
+        'should aggregate an item with several chunks in flight'
+        users = ('user_%d' % i for i in range(100))
+        stats = self.a.fanout_item(users, 1, timestamp_utcnow(), chunk_size=7,
+            max_in_flight=4)
+
+        self.assertEqual([s.index for s in stats], list(range(15)))
+        self.assertEqual(sum(s.size for s in stats), 100)
+
+        for i in range(100):
+            self.assertEqual(self.a.check_item('user_%d' % i, 1, True), True)
+
+    def aggregate_item_iterable_test(self):
+        'should fan out through the chunked engine for an iterable of users'
+        self.a.fanout_chunk_size = 2
+        stats = self.a.aggregate_item(['luke', 'jonathan', 'david'], 1,
+            timestamp_utcnow())
+
+        self.assertEqual([s.size for s in stats], [2, 1])
+        self.assertEqual(self.a.check_item('david', 1, True), True)
+
+    def fanout_concurrent_error_test(self):
+        'should re-raise errors raised while executing a chunk'
+        def command(pipe, uid):
+            raise RuntimeError(uid)
+
+        fanout = FanOut(self.a.redis, chunk_size=2, max_in_flight=2)
+        self.assertRaises(RuntimeError, fanout.execute, range(10), command)
+
+    def fanout_invalid_arguments_test(self):
+        'should reject non-positive chunk sizes'
+        self.assertRaises(ValueError, FanOut, self.a.redis, 0)
+        self.assertRaises(ValueError, FanOut, self.a.redis, 10, 0)
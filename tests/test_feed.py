@@ -3,8 +3,9 @@ from __future__ import absolute_import
 
 import datetime
 from leaderboard.leaderboard import Leaderboard
-from tests.helper import BaseTest, timestamp
+from tests.helper import BaseTest, timestamp, timestamp_utcnow
 
+from activity_feed import ItemLoader
 from activity_feed.utils import datetime_to_timestamp
 
 class FeedTest(BaseTest):
@@ -29,6 +30,110 @@ class FeedTest(BaseTest):
         self.assertEqual(int(feed[0]), 5)
         self.assertEqual(int(feed[4]), 1)
 
+    def feeds_for_test(self):
+        'should return a page of the activity feed for many users at once'
+        self.add_items_to_feed('david', 5)
+        self.add_items_to_feed('luke', 2)
+
+        feeds = self.a.feeds_for(['david', 'luke', 'jonathan'], 1, page_size=3)
+        self.assertEqual([int(v) for v in feeds['david']], [5, 4, 3])
+        self.assertEqual([int(v) for v in feeds['luke']], [2, 1])
+        self.assertEqual(feeds['jonathan'], [])
+
+        feeds = self.a.feeds_for(['david', 'luke'], 2, page_size=3)
+        self.assertEqual([int(v) for v in feeds['david']], [2, 1])
+        self.assertEqual(feeds['luke'], [])
+
+    def feeds_for_items_loader_test(self):
+        'should load the items of every feed with a single batch'
+        calls = []
+
+        def batch_loader(ids):
+            calls.append(ids)
+            return ['item-%d' % int(v) for v in ids]
+
+        self.a.items_loader = ItemLoader(batch_loader)
+        self.add_items_to_feed('david', 3, True)
+        self.add_items_to_feed('luke', 2, True)
+
+        feeds = self.a.feeds_for(('david', 'luke'), 1, True)
+        self.assertEqual(feeds['david'], ['item-3', 'item-2', 'item-1'])
+        self.assertEqual(feeds['luke'], ['item-2', 'item-1'])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(int(v) for v in calls[0]), [1, 2, 3])
+
+    def feeds_for_plain_loader_test(self):
+        'should call a plain items loader once with de-duplicated IDs'
+        calls = []
+
+        def items_loader(ids):
+            calls.append(sorted(int(v) for v in ids))
+            return ['item-%d' % int(v) for v in ids]
+
+        self.a.items_loader = items_loader
+        self.add_items_to_feed('david', 3, True)
+        self.add_items_to_feed('luke', 2, True)
+
+        feeds = self.a.feeds_for(('david', 'luke'), 1, True)
+        self.assertEqual(feeds['david'], ['item-3', 'item-2', 'item-1'])
+        self.assertEqual(feeds['luke'], ['item-2', 'item-1'])
+        self.assertEqual(calls, [[1, 2, 3]])
+
+    def feeds_for_filtering_loader_test(self):
+        'should keep the pages of loaders that drop items apart'
+        calls = []
+
+        def items_loader(ids):
+            calls.append(len(ids))
+            return ['item-%d' % int(v) for v in ids if int(v) != 2]
+
+        self.a.items_loader = items_loader
+        self.add_items_to_feed('david', 3, True)
+        self.add_items_to_feed('luke', 2, True)
+
+        feeds = self.a.feeds_for(('david', 'luke'), 1, True)
+        self.assertEqual(feeds['david'], ['item-3', 'item-1'])
+        self.assertEqual(feeds['luke'], ['item-1'])
+        self.assertEqual(calls, [3, 3, 2])
+
+    def feed_after_test(self):
+        'should page through an activity feed with a cursor'
+        self.add_items_to_feed('david', 7)
+
+        items, cursor = self.a.feed_after('david', limit=3)
+        self.assertEqual([int(v) for v in items], [7, 6, 5])
+
+        self.a.update_item('david', 8, timestamp_utcnow() + 60)
+
+        items, cursor = self.a.feed_after('david', cursor, limit=3)
+        self.assertEqual([int(v) for v in items], [4, 3, 2])
+
+        items, cursor = self.a.feed_after('david', cursor, limit=3)
+        self.assertEqual([int(v) for v in items], [1])
+        self.assertEqual(cursor, None)
+
+    def feed_after_equal_scores_test(self):
+        'should not skip or repeat items that share a timestamp'
+        now = timestamp_utcnow()
+
+        for i in range(10):
+            self.a.update_item('david', 'item-%d' % i, now)
+
+        seen = []
+        items, cursor = self.a.feed_after('david', limit=3)
+        seen.extend(items)
+
+        while cursor:
+            items, cursor = self.a.feed_after('david', cursor, limit=3)
+            seen.extend(items)
+
+        self.assertEqual(len(seen), 10)
+        self.assertEqual(seen, self.a.feed('david', 1))
+
+    def feed_after_invalid_cursor_test(self):
+        'should reject a malformed cursor'
+        self.assertRaises(ValueError, self.a.feed_after, 'david', 'not a cursor')
+
     def full_feed_test(self):
         'should return the full activity feed'
         self.add_items_to_feed('david', 30)
@@ -47,6 +152,23 @@ class FeedTest(BaseTest):
         self.assertEqual(int(feed[0]), 30)
         self.assertEqual(int(feed[29]), 1)
 
+    def iter_feed_test(self):
+        'should iterate over the full activity feed in batches'
+        calls = []
+
+        def items_loader(ids):
+            calls.append(len(ids))
+            return [int(v) for v in ids]
+
+        self.a.items_loader = items_loader
+        self.add_items_to_feed('david', 30, True)
+
+        items = self.a.iter_feed('david', True, batch_size=7)
+        self.assertEqual(calls, [])
+        self.assertEqual(list(items), list(range(30, 0, -1)))
+        self.assertEqual(calls, [7, 7, 7, 7, 2])
+        self.assertEqual(list(self.a.iter_feed('luke')), [])
+
     def feed_between_timestamps_test(self):
         '''Should return activity feed items between the starting and ending
         timestamps.'''
@@ -115,6 +237,45 @@ class FeedTest(BaseTest):
         self.assertEqual(int(feed[0]), 4)
         self.assertEqual(int(feed[1]), 3)
 
+    def feed_between_timestamps_limit_test(self):
+        'should return a bounded page of items between two timestamps'
+        for i in range(1, 11):
+            self.a.update_item('david', i, timestamp(2012, 6, 19, 4, i, 0))
+
+        from_t = timestamp(2012, 6, 19, 4, 2, 0)
+        to_t = timestamp(2012, 6, 19, 4, 9, 0)
+
+        feed = self.a.feed_between_timestamps('david', from_t, to_t, limit=3)
+        self.assertEqual([int(v) for v in feed], [9, 8, 7])
+
+        feed = self.a.between('david', from_t, to_t, limit=3, offset=3)
+        self.assertEqual([int(v) for v in feed], [6, 5, 4])
+
+        feed = self.a.between('david', from_t, to_t, offset=6)
+        self.assertEqual([int(v) for v in feed], [3, 2])
+
+    def iter_between_test(self):
+        'should iterate over every item between two timestamps in batches'
+        for i in range(1, 11):
+            self.a.update_item('david', i, timestamp(2012, 6, 19, 4, i // 2, 0))
+
+        from_t = timestamp(2012, 6, 19, 4, 1, 0)
+        to_t = timestamp(2012, 6, 19, 4, 4, 0)
+
+        items = list(self.a.iter_between('david', from_t, to_t, batch_size=3))
+        self.assertEqual(items, self.a.between('david', from_t, to_t))
+        self.assertEqual(sorted(int(v) for v in items), list(range(2, 10)))
+
+    def count_between_test(self):
+        'should count the items between two timestamps'
+        for i in range(1, 11):
+            self.a.update_item('david', i, timestamp(2012, 6, 19, 4, i, 0))
+
+        from_t = timestamp(2012, 6, 19, 4, 2, 0)
+        to_t = timestamp(2012, 6, 19, 4, 9, 0)
+        self.assertEqual(self.a.count_between('david', from_t, to_t), 8)
+        self.assertEqual(self.a.count_between('david', from_t, to_t, True), 0)
+
     def total_pages_in_feed_test(self):
         'should return the correct number of pages in the activity feed'
         self.add_items_to_feed('david', Leaderboard.DEFAULT_PAGE_SIZE + 1)
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+from tests.helper import BaseTest, Recording, timestamp_utcnow
+
+from activity_feed import ActivityFeed
+from activity_feed.delivery import HybridDelivery
+from activity_feed.graph import FollowGraph
+
+class FollowGraphTest(BaseTest):
+    def setUp(self):
+        super(FollowGraphTest, self).setUp()
+        self.graph = FollowGraph(self.a, backfill_size=3, scan_count=2)
+        self.now = timestamp_utcnow()
+
+    def ints(self, items):
+        return [int(v) for v in items]
+
+    def aggregate(self, user_id):
+        return self.ints(self.a.redis.zrevrange(self.a.feed_key(user_id, True),
+            0, -1))
+
+    def follow_test(self):
+        'should record both sides of a follow'
+        self.assertTrue(self.graph.follow('david', 'tom'))
+        self.assertFalse(self.graph.follow('david', 'tom'))
+        self.graph.follow('anna', 'tom')
+        self.graph.follow('david', 'anna')
+
+        self.assertTrue(self.graph.is_following('david', 'tom'))
+        self.assertFalse(self.graph.is_following('tom', 'david'))
+        self.assertEqual(sorted(self.graph.followers('tom')),
+            ['anna', 'david'])
+        self.assertEqual(sorted(self.graph.followees('david')),
+            ['anna', 'tom'])
+        self.assertEqual(self.graph.follower_count('tom'), 2)
+        self.assertEqual(self.graph.followee_count('david'), 2)
+        self.assertEqual(self.graph.followers_set_key('tom'),
+            'activity_feed:followers:tom')
+        self.assertEqual(self.graph.following_set_key('tom'),
+            'activity_feed:following:tom')
+
+    def backfill_test(self):
+        'should merge the newest items of the followee on follow'
+        for i in range(1, 6):
+            self.a.update_item('tom', i, self.now + i)
+
+        self.a.aggregate_item('david', 10, self.now + 10)
+        self.graph.follow('david', 'tom')
+        self.assertEqual(self.aggregate('david'), [10, 5, 4, 3])
+
+        self.graph.follow('anna', 'tom', backfill_size=0)
+        self.assertEqual(self.aggregate('anna'), [5, 4, 3, 2, 1])
+
+    def unfollow_test(self):
+        'should purge the items of the followee on unfollow'
+        self.a.fanout_chunk_size = 2
+
+        for i in range(1, 6):
+            self.a.update_item('tom', i, self.now + i)
+
+        self.a.aggregate_item('david', 10, self.now + 10)
+        self.graph.follow('david', 'tom', backfill_size=0)
+        self.assertEqual(self.aggregate('david'), [10, 5, 4, 3, 2, 1])
+
+        self.assertTrue(self.graph.unfollow('david', 'tom'))
+        self.assertFalse(self.graph.unfollow('david', 'tom'))
+        self.assertEqual(self.aggregate('david'), [10])
+        self.assertEqual(list(self.graph.followers('tom')), [])
+        self.assertEqual(self.graph.followee_count('david'), 0)
+
+    def delivery_test(self):
+        'should drive publish through the follow graph'
+        self.a.delivery = self.graph.delivery()
+        self.graph.follow('david', 'tom')
+        self.graph.follow('anna', 'tom')
+        self.a.publish('tom', 1, self.now + 1)
+
+        self.assertEqual(self.aggregate('david'), [1])
+        self.assertEqual(self.aggregate('anna'), [1])
+
+        hybrid = self.graph.delivery(threshold=1)
+        self.assertTrue(isinstance(hybrid, HybridDelivery))
+        self.assertFalse(hybrid.is_pushed('tom'))
+        self.assertEqual(hybrid.pulled_sources('david'), ['tom'])
+
+    def hybrid_read_test(self):
+        'should count the followers of every followee in one pipeline'
+        client = Recording(self.a.redis)
+        client.scard = None
+        a = ActivityFeed(connection=client)
+        graph = FollowGraph(a)
+        a.delivery = graph.delivery(threshold=1)
+
+        for i in range(20):
+            graph.follow('david', 'user_%d' % i)
+
+        graph.follow('anna', 'user_3')
+        a.update_item('user_3', 1, self.now + 1)
+        del client.transactions[:]
+
+        self.assertEqual(graph.follower_counts(['user_3', 'user_4', 'x']),
+            [2, 1, 0])
+        self.assertEqual(self.ints(a.feed('david', 1, True)), [1])
+        self.assertEqual(client.transactions, [False] * 3)
+
+    def dormant_follower_test(self):
+        'should not backfill users outside the active window'
+        self.a.delivery = self.graph.delivery()
+        self.a.active_window = 100
+        self.a.update_item('tom', 1, self.now + 1)
+        self.graph.follow('david', 'tom')
+        self.assertEqual(self.aggregate('david'), [])
+
+        self.assertEqual(self.ints(self.a.feed('david', 1, aggregate=True)),
+            [1])
+        self.a.update_item('anna', 2, self.now + 2)
+        self.graph.follow('david', 'anna')
+        self.assertEqual(self.aggregate('david'), [2, 1])
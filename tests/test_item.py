@@ -113,3 +113,42 @@ class ItemTest(BaseTest):
         self.assertEqual(self.a.check_item('david', 1, True), False)
         self.a.add_item('david', 1, timestamp_utcnow())
         self.assertEqual(self.a.check_item('david', 1, True), True)
+
+    def update_item_max_size_test(self):
+        'should keep a capped activity feed bounded on every write'
+        self.a.max_size = 3
+        self.add_items_to_feed('david', 5, True)
+
+        self.assertEqual(self.a.redis.zcard(self.a.feed_key('david')), 3)
+        self.assertEqual(self.a.redis.zcard(self.a.feed_key('david', True)), 3)
+        self.assertEqual([int(v) for v in self.a.feed('david', 1)], [5, 4, 3])
+        self.assertEqual([int(v) for v in self.a.feed('david', 1, True)], [5, 4, 3])
+
+    def aggregate_item_max_size_test(self):
+        'should keep capped aggregate feeds bounded when fanning out'
+        self.a.max_size = 2
+        now = timestamp_utcnow()
+
+        for i in range(1, 5):
+            self.a.aggregate_item('david', i, now + i)
+            self.a.aggregate_item(('luke', 'jonathan'), i, now + i)
+
+        for user_id in ('david', 'luke', 'jonathan'):
+            self.assertEqual([int(v) for v in self.a.feed(user_id, 1, True)], [4, 3])
+
+    def remove_item_many_users_test(self):
+        'should remove many items from the feeds of many users'
+        for user_id in ('david', 'luke', 'jonathan'):
+            self.add_items_to_feed(user_id, 5, True)
+
+        self.a.remove_item(['david', 'luke'], (1, 2, 3), chunk_size=2)
+
+        for user_id in ('david', 'luke'):
+            self.assertEqual([int(v) for v in self.a.feed(user_id, 1)], [5, 4])
+            self.assertEqual([int(v) for v in self.a.feed(user_id, 1, True)], [5, 4])
+
+        self.assertEqual(self.a.total_items('jonathan'), 5)
+        self.assertEqual(self.a.total_items('jonathan', True), 5)
+
+        self.a.remove_item('david', [])
+        self.assertEqual(self.a.total_items('david'), 2)
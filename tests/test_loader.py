@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import threading
+
+from tests.helper import BaseTest
+
+from activity_feed import ActivityFeed, ItemLoader
+
+class ItemLoaderTest(BaseTest):
+    def setUp(self):
+        super(ItemLoaderTest, self).setUp()
+        self.calls = []
+
+    def batch_loader(self, ids):
+        self.calls.append(sorted(int(v) for v in ids))
+        return ['item-%d' % int(v) for v in ids]
+
+    def load_many_test(self):
+        'should de-duplicate IDs and load them in a single batch'
+        loader = ItemLoader(self.batch_loader)
+
+        self.assertEqual(loader([1, 2, 1]), ['item-1', 'item-2', 'item-1'])
+        self.assertEqual(self.calls, [[1, 2]])
+
+    def shared_cache_test(self):
+        'should only load IDs missing from the shared cache'
+        loader = ItemLoader(self.batch_loader, cache_size=10)
+
+        loader([1, 2])
+        loader([2, 3])
+        self.assertEqual(self.calls, [[1, 2], [3]])
+
+    def dict_and_missing_items_test(self):
+        'should accept dict results and return None for missing items'
+        loader = ItemLoader(lambda ids: {1: 'one'}, cache_size=10)
+
+        self.assertEqual(loader([1, 2]), ['one', None])
+        self.assertEqual(len(loader.cache), 1)
+
+    def item_loader_thread_pool_test(self):
+        'should run the per item fallback in a thread pool'
+        threads = set()
+
+        def item_loader(v):
+            threads.add(threading.current_thread().name)
+            return v * 2
+
+        loader = ItemLoader(item_loader=item_loader, max_workers=2)
+
+        try:
+            self.assertEqual(loader(range(10)), [v * 2 for v in range(10)])
+            self.assertEqual(threading.current_thread().name in threads, False)
+        finally:
+            loader.close()
+
+    def scope_test(self):
+        'should load the IDs of every feed read in a scope in one batch'
+        loader = ItemLoader(self.batch_loader)
+        a = ActivityFeed(connection=self.a.redis,
+            items_loader=loader)
+        self.a = a
+        self.add_items_to_feed('david', 3)
+        self.add_items_to_feed('luke', 4)
+
+        with loader.scope():
+            david = a.feed('david', 1)
+            luke = a.feed('luke', 1)
+            self.assertEqual(self.calls, [])
+            self.assertEqual(len(luke), 4)
+
+            self.assertEqual(david, ['item-3', 'item-2', 'item-1'])
+            self.assertEqual(list(luke), ['item-4', 'item-3', 'item-2', 'item-1'])
+            self.assertEqual(self.calls, [[1, 2, 3, 4]])
+
+            self.assertEqual(a.feed('david', 1)[0], 'item-3')
+            self.assertEqual(len(self.calls), 1)
+
+        self.assertEqual(a.feed('david', 1), ['item-3', 'item-2', 'item-1'])
+        self.assertEqual(len(self.calls), 2)
+
+    def requires_a_loader_test(self):
+        'should require a batch or item loader'
+        self.assertRaises(ValueError, ItemLoader)
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import unittest
+
+from redis.exceptions import ResponseError
+
+from activity_feed import ActivityFeed
+from activity_feed.backends.memory import MemoryBackend
+
+class MemoryBackendTest(unittest.TestCase):
+    def backend(self, timer):
+        return MemoryBackend(timer=timer)
+
+    def setUp(self):
+        self.now = [1000.0]
+        self.b = self.backend(lambda: self.now[0])
+
+        for i, member in enumerate(['a', 'b', 'c', 'd', 'e']):
+            self.b.zadd('feed', {member: i // 2})
+
+    def range_test(self):
+        'should order by score, then by member'
+        self.assertEqual(self.b.zrange('feed', 0, -1),
+            [b'a', b'b', b'c', b'd', b'e'])
+        self.assertEqual(self.b.zrevrange('feed', 0, 1), [b'e', b'd'])
+        self.assertEqual(self.b.zrevrange('feed', -2, -1), [b'b', b'a'])
+        self.assertEqual(self.b.zrevrange('feed', 5, 10), [])
+        self.assertEqual(self.b.zrevrange('feed', 0, 0, withscores=True),
+            [(b'e', 2.0)])
+
+    def range_by_score_test(self):
+        'should support inclusive and exclusive bounds, offset and count'
+        self.assertEqual(self.b.zrevrangebyscore('feed', 1, 0),
+            [b'd', b'c', b'b', b'a'])
+        self.assertEqual(self.b.zrevrangebyscore('feed', '(1', '-inf'),
+            [b'b', b'a'])
+        self.assertEqual(self.b.zrevrangebyscore('feed', '+inf', '(0',
+            start=1, num=2), [b'd', b'c'])
+        self.assertEqual(self.b.zrangebyscore('feed', 1, 2, start=1, num=-1),
+            [b'd', b'e'])
+        self.assertEqual(self.b.zcount('feed', 1, '+inf'), 3)
+
+    def update_and_remove_test(self):
+        'should move updated members and delete empty sets'
+        self.assertEqual(self.b.zadd('feed', {'a': 10}), 0)
+        self.assertEqual(self.b.zrevrange('feed', 0, 0), [b'a'])
+        self.assertEqual(self.b.zscore('feed', 'a'), 10.0)
+        self.assertEqual(self.b.zrem('feed', 'a', 'b', 'x'), 2)
+        self.assertEqual(self.b.zremrangebyrank('feed', 0, -2), 2)
+        self.assertEqual(self.b.zremrangebyscore('feed', 0, 2), 1)
+        self.assertEqual(self.b.exists('feed'), 0)
+
+    def strings_test(self):
+        'should count with INCR and refuse commands on the wrong type'
+        self.assertEqual(self.b.incr('version'), 1)
+        self.assertEqual(self.b.incr('version'), 2)
+        self.assertEqual(self.b.get('version'), b'2')
+        self.assertRaises(ResponseError, self.b.get, 'feed')
+        self.assertRaises(ResponseError, self.b.zcard, 'version')
+
+    def sets_test(self):
+        'should add, remove and scan set members'
+        self.assertEqual(self.b.sadd('followers', 'a', 'b', 'c'), 3)
+        self.assertEqual(self.b.sadd('followers', 'a', 'd'), 1)
+        self.assertEqual(self.b.srem('followers', 'a', 'x'), 1)
+        self.assertEqual(self.b.scard('followers'), 3)
+        self.assertTrue(self.b.sismember('followers', 'b'))
+        self.assertFalse(self.b.sismember('followers', 'a'))
+        self.assertEqual(self.b.smembers('followers'), set([b'b', b'c', b'd']))
+        cursor, page = self.b.sscan('followers', 0, count=2)
+        self.assertEqual(page, [b'b', b'c'])
+        self.assertEqual(self.b.sscan('followers', cursor, count=2),
+            (0, [b'd']))
+        self.assertEqual(sorted(self.b.sscan_iter('followers', count=2)),
+            [b'b', b'c', b'd'])
+        self.assertEqual(self.b.type('followers'), b'set')
+        self.assertEqual(self.b.srem('followers', 'b', 'c', 'd'), 3)
+        self.assertEqual(self.b.exists('followers'), 0)
+
+    def sscan_removal_test(self):
+        'should not skip members when scanned members are removed'
+        self.b.sadd('followers', *range(10))
+        seen = []
+
+        for member in self.b.sscan_iter('followers', count=3):
+            seen.append(member)
+            self.b.srem('followers', member)
+
+        self.assertEqual(len(seen), 10)
+        self.assertEqual(self.b.scard('followers'), 0)
+
+    def expire_test(self):
+        'should expire keys lazily'
+        self.assertEqual(self.b.ttl('feed'), -1)
+        self.b.expire('feed', 10)
+        self.assertEqual(self.b.ttl('feed'), 10)
+        self.now[0] += 10
+        self.assertEqual(self.b.zcard('feed'), 0)
+        self.assertEqual(self.b.ttl('feed'), -2)
+        self.assertEqual(self.b.keys('*'), [])
+
+    def pipeline_test(self):
+        'should queue commands and return their results on execute'
+        pipe = self.b.pipeline()
+        pipe.zadd('other', {'x': 1}).zcard('other')
+        pipe.delete('feed', 'other')
+
+        self.assertEqual(pipe.execute(), [1, 1, 2])
+        self.assertEqual(self.b.keys('*'), [])
+
+class MemoryFeedTest(unittest.TestCase):
+    def backend(self):
+        return MemoryBackend()
+
+    def setUp(self):
+        self.a = ActivityFeed(connection=self.backend(), max_size=2)
+
+    def max_size_test(self):
+        'should run the capped add script in Python'
+        for i in range(4):
+            self.a.update_item('david', i, 1000 + i, True)
+
+        self.assertEqual(self.a.feed('david', 1), [b'3', b'2'])
+        self.assertEqual(self.a.feed('david', 1, True), [b'3', b'2'])
+
+    def feed_after_test(self):
+        'should page through a feed with cursors'
+        self.a.max_size = None
+
+        for i in range(5):
+            self.a.update_item('david', i, 1000)
+
+        items, cursor = self.a.feed_after('david', limit=3)
+        self.assertEqual(items, [b'4', b'3', b'2'])
+        items, cursor = self.a.feed_after('david', cursor, limit=3)
+        self.assertEqual(items, [b'1', b'0'])
+        self.assertEqual(cursor, None)
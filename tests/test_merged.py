@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+from tests.helper import BaseTest, timestamp_utcnow
+
+class MergedFeedTest(BaseTest):
+    def setUp(self):
+        super(MergedFeedTest, self).setUp()
+        self.now = timestamp_utcnow()
+
+        for i in range(1, 7):
+            self.a.update_item(['tom', 'anna', 'kate'][i % 3], i, self.now + i)
+
+    def ints(self, items):
+        return [int(v) for v in items]
+
+    def merged_feed_test(self):
+        'should merge the feeds of the followees, newest first'
+        self.assertEqual(self.ints(self.a.merged_feed('david',
+            ['tom', 'anna', 'kate'], 1)), [6, 5, 4, 3, 2, 1])
+        self.assertEqual(self.ints(self.a.merged_feed('erin',
+            ['tom', 'anna'], 1, page_size=2)), [6, 4])
+        self.assertEqual(self.a.total_items('david', True), 0)
+
+    def cached_materialization_test(self):
+        'should read later pages from the materialized timeline'
+        key = self.a.merged_feed_key('david')
+        self.assertEqual(self.ints(self.a.merged_feed('david', ['tom', 'anna'],
+            1, page_size=2)), [6, 4])
+        self.assertTrue(0 < self.a.redis.ttl(key) <= self.a.merged_ttl)
+
+        self.a.update_item('tom', 10, self.now + 10)
+        self.assertEqual(self.ints(self.a.merged_feed('david', iter(()), 2,
+            page_size=2)), [3, 1])
+        self.assertEqual(self.ints(self.a.merged_feed('david', ['tom', 'anna'],
+            1, page_size=2, refresh=True)), [10, 6])
+
+    def source_size_test(self):
+        'should take the newest items of every followee'
+        self.assertEqual(self.ints(self.a.merged_feed('david',
+            ['tom', 'anna', 'kate'], 1, source_size=1)), [6, 5, 4])
+
+        self.a.merged_source_size = 2
+        self.assertEqual(self.ints(self.a.merged_feed('david', ['tom', 'anna'],
+            1, refresh=True)), [6, 4, 3, 1])
+
+    def duplicate_items_test(self):
+        'should keep one entry per item with its newest timestamp'
+        self.a.update_item('tom', 1, self.now + 20)
+
+        self.assertEqual(self.ints(self.a.merged_feed('david',
+            ['tom', 'anna', 'kate'], 1)), [1, 6, 5, 4, 3, 2])
+        self.assertEqual(self.ints(self.a.merged_feed('erin',
+            ['tom', 'anna', 'kate'], 1, source_size=2)), [1, 6, 5, 4, 2])
+
+    def merged_key_test(self):
+        'should keep merged timelines out of exports'
+        self.a.merged_feed('david', ['tom'], 1)
+        self.assertEqual(self.a.merged_feed_key('david'),
+            'activity_feed:merged:david')
+        self.assertEqual(sum(len(keys) for keys in
+                             self.a._scan_feeds(self.a.redis, 100)), 3)
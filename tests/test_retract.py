@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+from tests.helper import BaseTest, timestamp_utcnow
+
+from activity_feed import BufferedFeedWriter
+from activity_feed.codec import CompactCodec
+from activity_feed.graph import FollowGraph
+
+class RetractItemTest(BaseTest):
+    def setUp(self):
+        super(RetractItemTest, self).setUp()
+        self.a.item_index = True
+        self.users = ['user_%d' % i for i in range(10)]
+        self.now = timestamp_utcnow()
+
+    def ints(self, items):
+        return [int(v) for v in items]
+
+    def retract_item_test(self):
+        'should remove an item from every aggregate feed it was written to'
+        self.a.aggregate_item(self.users, 1, self.now + 1)
+        self.a.aggregate_item(self.users[:3], 2, self.now + 2)
+        self.a.update_item('david', 1, self.now + 1, aggregate=True)
+
+        self.assertEqual(self.a.redis.scard(self.a.item_feeds_key(1)), 11)
+        self.assertEqual(self.a.retract_item(1, chunk_size=4), 11)
+
+        for uid in self.users:
+            self.assertEqual(self.a.total_items(uid, True), int(uid in
+                self.users[:3]))
+
+        self.assertEqual(self.ints(self.a.full_feed('david', False)), [1])
+        self.assertEqual(self.a.total_items('david', True), 0)
+        self.assertEqual(self.a.redis.exists(self.a.item_feeds_key(1)), 0)
+        self.assertEqual(self.a.retract_item(1), 0)
+
+    def single_user_test(self):
+        'should index single user writes and batches'
+        self.a.aggregate_item('david', 1, self.now)
+
+        with self.a.batch() as b:
+            b.aggregate_item('tom', 1, self.now)
+
+        self.assertEqual(self.a.retract_item(1), 2)
+        self.assertEqual(self.a.total_items('tom', True), 0)
+
+    def buffered_writer_test(self):
+        'should index aggregate feeds written through a BufferedFeedWriter'
+        with BufferedFeedWriter(self.a) as writer:
+            writer.aggregate_item(self.users, 1, self.now)
+            writer.update_item('david', 1, self.now, aggregate=True)
+
+        self.assertEqual(self.a.retract_item(1), 11)
+        self.assertEqual(self.a.total_items(self.users[0], True), 0)
+        self.assertEqual(self.ints(self.a.full_feed('david', False)), [1])
+
+    def follow_backfill_test(self):
+        'should index items backfilled on follow and rebuilt on read'
+        graph = FollowGraph(self.a)
+        self.a.delivery = graph.delivery()
+        self.a.publish('tom', 1, self.now)
+        graph.follow('david', 'tom')
+        self.assertEqual(self.ints(self.a.feed('david', 1, True)), [1])
+
+        self.assertEqual(self.a.retract_item(1), 2)
+        self.assertEqual(self.a.feed('david', 1, True), [])
+
+        self.a.active_window = 100
+        self.a.publish('tom', 2, self.now + 1)
+        graph.follow('anna', 'tom')
+        self.assertEqual(self.ints(self.a.feed('anna', 1, True)), [2, 1])
+
+        self.assertEqual(self.a.retract_item(2), 1)
+        self.assertEqual(self.ints(self.a.feed('anna', 1, True)), [1])
+
+    def codec_test(self):
+        'should key the index by item ID with a codec'
+        self.a.codec = CompactCodec(member_width=4)
+        self.a.aggregate_item(self.users[:2], 7, self.now)
+
+        self.assertEqual(self.a.item_feeds_key(7), 'activity_feed:item_feeds:7')
+        self.assertEqual(self.a.retract_item(7), 2)
+        self.assertEqual(self.a.total_items(self.users[0], True), 0)
+
+    def index_ttl_test(self):
+        'should expire the index with item_index_ttl'
+        self.a.item_index_ttl = 100
+        self.a.aggregate_item('david', 1, self.now)
+        self.assertTrue(0 < self.a.redis.ttl(self.a.item_feeds_key(1)) <= 100)
+
+    def cache_invalidation_test(self):
+        'should invalidate cached pages of retracted feeds'
+        self.a.cache_size = 10
+        self.a.versioned = True
+        self.a.aggregate_item('david', 1, self.now)
+        self.assertEqual(self.ints(self.a.feed('david', 1, True)), [1])
+
+        self.a.retract_item(1)
+        self.assertEqual(self.a.feed('david', 1, True), [])
+
+    def retract_requires_index_test(self):
+        'should require an item index'
+        self.a.item_index = False
+        self.assertRaises(RuntimeError, self.a.retract_item, 1)
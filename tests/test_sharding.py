@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import io
+import unittest
+
+from tests.helper import Recording, timestamp_utcnow
+
+from activity_feed import ActivityFeed
+from activity_feed.delivery import HybridDelivery
+from activity_feed.fanout import FanOut
+from activity_feed.graph import FollowGraph
+from activity_feed.sharding import HashRing, key_slot
+
+NODES = ['redis://:@localhost:6379/14', 'redis://:@localhost:6379/15']
+
+class HashRingTest(unittest.TestCase):
+    def hash_ring_distribution_test(self):
+        'should spread keys over every node'
+        ring = HashRing(['a', 'b', 'c'])
+        counts = [0, 0, 0]
+
+        for i in range(3000):
+            counts[ring.get_node('user_%d' % i)] += 1
+
+        for count in counts:
+            self.assertTrue(count > 600, counts)
+
+    def hash_ring_stability_test(self):
+        'should only move keys to a new node when a node is added'
+        before = HashRing(['a', 'b'])
+        after = HashRing(['a', 'b', 'c'])
+
+        for i in range(1000):
+            node = after.get_node(i)
+
+            if node != 2:
+                self.assertEqual(before.get_node(i), node)
+
+    def hash_ring_empty_test(self):
+        'should require at least one node'
+        self.assertRaises(ValueError, HashRing, [])
+
+class KeySlotTest(unittest.TestCase):
+    def key_slot_test(self):
+        'should compute the Redis Cluster hash slot'
+        self.assertEqual(key_slot('123456789'), 12739)
+        self.assertEqual(key_slot('foo'), 12182)
+        self.assertEqual(key_slot(b'foo'), 12182)
+
+    def key_slot_hash_tag_test(self):
+        'should only hash the first non-empty hash tag'
+        self.assertEqual(key_slot('{user1000}.following'), key_slot('user1000'))
+        self.assertNotEqual(key_slot('foo{}{bar}'), key_slot('bar'))
+
+class ClusterFeedTest(unittest.TestCase):
+    def setUp(self):
+        self.a = ActivityFeed(redis='redis://:@localhost:6379/15',
+            cluster=True, versioned=True)
+        self._empty()
+
+    def tearDown(self):
+        self._empty()
+
+    def _empty(self):
+        keys = self.a.redis.keys('{}*'.format(self.a.namespace))
+
+        if keys:
+            self.a.redis.delete(*keys)
+
+    def feed_key_hash_tags_test(self):
+        'should put every key of a user in the same slot'
+        self.assertEqual(self.a.feed_key('david'), 'activity_feed:{david}')
+        self.assertEqual(self.a.feed_key('david', True),
+            'activity_feed:aggregate:{david}')
+
+        keys = [self.a.feed_key('david'), self.a.feed_key('david', True),
+                self.a._version_key(self.a.feed_key('david'))]
+        self.assertEqual(set(key_slot(k) for k in keys),
+            set([key_slot('david')]))
+
+    def hash_tags_opt_in_test(self):
+        'should keep the default key layout unless enabled'
+        a = ActivityFeed(hash_tags=True)
+        self.assertEqual(a.feed_key('david'), 'activity_feed:{david}')
+        self.assertEqual(ActivityFeed().feed_key('david'), 'activity_feed:david')
+
+    def cluster_feed_test(self):
+        'should read and write feeds with hash tagged keys'
+        now = timestamp_utcnow()
+
+        for i in range(3):
+            self.a.update_item('david', i, now + i, True)
+
+        self.assertEqual([int(v) for v in self.a.feed('david', 1)], [2, 1, 0])
+        self.assertEqual(self.a.total_items('david', True), 3)
+
+        self.a.remove_feeds('david')
+        self.assertEqual(self.a.total_items('david'), 0)
+
+    def cluster_remove_feeds_test(self):
+        'should remove feeds without MULTI in cluster mode'
+        client = Recording(self.a.redis)
+        a = ActivityFeed(connection=client, cluster=True, versioned=True)
+        a.update_item('david', 1, timestamp_utcnow(), True)
+        del client.transactions[:]
+
+        a.remove_feeds('david')
+        self.assertEqual(client.transactions, [False])
+        self.assertEqual(a.total_items('david', True), 0)
+
+    def cluster_fanout_test(self):
+        'should order the users of every chunk by slot'
+        users = ['user_%d' % i for i in range(20)]
+        seen = []
+
+        def command(pipe, uid):
+            seen.append(uid)
+
+        fanout = FanOut(self.a.redis, 10, slot=self.a._slot)
+        fanout.execute(users, command)
+
+        for chunk in (seen[:10], seen[10:]):
+            slots = [self.a._slot(uid) for uid in chunk]
+            self.assertEqual(slots, sorted(slots))
+
+        self.a.fanout_item(users, 1, timestamp_utcnow(), chunk_size=10)
+        pages = self.a.feeds_for(users, 1, True)
+
+        for uid in users:
+            self.assertEqual([int(v) for v in pages[uid]], [1])
+
+    def cluster_single_client_test(self):
+        'should reject several nodes in cluster mode'
+        a = ActivityFeed(redis=NODES, cluster=True)
+        self.assertRaises(ValueError, lambda: a.nodes)
+
+class ShardedFeedTest(unittest.TestCase):
+    def setUp(self):
+        self.a = ActivityFeed(redis=NODES)
+        self.users = ['user_%d' % i for i in range(20)]
+        self._empty()
+
+    def tearDown(self):
+        self._empty()
+
+    def _empty(self):
+        for client in self.a.nodes:
+            keys = client.keys('{}*'.format(self.a.namespace))
+
+            if keys:
+                client.delete(*keys)
+
+    def routing_test(self):
+        'should store both feeds of a user on the node picked by the ring'
+        for uid in self.users:
+            self.a.update_item(uid, 1, timestamp_utcnow(), True)
+
+        nodes = set()
+
+        for uid in self.users:
+            node = self.a.ring.get_node(uid)
+            nodes.add(node)
+            self.assertTrue(self.a.redis_for(uid) is self.a.nodes[node])
+
+            for i, client in enumerate(self.a.nodes):
+                self.assertEqual(client.exists(self.a.feed_key(uid)), i == node)
+                self.assertEqual(client.exists(self.a.feed_key(uid, True)),
+                    i == node)
+
+        self.assertEqual(nodes, set([0, 1]))
+
+    def redis_sharded_test(self):
+        'should refuse to pick a node without a user ID'
+        self.assertRaises(RuntimeError, lambda: self.a.redis)
+
+    def fanout_item_test(self):
+        'should send every chunk to a single node'
+        stats = self.a.fanout_item(iter(self.users), 1, timestamp_utcnow(),
+            chunk_size=4, max_in_flight=2)
+
+        self.assertEqual(sum(s.size for s in stats), 20)
+        self.assertEqual(set(s.node for s in stats), set([0, 1]))
+
+        for uid in self.users:
+            self.assertEqual(self.a.check_item(uid, 1, True), True)
+
+        self.a.remove_item(self.users, 1)
+
+        for uid in self.users:
+            self.assertEqual(self.a.check_item(uid, 1, True), False)
+
+    def feeds_for_test(self):
+        'should read pages from every node'
+        for i, uid in enumerate(self.users):
+            self.a.update_item(uid, i, timestamp_utcnow())
+
+        pages = self.a.feeds_for(self.users, 1)
+
+        for i, uid in enumerate(self.users):
+            self.assertEqual([int(v) for v in pages[uid]], [i])
+
+    def max_size_test(self):
+        'should run the capped add script on every node'
+        self.a.max_size = 2
+        now = timestamp_utcnow()
+
+        for uid in self.users:
+            for i in range(4):
+                self.a.update_item(uid, i, now + i)
+
+        for uid in self.users:
+            self.assertEqual(self.a.total_items(uid), 2)
+
+    def export_import_test(self):
+        'should export every node and route imported feeds to their node'
+        for i, uid in enumerate(self.users):
+            self.a.update_item(uid, i, timestamp_utcnow())
+
+        f = io.BytesIO()
+        stats = self.a.export_feeds(f, chunk_size=3)
+        self.assertEqual((stats.keys, stats.records), (20, 20))
+
+        self._empty()
+        f.seek(0)
+        self.a.import_feeds(f, chunk_size=3)
+
+        for i, uid in enumerate(self.users):
+            self.assertEqual(self.a.redis_for(uid).zcard(self.a.feed_key(uid)),
+                1)
+            self.assertEqual([int(v) for v in self.a.feed(uid, 1)], [i])
+
+    def merged_feed_test(self):
+        'should merge feeds stored on several nodes'
+        now = timestamp_utcnow()
+
+        for i, uid in enumerate(self.users):
+            self.a.update_item(uid, i, now + i)
+
+        self.assertEqual([int(v) for v in self.a.merged_feed('david',
+            self.users, 1, page_size=3)], [19, 18, 17])
+        self.assertEqual([int(v) for v in self.a.merged_feed('david',
+            self.users, 7, page_size=3)], [1, 0])
+
+    def follow_graph_test(self):
+        'should keep the follow graph of users on their nodes'
+        graph = FollowGraph(self.a, backfill_size=2)
+        now = timestamp_utcnow()
+
+        for i, uid in enumerate(self.users):
+            self.a.update_item(uid, i, now + i)
+            graph.follow('user_0', uid)
+
+        self.assertEqual(graph.followee_count('user_0'), 20)
+        self.assertEqual(sorted(graph.followers('user_7')), ['user_0'])
+        self.assertEqual(self.a.total_items('user_0', True), 20)
+
+        for uid in self.users[10:]:
+            graph.unfollow('user_0', uid)
+
+        self.assertEqual(sorted(int(v) for v in self.a.full_feed('user_0',
+            True)), list(range(10)))
+
+    def retract_item_test(self):
+        'should retract items from the feeds of every node'
+        self.a.item_index = True
+        self.a.aggregate_item(self.users, 1, timestamp_utcnow())
+
+        for client in self.a.nodes:
+            self.assertTrue(client.scard(self.a.item_feeds_key(1)) > 0)
+
+        self.assertEqual(self.a.retract_item(1), 20)
+
+        for uid in self.users:
+            self.assertEqual(self.a.total_items(uid, True), 0)
+
+    def pulled_count_test(self):
+        'should count pulled items stored on other nodes once'
+        followees = lambda uid: self.users[1:]
+        self.a.delivery = HybridDelivery(0, lambda uid: ['x'], followees,
+            lambda uid: 1)
+        now = timestamp_utcnow()
+
+        for i, uid in enumerate(self.users[1:]):
+            self.a.update_item(uid, i % 5, now + i)
+
+        self.a.aggregate_item('user_0', 1, now)
+        self.assertEqual(self.a.total_items('user_0', True), 5)
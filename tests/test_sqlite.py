@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from tests import test_memory
+
+from activity_feed import ActivityFeed
+from activity_feed.backends.sqlite import SQLiteBackend
+
+class SQLiteBackendTest(test_memory.MemoryBackendTest):
+    def backend(self, timer):
+        return SQLiteBackend(timer=timer)
+
+    def strings_test(self):
+        'should count with INCR'
+        self.assertEqual(self.b.incr('version'), 1)
+        self.assertEqual(self.b.incr('version'), 2)
+        self.assertEqual(self.b.get('version'), b'2')
+
+    def batched_zadd_test(self):
+        'should report the members added by every batched ZADD'
+        pipe = self.b.pipeline(transaction=False)
+
+        for key in ('x', 'y', 'x', 'feed'):
+            pipe.zadd(key, {'a': 5})
+
+        self.assertEqual(pipe.execute(), [1, 1, 0, 0])
+        self.assertEqual(self.b.zscore('feed', 'a'), 5.0)
+        self.assertEqual(self.b.zrevrange('feed', 0, 0), [b'a'])
+
+class SQLiteFeedTest(test_memory.MemoryFeedTest):
+    def backend(self):
+        return SQLiteBackend()
+
+class SQLiteFileTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'feeds.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def persistence_test(self):
+        'should keep feeds on disk in WAL mode'
+        backend = SQLiteBackend(self.path)
+        a = ActivityFeed(connection=backend)
+        a.fanout_item(['david', 'luke'], 1, 1000)
+        a.update_item('david', 2, 1001)
+        mode = backend._one('PRAGMA journal_mode')[0]
+        backend.close()
+
+        self.assertEqual(mode, 'wal')
+
+        a = ActivityFeed(connection=SQLiteBackend(self.path))
+        self.assertEqual(a.feed('david', 1), [b'2'])
+        self.assertEqual(a.feed('david', 1, True), [b'1'])
+        self.assertEqual(a.feed('luke', 1, True), [b'1'])
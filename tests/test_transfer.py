@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import io
+import shutil
+import tempfile
+import unittest
+
+from tests.helper import BaseTest
+
+from activity_feed import ActivityFeed
+from activity_feed import transfer
+from activity_feed.archive import Archive
+
+class TransferFormatTest(unittest.TestCase):
+    def roundtrip(self, format):
+        records = [(b'feed:1', b'item', 1.5), (b'feed:1', b'\xff\x00', 2.0),
+                   (b'feed:2', u'caf\xe9'.encode('utf-8'), 3.0)]
+        f = io.BytesIO()
+        writer = transfer.writer(f, format)
+
+        for record in records:
+            writer.write(*record)
+
+        self.assertEqual(writer.bytes, len(f.getvalue()))
+        f.seek(0)
+        reader = transfer.reader(f, format)
+        self.assertEqual(list(reader), records)
+        self.assertEqual(reader.bytes, writer.bytes)
+
+    def binary_test(self):
+        'should read back binary records'
+        self.roundtrip('binary')
+
+    def ndjson_test(self):
+        'should read back NDJSON records, including non UTF-8 members'
+        self.roundtrip('ndjson')
+
+    def invalid_stream_test(self):
+        'should reject unknown formats and corrupt streams'
+        self.assertRaises(ValueError, transfer.writer, io.BytesIO(), 'xml')
+        self.assertRaises(ValueError, transfer.reader, io.BytesIO(b'nope'))
+
+        f = io.BytesIO()
+        transfer.writer(f).write(b'feed', b'item', 1.0)
+        f = io.BytesIO(f.getvalue()[:-2])
+        self.assertRaises(ValueError, list, transfer.reader(f))
+
+    def rate_test(self):
+        'should report records per second'
+        self.assertEqual(transfer.TransferStats(1, 10, 0, 2.0).rate, 5.0)
+        self.assertEqual(transfer.TransferStats(0, 0, 0, 0).rate, 0.0)
+
+class ExportImportTest(BaseTest):
+    def setUp(self):
+        super(ExportImportTest, self).setUp()
+        self.a.versioned = True
+
+    def snapshot(self):
+        return dict((user_id, [int(v) for v in self.a.full_feed(user_id)])
+                    for user_id in ('david', 'tom', 'anna'))
+
+    def export_import_test(self):
+        'should restore every feed of the namespace'
+        for fmt in ('binary', 'ndjson'):
+            self.add_items_to_feed('david', 7)
+            self.add_items_to_feed('tom', 3)
+            self.add_items_to_feed('anna', 2, aggregate=True)
+            before = self.snapshot()
+            f = io.BytesIO()
+            progress = []
+
+            stats = self.a.export_feeds(f, fmt, chunk_size=2,
+                progress=progress.append)
+            self.assertEqual((stats.keys, stats.records), (4, 14))
+            self.assertEqual(stats.bytes, len(f.getvalue()))
+            self.assertEqual(progress[-1].records, 14)
+
+            self._empty()
+            f.seek(0)
+            stats = self.a.import_feeds(f, fmt, chunk_size=5)
+            self.assertEqual((stats.keys, stats.records), (4, 14))
+            self.assertEqual(self.snapshot(), before)
+            self.assertEqual(self.a.total_items('anna', True), 2)
+            self._empty()
+
+    def grouped_by_key_test(self):
+        'should write the records of every feed contiguously'
+        self.add_items_to_feed('david', 3)
+        self.add_items_to_feed('tom', 3)
+        f = io.BytesIO()
+        self.a.export_feeds(f, chunk_size=2)
+
+        f.seek(0)
+        keys = [key for key, _, _ in transfer.reader(f)]
+        self.assertEqual(len(keys), 6)
+        self.assertEqual(keys[:3], [keys[0]] * 3)
+        self.assertEqual(keys[3:], [keys[3]] * 3)
+
+        self._empty()
+        f.seek(0)
+        self.assertEqual(self.a.import_feeds(f, chunk_size=4).keys, 2)
+
+    def resume_test(self):
+        'should skip records already imported'
+        self.add_items_to_feed('david', 6)
+        f = io.BytesIO()
+        self.a.export_feeds(f)
+        self._empty()
+
+        f.seek(0)
+        stats = self.a.import_feeds(f, skip=4)
+        self.assertEqual(stats.records, 6)
+        self.assertEqual(self.a.total_items('david'), 2)
+
+    def export_archive_test(self):
+        'should export archived items, including fully archived feeds'
+        directory = tempfile.mkdtemp()
+        tiered = ActivityFeed(connection=self.a.redis,
+            archive=Archive(directory), hot_size=2)
+
+        try:
+            self.add_items_to_feed('david', 5)
+            self.add_items_to_feed('tom', 3)
+            before = self.snapshot()
+            tiered.demote('david')
+            tiered.hot_size = 0
+            tiered.demote('tom')
+            self.assertEqual(self.a.redis.exists(self.a.feed_key('tom')), 0)
+
+            f = io.BytesIO()
+            stats = tiered.export_feeds(f, chunk_size=2)
+            self.assertEqual((stats.keys, stats.records), (2, 8))
+
+            self._empty()
+            f.seek(0)
+            self.a.import_feeds(f)
+            self.assertEqual(self.snapshot(), before)
+        finally:
+            tiered.archive.close()
+            shutil.rmtree(directory)
+
+    def export_skips_other_keys_test(self):
+        'should only export feeds'
+        self.add_items_to_feed('david', 2)
+        self.a.redis.set('activity_feed:counter', 1)
+        f = io.BytesIO()
+
+        stats = self.a.export_feeds(f)
+        self.assertEqual((stats.keys, stats.records), (1, 2))
+
+    def user_id_for_key_test(self):
+        'should route keys by the user ID they belong to'
+        self.assertEqual(self.a._user_id_for_key(b'activity_feed:david'),
+            'david')
+        self.assertEqual(self.a._user_id_for_key(
+            'activity_feed:aggregate:david'), 'david')
+        self.assertEqual(self.a._user_id_for_key('other:david'),
+            'other:david')
+
+        a = ActivityFeed(hash_tags=True)
+        self.assertEqual(a._user_id_for_key('activity_feed:{david}'), 'david')
@@ -23,3 +23,11 @@ class UtilityTest(unittest.TestCase):
 
         self.assertEqual(feederboard_david is None, False)
         self.assertEqual(feederboard_person is None, False)
+
+    def test_key_namespace_change(self):
+        'should build keys from the current namespace and aggregate key'
+        a = ActivityFeed()
+        a.namespace = 'feed'
+        a.aggregate_key = 'agg'
+        self.assertEqual(a.feed_key('david'), 'feed:david')
+        self.assertEqual(a.feed_key('david', True), 'feed:agg:david')
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import time
+
+from tests.helper import BaseTest, Recording, timestamp_utcnow
+
+from activity_feed import ActivityFeed, BufferedFeedWriter
+
+class Failing(object):
+    '''Client wrapper whose pipelines fail on execute while `failing`.'''
+
+    def __init__(self, client):
+        self.client = client
+        self.failing = True
+
+    def pipeline(self, *args, **kwargs):
+        pipe = self.client.pipeline(*args, **kwargs)
+
+        if self.failing:
+            def execute():
+                pipe.reset()
+                raise IOError('connection lost')
+
+            pipe.execute = execute
+
+        return pipe
+
+class BufferedFeedWriterTest(BaseTest):
+    def items(self, user_id, aggregate=False):
+        return [int(v) for v in self.a.full_feed(user_id, aggregate)]
+
+    def buffer_test(self):
+        'should only write on flush'
+        now = timestamp_utcnow()
+        writer = BufferedFeedWriter(self.a)
+        writer.add_item('david', 1, now)
+        writer.update_item('david', 2, now + 1, aggregate=True)
+        writer.aggregate_item(['tom', 'anna'], 3, now + 2)
+
+        self.assertEqual(len(writer), 5)
+        self.assertEqual(self.a.total_items('david'), 0)
+        self.assertEqual(writer.flush(), 5)
+        self.assertEqual(len(writer), 0)
+
+        self.assertEqual(self.items('david'), [2, 1])
+        self.assertEqual(self.items('david', True), [2])
+        self.assertEqual(self.items('tom', True), [3])
+        self.assertEqual(self.items('anna', True), [3])
+
+    def cluster_test(self):
+        'should flush without MULTI in cluster mode'
+        client = Recording(self.a.redis)
+        a = ActivityFeed(connection=client, cluster=True)
+
+        with BufferedFeedWriter(a) as writer:
+            writer.aggregate_item(['tom', 'anna'], 1, timestamp_utcnow())
+
+        self.assertEqual(client.transactions, [False])
+        self.assertEqual(a.total_items('anna', True), 1)
+
+    def merge_test(self):
+        'should merge repeated writes of an item, keeping the last timestamp'
+        now = timestamp_utcnow()
+        writer = BufferedFeedWriter(self.a)
+
+        for i in range(10):
+            writer.add_item('david', 1, now + i)
+
+        writer.add_item('david', 2, now + 5)
+
+        self.assertEqual(len(writer), 2)
+        writer.flush()
+        self.assertEqual(self.items('david'), [1, 2])
+
+    def max_items_test(self):
+        'should flush when max_items writes are pending'
+        writer = BufferedFeedWriter(self.a, max_items=3)
+        now = timestamp_utcnow()
+
+        writer.add_item('david', 1, now)
+        writer.add_item('david', 2, now)
+        self.assertEqual(self.a.total_items('david'), 0)
+        writer.add_item('david', 3, now)
+        self.assertEqual(self.a.total_items('david'), 3)
+        self.assertEqual(len(writer), 0)
+
+    def max_delay_test(self):
+        'should flush on the first write after max_delay seconds'
+        clock = [100]
+        writer = BufferedFeedWriter(self.a, max_delay=5,
+            timer=lambda: clock[0])
+        now = timestamp_utcnow()
+
+        writer.add_item('david', 1, now)
+        clock[0] += 4
+        writer.add_item('david', 2, now)
+        self.assertEqual(self.a.total_items('david'), 0)
+        clock[0] += 1
+        writer.add_item('david', 3, now)
+        self.assertEqual(self.a.total_items('david'), 3)
+
+    def context_manager_test(self):
+        'should flush when leaving the with block'
+        with BufferedFeedWriter(self.a) as writer:
+            writer.add_item('david', 1, timestamp_utcnow())
+
+        self.assertEqual(self.items('david'), [1])
+
+    def background_flush_test(self):
+        'should flush from a background thread'
+        writer = BufferedFeedWriter(self.a)
+        writer.start(interval=0.01)
+        writer.add_item('david', 1, timestamp_utcnow())
+        deadline = time.time() + 5
+
+        while not self.items('david') and time.time() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(self.items('david'), [1])
+        writer.close()
+        self.assertRaises(RuntimeError, lambda: (writer.start(0.01),
+            writer.start(0.01)))
+        writer.close()
+
+    def failed_flush_test(self):
+        'should keep the writes of a failed flush'
+        client = Failing(self.a.redis)
+        a = ActivityFeed(connection=client)
+        writer = BufferedFeedWriter(a)
+        writer.add_item('david', 1, timestamp_utcnow())
+
+        self.assertRaises(IOError, writer.flush)
+        self.assertEqual(len(writer), 1)
+
+        client.failing = False
+        self.assertEqual(writer.flush(), 1)
+        self.assertEqual(self.items('david'), [1])
+
+    def versioned_and_capped_test(self):
+        'should bump versions and trim capped feeds'
+        self.a.versioned = True
+        self.a.max_size = 2
+        key = self.a.feed_key('david')
+        now = timestamp_utcnow()
+
+        with BufferedFeedWriter(self.a) as writer:
+            for i in range(5):
+                writer.add_item('david', i, now + i)
+
+        self.assertEqual(self.items('david'), [4, 3])
+        self.assertEqual(int(self.a.redis.get(self.a._version_key(key))), 1)